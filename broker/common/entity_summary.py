@@ -6,22 +6,62 @@ class EntitySummary:
         self.count = 0
         self.breakdown = OrderedDict()
 
-    def __add__(self, other: 'EntitySummary') -> 'EntitySummary':
+    def add_entity(self, specific_type: str):
+        """
+        counts an entity of the given specific type (e.g donor_organism, sequence_file, ...)
+        :param specific_type:
+        """
+        if specific_type not in self.breakdown:
+            self.breakdown[specific_type] = {'count': 0}
+
+        self.breakdown[specific_type]['count'] += 1
+        self.count += 1
+
+    def merge(self, other: 'EntitySummary') -> 'EntitySummary':
         """
-        adds two EntitySummary together
+        adds another EntitySummary into this one, in place. The other summary is left untouched and none of its
+        breakdown entries are shared with this one, so merging cached summaries never modifies them.
         :param other:
         :return: self
         """
-        # copy self into a new EntitySummary obj
-        combined_summary = EntitySummary()
-        combined_summary.count = self.count
-        combined_summary.breakdown = OrderedDict(self.breakdown)
-        
-        combined_summary.count += other.count
+        self.count += other.count
         for (key, val) in other.breakdown.items():
-            if key in combined_summary.breakdown:  # ..do an add
-                combined_summary.breakdown[key]['count'] += val['count']
+            type_summary = self.breakdown.get(key)
+            if type_summary is None:
+                self.breakdown[key] = {'count': val['count']}
             else:
-                combined_summary.breakdown[key] = val
+                type_summary['count'] += val['count']
 
-        return combined_summary
+        return self
+
+    def __iadd__(self, other: 'EntitySummary') -> 'EntitySummary':
+        return self.merge(other)
+
+    def __add__(self, other: 'EntitySummary') -> 'EntitySummary':
+        """
+        adds two EntitySummary together into a new EntitySummary, leaving both unchanged
+        :param other:
+        :return: the combined EntitySummary
+        """
+        return EntitySummary().merge(self).merge(other)
+
+    def to_dict(self) -> dict:
+        """
+        :return: the summary as plain JSON-serialisable types, in the shape returned by the summary endpoints
+        """
+        return {
+            'count': self.count,
+            'breakdown': {specific_type: {'count': type_summary['count']}
+                          for specific_type, type_summary in self.breakdown.items()}
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'EntitySummary':
+        """
+        :return: the EntitySummary of a dict made by to_dict
+        """
+        entity_summary = EntitySummary()
+        entity_summary.count = data['count']
+        entity_summary.breakdown = OrderedDict((specific_type, {'count': type_summary['count']})
+                                               for specific_type, type_summary in data['breakdown'].items())
+        return entity_summary
@@ -14,15 +14,34 @@ class ProjectSummary:
         self.create_date = None
         self.last_updated_date = None
 
+        # False when the summary is missing some of the project's submissions, e.g because they took too long
+        self.complete = True
+
     def add_submission_summary(self, submission_summary: 'SubmissionSummary') -> 'ProjectSummary':
         """
-        Adds a submission summary to this project summary
+        Adds a submission summary to this project summary, merging its entity counts in place. The submission
+        summary is not modified, so it can be one shared through the summary cache.
         :param submission_summary: SubmissionSummary to add to self
         :return: self
         """
-        self.biomaterial_summary += submission_summary.biomaterial_summary
-        self.protocol_summary += submission_summary.protocol_summary
-        self.process_summary += submission_summary.process_summary
-        self.file_summary += submission_summary.file_summary
+        self.biomaterial_summary.merge(submission_summary.biomaterial_summary)
+        self.protocol_summary.merge(submission_summary.protocol_summary)
+        self.process_summary.merge(submission_summary.process_summary)
+        self.file_summary.merge(submission_summary.file_summary)
 
         return self
+
+    def to_dict(self) -> dict:
+        """
+        :return: the summary as plain JSON-serialisable types, in the shape returned by the summary endpoints
+        """
+        return {
+            'biomaterial_summary': self.biomaterial_summary.to_dict(),
+            'protocol_summary': self.protocol_summary.to_dict(),
+            'process_summary': self.process_summary.to_dict(),
+            'file_summary': self.file_summary.to_dict(),
+            'submission_status': self.submission_status,
+            'create_date': self.create_date,
+            'last_updated_date': self.last_updated_date,
+            'complete': self.complete
+        }
@@ -15,3 +15,36 @@ class SubmissionSummary:
         self.submission_status = None
         self.create_date = None
         self.last_updated_date = None
+
+    def to_dict(self) -> dict:
+        """
+        :return: the summary as plain JSON-serialisable types, in the shape returned by the summary endpoints
+        """
+        return {
+            'biomaterial_summary': self.biomaterial_summary.to_dict(),
+            'protocol_summary': self.protocol_summary.to_dict(),
+            'process_summary': self.process_summary.to_dict(),
+            'file_summary': self.file_summary.to_dict(),
+            'project_summary': self.project_summary.to_dict(),
+            'scrape_result': dict(self.scrape_result),
+            'submission_status': self.submission_status,
+            'create_date': self.create_date,
+            'last_updated_date': self.last_updated_date
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'SubmissionSummary':
+        """
+        :return: the SubmissionSummary of a dict made by to_dict
+        """
+        submission_summary = SubmissionSummary()
+        submission_summary.biomaterial_summary = EntitySummary.from_dict(data['biomaterial_summary'])
+        submission_summary.protocol_summary = EntitySummary.from_dict(data['protocol_summary'])
+        submission_summary.process_summary = EntitySummary.from_dict(data['process_summary'])
+        submission_summary.file_summary = EntitySummary.from_dict(data['file_summary'])
+        submission_summary.project_summary = EntitySummary.from_dict(data['project_summary'])
+        submission_summary.scrape_result = dict(data['scrape_result'])
+        submission_summary.submission_status = data['submission_status']
+        submission_summary.create_date = data['create_date']
+        submission_summary.last_updated_date = data['last_updated_date']
+        return submission_summary
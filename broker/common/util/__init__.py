@@ -1 +1,2 @@
-from .json import response_json
+from .json import response_json, encode_json, iter_encode_json
+from .http_cache import strong_etag, not_modified, revalidated, uncacheable
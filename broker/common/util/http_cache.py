@@ -0,0 +1,36 @@
+import hashlib
+from typing import Optional
+
+from flask import current_app, request, Response
+
+
+def strong_etag(*parts) -> str:
+    """
+    :return: an ETag derived from everything that determines a representation, e.g a submission uuid and updateDate
+    """
+    return hashlib.sha256('\n'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def not_modified(etag: str) -> Optional[Response]:
+    """
+    :return: a 304 Not Modified response if the request's If-None-Match matches the etag, otherwise None, so
+    the representation only needs to be built for clients without an up to date copy
+    """
+    if request.if_none_match.contains_weak(etag):
+        return revalidated(current_app.response_class(status=304), etag)
+    return None
+
+
+def revalidated(response: Response, etag: str) -> Response:
+    """
+    sets the etag on the response, with Cache-Control allowing clients and proxies to store it as long as they
+    revalidate it on every use
+    """
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+def uncacheable(response: Response) -> Response:
+    response.cache_control.no_store = True
+    return response
@@ -1,8 +1,13 @@
 import json
 from dataclasses import is_dataclass, asdict
+from typing import Any, Generator
 
 from flask import current_app
 
+# encodes plain dicts, lists and scalars with the C accelerated encoder, separated like json.dumps and jsonpickle
+JSON_ENCODER = json.JSONEncoder()
+STREAM_CHUNK_SIZE = 1000
+
 
 def response_json(status_code, data):
     if is_dataclass(data) and not isinstance(data, type):
@@ -13,3 +18,43 @@ def response_json(status_code, data):
         mimetype='application/json'
     )
     return response
+
+
+def encode_json(data: Any) -> str:
+    return JSON_ENCODER.encode(data)
+
+
+def iter_encode_json(data: Any, chunk_size=STREAM_CHUNK_SIZE) -> Generator[str, None, None]:
+    """
+    Encodes data as the same JSON as encode_json, in chunks, for streaming large documents without building them
+    whole in memory.
+
+    Dicts holding other dicts are streamed entry by entry. Any other value is encoded whole, and the entries of a
+    dict are yielded in batches of up to chunk_size, so e.g a breakdown of many specific types is encoded in chunks
+    of chunk_size types.
+    """
+    if not isinstance(data, dict) or not any(isinstance(value, dict) for value in data.values()):
+        yield JSON_ENCODER.encode(data)
+        return
+
+    yield '{'
+    batch = dict()
+    separator = ''
+    for key, value in data.items():
+        if isinstance(value, dict) and any(isinstance(item, dict) for item in value.values()):
+            if batch:
+                yield separator + JSON_ENCODER.encode(batch)[1:-1]
+                batch = dict()
+                separator = ', '
+            yield f'{separator}{JSON_ENCODER.encode(key)}: '
+            yield from iter_encode_json(value, chunk_size)
+            separator = ', '
+        else:
+            batch[key] = value
+            if len(batch) >= chunk_size:
+                yield separator + JSON_ENCODER.encode(batch)[1:-1]
+                batch = dict()
+                separator = ', '
+    if batch:
+        yield separator + JSON_ENCODER.encode(batch)[1:-1]
+    yield '}'
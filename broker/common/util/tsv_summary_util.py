@@ -1,27 +1,44 @@
 import csv
+import json
 from functools import reduce
+from typing import Generator, Union
 from broker.common.submission_summary import SubmissionSummary
 from broker.common.project_summary import ProjectSummary
 
 
 class TSVSummaryUtil:
+    SUMMARY_ROW_HEADERS = ["uuid", "summary", "key", "value"]
 
     @staticmethod
-    def project_summary_to_tsv(project_summary: ProjectSummary):
+    def project_summary_to_tsv(project_summary: ProjectSummary, report_path='report.tsv'):
         breakdowns = TSVSummaryUtil.breakdowns_from_project_summary(project_summary)
         entity_count_tuples = TSVSummaryUtil.entity_count_tuples_from_breakdowns(breakdowns)
 
-        return TSVSummaryUtil.entity_count_tuples_to_tsv(entity_count_tuples)
+        return TSVSummaryUtil.entity_count_tuples_to_tsv(entity_count_tuples, report_path)
 
     @staticmethod
-    def submission_summary_to_tsv(submission_summary: SubmissionSummary):
+    def submission_summary_to_tsv(submission_summary: SubmissionSummary, report_path='report.tsv',
+                                  scrape_path='scrape.tsv'):
         breakdowns = TSVSummaryUtil.breakdowns_from_submission_summary(submission_summary)
         entity_count_tuples = TSVSummaryUtil.entity_count_tuples_from_breakdowns(breakdowns)
 
-        TSVSummaryUtil.entity_count_tuples_to_tsv(entity_count_tuples)
-        TSVSummaryUtil.scrape_result_to_tsv(submission_summary.scrape_result)
+        return (TSVSummaryUtil.entity_count_tuples_to_tsv(entity_count_tuples, report_path),
+                TSVSummaryUtil.scrape_result_to_tsv(submission_summary.scrape_result, scrape_path))
 
-        return True
+    @staticmethod
+    def summary_rows(uuid: str, summary: Union[SubmissionSummary, ProjectSummary]) -> Generator[list, None, None]:
+        """
+        the rows of a summary in the combined TSV of many summaries, under SUMMARY_ROW_HEADERS: a row for each
+        specific entity type count, then one for each scrape result, JSON encoded
+        e.g [uuid, "biomaterial", "donor_organism", 2], [uuid, "scrape", "organ", '["heart"]']
+        """
+        for entity_type in ["protocol", "process", "biomaterial", "file", "project"]:
+            entity_summary = getattr(summary, f"{entity_type}_summary", None)
+            if entity_summary is not None:
+                for specific_type, type_summary in entity_summary.breakdown.items():
+                    yield [uuid, entity_type, specific_type, type_summary["count"]]
+        for placeholder, value in getattr(summary, "scrape_result", {}).items():
+            yield [uuid, "scrape", placeholder, json.dumps(value)]
 
 
     @staticmethod
@@ -49,8 +66,8 @@ class TSVSummaryUtil:
         return [(key, breakdown[key]["count"]) for key in breakdown.keys()]
 
     @staticmethod
-    def entity_count_tuples_to_tsv(entity_count_tuples: list):
-        with open('report.tsv', 'w') as tsvfile:
+    def entity_count_tuples_to_tsv(entity_count_tuples: list, report_path='report.tsv'):
+        with open(report_path, 'w') as tsvfile:
             headers = ["entity", "count"]
             writer = csv.writer(tsvfile,  delimiter='\t')
             writer.writerow(headers)
@@ -59,8 +76,8 @@ class TSVSummaryUtil:
             return writer
 
     @staticmethod
-    def scrape_result_to_tsv(scrape_result: dict):
-        with open('scrape.tsv', 'w') as tsvfile:
+    def scrape_result_to_tsv(scrape_result: dict, scrape_path='scrape.tsv'):
+        with open(scrape_path, 'w') as tsvfile:
             writer = csv.writer(tsvfile,  delimiter='\t')
             for scraped_tuple in scrape_result.items():
                 writer.writerow(list(scraped_tuple))
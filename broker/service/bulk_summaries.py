@@ -0,0 +1,168 @@
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Generator, Iterable, List, Optional, Set
+
+from broker.common.project_summary import ProjectSummary
+from broker.common.submission_summary import SubmissionSummary
+from broker.service.summary_service import ENTITY_TYPES
+
+MAX_BULK_SUMMARIES = 1000
+BULK_SUMMARY_WORKERS = 4
+# tasks each summarise call has on the pool at once, so concurrent calls take turns rather than queueing behind one
+MAX_TASKS_IN_FLIGHT = 4
+
+
+class BulkSummaries:
+    """
+    Summarises many submissions and projects at once, on worker pools of its own so that bulk requests don't hold
+    up the summary service's pools, which project summaries are generated on within a time budget: submissions are
+    resolved and summarised on `pool`, and their entity types summarised on `entity_type_pool`.
+    Each summarise call has at most max_tasks_in_flight tasks on the pool at once, however many summaries are
+    requested.
+
+    Every requested submission and project is resolved, and each distinct submission is then summarised once,
+    however many of the requested projects share it. Summaries are yielded as they complete. Closing the generator,
+    e.g when the client disconnects, cancels the tasks that haven't started.
+    """
+
+    def __init__(self, summary_service, pool: Optional[ThreadPoolExecutor] = None,
+                 max_tasks_in_flight: int = MAX_TASKS_IN_FLIGHT, entity_type_pool: Optional[ThreadPoolExecutor] = None):
+        self.summary_service = summary_service
+        self.pool = pool if pool is not None else ThreadPoolExecutor(BULK_SUMMARY_WORKERS)
+        self.entity_type_pool = entity_type_pool if entity_type_pool is not None \
+            else ThreadPoolExecutor(BULK_SUMMARY_WORKERS * len(ENTITY_TYPES))
+        self.max_tasks_in_flight = max_tasks_in_flight
+        self.logger = logging.getLogger(__name__)
+
+    def summarise(self, submission_uuids: Iterable[str], project_uuids: Iterable[str]) -> Generator[dict, None, None]:
+        """
+        :return: a record for each requested submission and project, in the order they complete. Each record has
+        the 'type' (submission or project) and 'uuid' requested, and either its 'summary' or an 'error'. A project
+        summary missing a submission that could not be summarised is marked as incomplete
+        """
+        run = _BulkSummaryRun(self)
+        for submission_uuid in dict.fromkeys(submission_uuids):
+            run.submit('resolve_submission', submission_uuid, self.summary_service.ingestapi.get_submission_by_uuid,
+                       submission_uuid)
+        for project_uuid in dict.fromkeys(project_uuids):
+            run.submit('resolve_project', project_uuid, self.submissions_of_project, project_uuid)
+        yield from run.results()
+
+    def submissions_of_project(self, project_uuid) -> List[dict]:
+        project = self.summary_service.ingestapi.get_project_by_uuid(project_uuid)
+        return list(self.summary_service.get_submissions_in_project(project))
+
+
+class _BulkSummaryRun:
+    """
+    The state of one BulkSummaries.summarise call
+    """
+
+    def __init__(self, bulk_summaries: BulkSummaries):
+        self.summary_service = bulk_summaries.summary_service
+        self.pool = bulk_summaries.pool
+        self.entity_type_pool = bulk_summaries.entity_type_pool
+        self.max_tasks_in_flight = bulk_summaries.max_tasks_in_flight
+        self.logger = bulk_summaries.logger
+
+        self.pending = dict()  # future -> (task, uuid)
+        self.queued = deque()  # (task, uuid, function, args) waiting for a place on the pool
+        self.requested_submissions: Set[str] = set()
+        self.summarising: Set[str] = set()
+        self.submission_summaries: Dict[str, SubmissionSummary] = dict()
+        self.failed_submissions: Dict[str, Exception] = dict()
+        self.projects_waiting_for: Dict[str, List[str]] = dict()  # submission uuid -> project uuids
+        self.project_summaries: Dict[str, ProjectSummary] = dict()
+        self.project_submissions_left: Dict[str, int] = dict()
+
+    def submit(self, task, uuid, function, *args):
+        self.queued.append((task, uuid, function, args))
+        self.submit_queued()
+
+    def submit_queued(self):
+        while self.queued and len(self.pending) < self.max_tasks_in_flight:
+            task, uuid, function, args = self.queued.popleft()
+            self.pending[self.pool.submit(function, *args)] = (task, uuid)
+
+    def results(self) -> Generator[dict, None, None]:
+        try:
+            while self.pending:
+                done, _ = wait(self.pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task, uuid = self.pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        yield from self.failed(task, uuid, e)
+                    else:
+                        yield from self.completed(task, uuid, result)
+                    self.submit_queued()
+        finally:
+            # the generator was closed, or failed, before every summary was yielded
+            self.queued.clear()
+            for future in self.pending:
+                future.cancel()
+
+    def completed(self, task, uuid, result) -> Generator[dict, None, None]:
+        if task == 'resolve_submission':
+            self.requested_submissions.add(uuid)
+            yield from self.summarise_submission(result)
+        elif task == 'resolve_project':
+            submissions = {self.summary_service.uuid_from_submission(submission): submission for submission in result}
+            self.project_summaries[uuid] = ProjectSummary()
+            self.project_submissions_left[uuid] = len(submissions)
+            if not submissions:
+                yield self.project_record(uuid)
+            for submission_uuid, submission in submissions.items():
+                self.projects_waiting_for.setdefault(submission_uuid, []).append(uuid)
+                yield from self.summarise_submission(submission)
+        elif task == 'summarise_submission':
+            self.submission_summaries[uuid] = result
+            yield from self.submission_done(uuid)
+
+    def failed(self, task, uuid, error) -> Generator[dict, None, None]:
+        self.logger.warning(f'Bulk summary {task} failed for {uuid}: {error}')
+        if task == 'resolve_submission':
+            yield {'type': 'submission', 'uuid': uuid, 'error': str(error)}
+        elif task == 'resolve_project':
+            yield {'type': 'project', 'uuid': uuid, 'error': str(error)}
+        elif task == 'summarise_submission':
+            self.failed_submissions[uuid] = error
+            yield from self.submission_done(uuid)
+
+    def summarise_submission(self, submission) -> Generator[dict, None, None]:
+        submission_uuid = self.summary_service.uuid_from_submission(submission)
+        if submission_uuid in self.submission_summaries or submission_uuid in self.failed_submissions:
+            yield from self.submission_done(submission_uuid)
+        elif submission_uuid not in self.summarising:
+            self.summarising.add(submission_uuid)
+            self.submit('summarise_submission', submission_uuid, self.summary_service.summary_for_submission,
+                        submission, self.entity_type_pool)
+
+    def submission_done(self, submission_uuid) -> Generator[dict, None, None]:
+        """
+        yields the records completed by the submission's summary, or failure: the submission's own, if it was
+        requested, and those of the requested projects it was the last outstanding submission of
+        """
+        summary = self.submission_summaries.get(submission_uuid)
+        error = self.failed_submissions.get(submission_uuid)
+        if submission_uuid in self.requested_submissions:
+            self.requested_submissions.remove(submission_uuid)
+            if error is None:
+                yield {'type': 'submission', 'uuid': submission_uuid, 'summary': summary.to_dict()}
+            else:
+                yield {'type': 'submission', 'uuid': submission_uuid, 'error': str(error)}
+
+        for project_uuid in self.projects_waiting_for.pop(submission_uuid, []):
+            project_summary = self.project_summaries[project_uuid]
+            if error is None:
+                project_summary.add_submission_summary(summary)
+            else:
+                project_summary.complete = False
+            self.project_submissions_left[project_uuid] -= 1
+            if self.project_submissions_left[project_uuid] == 0:
+                yield self.project_record(project_uuid)
+
+    def project_record(self, project_uuid) -> dict:
+        return {'type': 'project', 'uuid': project_uuid, 'summary': self.project_summaries[project_uuid].to_dict()}
@@ -0,0 +1,81 @@
+from functools import reduce
+from typing import Any, Iterable
+
+
+class Reducer:
+    """
+    Combines the values found by a scrape directive into a single result, one value at a time.
+
+    Values are folded into an accumulator as they are found, so a directive keeps O(1) state rather than every value
+    it matched. Accumulators of partial scrapes (e.g of separate pages, threads or submissions) can be merged.
+    add and merge may update the accumulator in place, and return the accumulator to use from then on.
+    """
+
+    def init(self) -> Any:
+        raise NotImplementedError
+
+    def add(self, accumulator, value) -> Any:
+        raise NotImplementedError
+
+    def merge(self, accumulator, other_accumulator) -> Any:
+        raise NotImplementedError
+
+    def finish(self, accumulator) -> Any:
+        return accumulator
+
+    def __call__(self, values: Iterable) -> Any:
+        """
+        reduces a whole collection of values at once
+        """
+        return self.finish(reduce(self.add, values, self.init()))
+
+
+class SumReducer(Reducer):
+    def init(self):
+        return 0
+
+    def add(self, accumulator, value):
+        return accumulator + value
+
+    def merge(self, accumulator, other_accumulator):
+        return accumulator + other_accumulator
+
+
+class CountReducer(Reducer):
+    def init(self):
+        return 0
+
+    def add(self, accumulator, value):
+        return accumulator + 1
+
+    def merge(self, accumulator, other_accumulator):
+        return accumulator + other_accumulator
+
+
+class UniqueReducer(Reducer):
+    def init(self):
+        return set()
+
+    def add(self, accumulator, value):
+        accumulator.add(value)
+        return accumulator
+
+    def merge(self, accumulator, other_accumulator):
+        accumulator.update(other_accumulator)
+        return accumulator
+
+    def finish(self, accumulator):
+        return list(accumulator)
+
+
+class CollectReducer(Reducer):
+    def init(self):
+        return []
+
+    def add(self, accumulator, value):
+        accumulator.append(value)
+        return accumulator
+
+    def merge(self, accumulator, other_accumulator):
+        accumulator.extend(other_accumulator)
+        return accumulator
@@ -0,0 +1,88 @@
+import json
+from dataclasses import dataclass
+from hashlib import md5
+from types import MappingProxyType
+from typing import Dict, List, Mapping
+
+from hca_ingest.template.schema_template import SchemaTemplate
+
+from broker.service.spreadsheet_generation.schema_spec import SchemaSpec, ParseUtils
+
+
+class UnknownSchemaException(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class SchemaIndexEntry:
+    schema_spec: SchemaSpec
+    display_name: str
+    json_schema: Mapping
+
+
+def schema_version(metadata_schema_urls: List[str]) -> str:
+    """
+    identifies a release of the metadata schemas, the urls of which include the version of every schema
+    """
+    return md5(json.dumps(sorted(metadata_schema_urls)).encode("utf-8")).hexdigest()
+
+
+class SchemaIndex:
+    """
+    The parsed SchemaSpec, tab display name and JSON schema of every schema in a SchemaTemplate, by schema name.
+
+    Built once for a release of the schemas, so laying out spreadsheet tabs is dictionary lookups rather than
+    re-parsing schemas and scanning the template's tabs and JSON schemas. The SchemaSpecs are shared by every
+    spreadsheet generated from the index, and mustn't be modified.
+    """
+
+    def __init__(self, schema_template: SchemaTemplate):
+        self.schema_template = schema_template
+        self.version = schema_version(schema_template.metadata_schema_urls)
+
+        display_names = {name: tab["display_name"] for tab in schema_template.tabs for name, tab in tab.items()}
+        json_schemas = {json_schema["name"]: json_schema for json_schema in schema_template.json_schemas
+                        if "name" in json_schema}
+        entries: Dict[str, SchemaIndexEntry] = {}
+        parse_errors: Dict[str, Exception] = {}
+        for schema_name, metadata_properties in schema_template.meta_data_properties.items():
+            try:
+                schema_spec = ParseUtils.parse_schema_spec(schema_name, metadata_properties)
+            except Exception as e:
+                # only raised if the schema is used, as it was when schemas were parsed on demand, so one schema that
+                # can't be parsed, e.g with a value type ParseUtils doesn't know, doesn't fail every spreadsheet
+                parse_errors[schema_name] = e
+                continue
+            entries[schema_name] = SchemaIndexEntry(schema_spec, display_names.get(schema_name),
+                                                    MappingProxyType(json_schemas.get(schema_name, {})))
+        self._entries = MappingProxyType(entries)
+        self._parse_errors = MappingProxyType(parse_errors)
+
+    def entry(self, schema_name: str) -> SchemaIndexEntry:
+        try:
+            return self._entries[schema_name]
+        except KeyError:
+            if schema_name in self._parse_errors:
+                raise self._parse_errors[schema_name]
+            raise UnknownSchemaException(f'Unknown schema: {schema_name}')
+
+    def schema_spec(self, schema_name: str) -> SchemaSpec:
+        return self.entry(schema_name).schema_spec
+
+    def display_name(self, schema_name: str) -> str:
+        display_name = self.entry(schema_name).display_name
+        if display_name is None:
+            raise UnknownSchemaException(f'No tab for schema: {schema_name}')
+        return display_name
+
+    def sub_module_display_name(self, schema_name: str, sub_module_name: str) -> str:
+        try:
+            return self.entry(schema_name).json_schema["properties"][sub_module_name]["user_friendly"]
+        except (UnknownSchemaException, KeyError):
+            return sub_module_name
+
+    def __contains__(self, schema_name: str) -> bool:
+        return schema_name in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,206 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from hca_ingest.api.ingestapi import IngestApi
+from hca_ingest.template.schema_parser import SchemaParser
+from hca_ingest.template.schema_template import SchemaTemplate
+
+from broker.service.spreadsheet_generation.schema_index import schema_version
+from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetGenerator
+
+SCHEMA_SNAPSHOT_FILENAME = 'schema_snapshot.json'
+DEFAULT_RETRY_INTERVAL = 60
+
+
+def schema_template_snapshot(schema_template: SchemaTemplate) -> Dict:
+    """
+    a JSON serialisable snapshot of everything needed to rebuild the schema template without the network, including
+    the modules its schemas $ref
+    """
+    return {
+        'metadata_schema_urls': schema_template.metadata_schema_urls,
+        'json_schemas': schema_template.json_schemas,
+        'property_migrations': schema_template.property_migrations,
+        'referenced_schemas': dict(SchemaParser.json_loader.store)
+    }
+
+
+def schema_template_from_snapshot(snapshot: Dict) -> SchemaTemplate:
+    # the modules the schemas $ref, which SchemaParser would otherwise fetch to parse them
+    SchemaParser.json_loader.store.update(snapshot.get('referenced_schemas', {}))
+    schema_template = SchemaTemplate(json_schema_docs=snapshot['json_schemas'],
+                                     property_migrations=snapshot['property_migrations'])
+    # as fetched from ingest, which the schemas' ids might not match exactly
+    schema_template.metadata_schema_urls = snapshot['metadata_schema_urls']
+    return schema_template
+
+
+class SchemaTemplateLoader:
+    """
+    Background thread loading the SpreadsheetGenerator's schemas, so the app starts without waiting for them.
+
+    The schemas are loaded from the snapshot at snapshot_path, if there is one, then fetched from ingest and the
+    snapshot rewritten, so a restart is ready as soon as the snapshot is read. Every `refresh_interval` seconds the
+    latest schema urls are checked, and a new release of the schemas is fetched and swapped into the generator.
+    """
+
+    def __init__(self, spreadsheet_generator: SpreadsheetGenerator, ingest_api: IngestApi,
+                 snapshot_path: Optional[str] = None, refresh_interval: Optional[float] = None,
+                 retry_interval: float = DEFAULT_RETRY_INTERVAL):
+        self.spreadsheet_generator = spreadsheet_generator
+        self.ingest_api = ingest_api
+        self.snapshot_path = snapshot_path
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.logger = logging.getLogger(__name__)
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.source = None
+        self.schema_version = None
+        self.loaded_at = None
+        self.checked_at = None
+        self.refreshes = 0
+        self.last_error = None
+
+    @staticmethod
+    def in_storage_dir(spreadsheet_generator: SpreadsheetGenerator, ingest_api: IngestApi, storage_dir: str,
+                       refresh_interval: Optional[float] = None) -> 'SchemaTemplateLoader':
+        return SchemaTemplateLoader(spreadsheet_generator, ingest_api,
+                                    os.path.join(storage_dir, SCHEMA_SNAPSHOT_FILENAME), refresh_interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='schema-template-loader', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def load(self):
+        """
+        Loads the generator's schemas from the snapshot, or from ingest if there isn't a usable snapshot
+        """
+        schema_template = self.spreadsheet_generator.load_schema_template(self._snapshot_or_latest_schema_template)
+        self._loaded(schema_template.metadata_schema_urls, self.source or 'ingest')
+        self._ready.set()
+
+    def refresh(self) -> bool:
+        """
+        Fetches the latest schemas from ingest into the generator if they differ from its current ones
+        :return: whether there were new schemas
+        """
+        latest_urls = self.latest_schema_urls()
+        self.checked_at = _now()
+        if schema_version(latest_urls) == self.schema_version:
+            return False
+        schema_template = self.fetch_schema_template(latest_urls)
+        self.spreadsheet_generator.set_schema_template(schema_template)
+        self._loaded(latest_urls, 'ingest')
+        self.refreshes += 1
+        self.write_snapshot(schema_template)
+        return True
+
+    def latest_schema_urls(self) -> List[str]:
+        latest_schemas = self.ingest_api.get_schemas(high_level_entity="type", latest_only=True)
+        return [schema["_links"]["json-schema"]["href"] for schema in latest_schemas]
+
+    @staticmethod
+    def fetch_schema_template(metadata_schema_urls: List[str]) -> SchemaTemplate:
+        return SchemaTemplate(metadata_schema_urls=metadata_schema_urls)
+
+    def read_snapshot(self) -> Optional[SchemaTemplate]:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return None
+        with open(self.snapshot_path) as snapshot_file:
+            return schema_template_from_snapshot(json.load(snapshot_file))
+
+    def write_snapshot(self, schema_template: SchemaTemplate):
+        """
+        Writes the snapshot to a temporary file renamed over the old one, so a crash mid-write leaves the old snapshot
+        """
+        if not self.snapshot_path:
+            return
+        snapshot = schema_template_snapshot(schema_template)
+        snapshot_dir = os.path.dirname(os.path.abspath(self.snapshot_path))
+        os.makedirs(snapshot_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=snapshot_dir, suffix='.tmp', delete=False) as snapshot_file:
+            try:
+                json.dump(snapshot, snapshot_file)
+            except Exception:
+                snapshot_file.close()
+                os.remove(snapshot_file.name)
+                raise
+        os.replace(snapshot_file.name, self.snapshot_path)
+
+    def status(self) -> dict:
+        return {
+            'ready': self.is_ready(),
+            'source': self.source,
+            'schema_version': self.schema_version,
+            'loaded_at': self.loaded_at,
+            'checked_at': self.checked_at,
+            'refresh_interval': self.refresh_interval,
+            'refreshes': self.refreshes,
+            'last_error': self.last_error
+        }
+
+    def _snapshot_or_latest_schema_template(self) -> SchemaTemplate:
+        try:
+            schema_template = self.read_snapshot()
+            if schema_template:
+                self.source = 'snapshot'
+                return schema_template
+        except Exception as e:
+            self.logger.warning(f'Could not read the schema snapshot {self.snapshot_path}: {e}')
+        schema_template = self.fetch_schema_template(self.latest_schema_urls())
+        self.source = 'ingest'
+        self.write_snapshot(schema_template)
+        return schema_template
+
+    def _loaded(self, metadata_schema_urls: List[str], source: str):
+        self.schema_version = schema_version(metadata_schema_urls)
+        self.source = source
+        self.loaded_at = _now()
+        self.last_error = None
+
+    def _run(self):
+        while not self._stopped.is_set() and not self.is_ready():
+            try:
+                self.load()
+                self.logger.info(f'Loaded schemas from {self.source}')
+            except Exception as e:
+                self.last_error = str(e)
+                self.logger.exception(f'Loading schemas failed: {e}')
+                self._stopped.wait(self.retry_interval)
+
+        # a snapshot may be from long ago, so is refreshed straight away
+        if self.source == 'snapshot' and not self._stopped.is_set():
+            self._try_refresh()
+        while self.refresh_interval and not self._stopped.wait(self.refresh_interval):
+            self._try_refresh()
+
+    def _try_refresh(self):
+        try:
+            if self.refresh():
+                self.logger.info(f'Refreshed schemas to version {self.schema_version}')
+        except Exception as e:
+            self.last_error = str(e)
+            self.logger.exception(f'Refreshing schemas failed: {e}')
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
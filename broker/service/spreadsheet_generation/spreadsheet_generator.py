@@ -1,3 +1,4 @@
+import threading
 from copy import copy
 
 from hca_ingest.api.ingestapi import IngestApi
@@ -6,16 +7,18 @@ from hca_ingest.template.vanilla_spreadsheet_builder import VanillaSpreadsheetBu
 from hca_ingest.template.tab_config import TabConfig
 
 from broker.service.spreadsheet_generation import type_spec_utils
-from broker.service.spreadsheet_generation.schema_spec import SchemaSpec, ParseUtils, FieldSpec, ObjectSpec, StringSpec, IntegerSpec, NumberSpec, OntologySpec, BooleanSpec
+# UnknownSchemaException was defined here before moving to schema_index, so is still importable from here
+from broker.service.spreadsheet_generation.schema_index import SchemaIndex, UnknownSchemaException
+from broker.service.spreadsheet_generation.tab_layout_cache import TabLayoutCache, SpreadsheetTemplateCache
+from broker.service.spreadsheet_generation.schema_spec import SchemaSpec, FieldSpec, ObjectSpec, StringSpec, IntegerSpec, NumberSpec, OntologySpec, BooleanSpec
 
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Union
+from typing import Callable, List, Dict, Optional, Union
 
 from functools import reduce
 from operator import iconcat
 
 import tempfile
-import yaml
 from hashlib import md5
 from collections import OrderedDict
 import json
@@ -105,6 +108,16 @@ class TypeSpec:
             "linkSpec": self.link_spec.to_json_dict() if self.link_spec is not None else None
         })
 
+    def canonical(self) -> 'TypeSpec':
+        """
+        an equivalent TypeSpec with its modules and links sorted, and no links given as empty links
+        """
+        include_modules = IncludeSomeModules(sorted(set(self.include_modules.modules))) \
+            if isinstance(self.include_modules, IncludeSomeModules) else IncludeAllModules()
+        link_spec = self.link_spec if self.link_spec is not None else LinkSpec()
+        return TypeSpec(self.schema_name, include_modules, self.embed_process,
+                        LinkSpec(sorted(set(link_spec.link_entities)), sorted(set(link_spec.link_protocols))))
+
 
 @dataclass
 class SpreadsheetSpec:
@@ -122,13 +135,24 @@ class SpreadsheetSpec:
             "types": [t_spec.to_json_dict() for t_spec in self.types]
         })
 
-    def hashcode(self) -> str:
+    def canonical(self) -> 'SpreadsheetSpec':
+        """
+        an equivalent SpreadsheetSpec with canonical types, in the order their tabs are generated in whatever order
+        they were given
+        """
+        type_specs = sorted((type_spec.canonical() for type_spec in self.types), key=lambda type_spec: type_spec.schema_name)
+        type_spec_utils.sort(type_specs)
+        return SpreadsheetSpec(type_specs)
+
+    def hashcode(self, schema_version: Optional[str] = None) -> str:
         """
-        generate an md5 checksum of this spec, for purpose of identifying spreadsheets generated from this spec
+        generate an md5 checksum of this spec, for purpose of identifying spreadsheets generated from this spec.
+        Equivalent specs, e.g listing the same types or links in a different order, have the same hashcode.
+
+        :param schema_version: the version of the schemas the spreadsheet is generated from
         """
-        spreadsheet_spec_dict = self.to_dict()
-        sorted_keys = dict(sorted(spreadsheet_spec_dict.items()))
-        return md5(json.dumps(sorted_keys).encode("utf-8")).hexdigest()
+        canonical_spec_dict = dict(self.canonical().to_dict(), schemaVersion=schema_version)
+        return md5(json.dumps(canonical_spec_dict, sort_keys=True).encode("utf-8")).hexdigest()
 
 
 @dataclass
@@ -145,58 +169,147 @@ class ParsedTab:
     sub_tabs: List['ParsedTab']
 
 
-class UnknownSchemaException(Exception):
-    pass
-
-
 class SpreadsheetGenerator:
 
-    def __init__(self, ingest_api: IngestApi):
+    def __init__(self, ingest_api: IngestApi, schema_template: Optional[SchemaTemplate] = None):
+        """
+        :param schema_template: the schemas to generate spreadsheets from. If not given, the latest schemas are
+        fetched from ingest when first needed, unless loaded before then with load_schema_template
+        """
         self.ingest_api = ingest_api
-        self.schema_template = SchemaTemplate(ingest_api_url=ingest_api.url)
+        self.tab_layout_cache = TabLayoutCache()
+        self.spreadsheet_template_cache = SpreadsheetTemplateCache()
+        self._schema_index: Optional[SchemaIndex] = None
+        self._load_lock = threading.Lock()
+        if schema_template:
+            self.set_schema_template(schema_template)
+
+    @property
+    def schema_index(self) -> SchemaIndex:
+        schema_index = self._schema_index
+        if schema_index is None:
+            self.load_schema_template(lambda: SchemaTemplate(ingest_api_url=self.ingest_api.url))
+            schema_index = self._schema_index
+        return schema_index
+
+    @property
+    def schema_template(self) -> SchemaTemplate:
+        return self.schema_index.schema_template
+
+    @property
+    def is_ready(self) -> bool:
+        return self._schema_index is not None
+
+    @property
+    def schema_version(self) -> Optional[str]:
+        """
+        the version of the schemas spreadsheets are generated from, or None if they haven't been loaded yet
+        """
+        schema_index = self._schema_index
+        return schema_index.version if schema_index else None
+
+    def load_schema_template(self, load: Callable[[], SchemaTemplate]) -> SchemaTemplate:
+        """
+        sets the schema template returned by load() unless one is already set. Concurrent callers wait for the first
+        to load, so the schemas are only fetched once.
+        """
+        with self._load_lock:
+            if self._schema_index is None:
+                self.set_schema_template(load())
+            return self._schema_index.schema_template
+
+    def set_schema_template(self, schema_template: SchemaTemplate):
+        """
+        switches to a new release of the schemas, dropping the tab layouts of the previous one. The template and its
+        index are swapped in as a single reference, so are never seen out of step.
+        """
+        previous_schema_index = self._schema_index
+        self._schema_index = SchemaIndex(schema_template)
+        if previous_schema_index:
+            self.tab_layout_cache.clear()
+            self.spreadsheet_template_cache.clear()
+
+    def stats(self) -> Dict:
+        return {
+            'schema_version': self.schema_version,
+            'tab_layout_cache': self.tab_layout_cache.stats(),
+            'spreadsheet_template_cache': self.spreadsheet_template_cache.stats()
+        }
 
     def generate(self, spreadsheet_spec: SpreadsheetSpec, output_file_path: Optional[str]) -> str:
+        """
+        generates the spreadsheet from a single release of the schemas, even if they're refreshed part way through
+        """
+        schema_index = self.schema_index
         parsed_tabs = []
         type_specs = copy(spreadsheet_spec.types)
         type_spec_utils.sort(type_specs)
         for type_spec in type_specs:
-            tab_for_type = self.tab_for_type(type_spec)
+            tab_for_type = self.tab_for_type(type_spec, schema_index)
             parsed_tabs.append(tab_for_type)
 
         template_tabs = self.template_tabs_from_parsed_tabs(parsed_tabs)
 
         yml = TemplateYaml(template_tabs)
 
-        return self.spreadsheet_from_template_yaml(yml, output_file_path)
+        return self.spreadsheet_from_template_yaml(yml, output_file_path, schema_index)
+
+    def spreadsheet_from_template_yaml(self, template_yaml: TemplateYaml, output_file_path: Optional[str],
+                                       schema_index: Optional[SchemaIndex] = None) -> str:
+        spreadsheet_file = open(output_file_path, "w") if output_file_path is not None else tempfile.NamedTemporaryFile('w')
+
+        spreadsheet_builder = VanillaSpreadsheetBuilder(spreadsheet_file.name, True)
+        spreadsheet_builder.include_schemas_tab = True
+        spreadsheet_builder.build(self.spreadsheet_template(template_yaml, schema_index))
+        spreadsheet_builder.save_spreadsheet()
+        spreadsheet_file.close()
 
-    def spreadsheet_from_template_yaml(self, template_yaml: TemplateYaml, output_file_path: Optional[str]) -> str:
-        with tempfile.NamedTemporaryFile('w') as yaml_file:
-            yaml.dump(template_yaml.to_yml_dict(), yaml_file)
-            tab_config = TabConfig().load(yaml_file.name)
-            spreadsheet_file = open(output_file_path, "w") if output_file_path is not None else tempfile.NamedTemporaryFile('w')
+        return spreadsheet_file.name
 
-            spreadsheet_builder = VanillaSpreadsheetBuilder(spreadsheet_file.name, True)
-            spreadsheet_builder.include_schemas_tab = True
-            spreadsheet_builder.build(SchemaTemplate(self.ingest_api.url, json_schema_docs=self.schema_template.json_schemas, tab_config=tab_config))
-            spreadsheet_builder.save_spreadsheet()
-            spreadsheet_file.close()
+    def spreadsheet_template(self, template_yaml: TemplateYaml,
+                             schema_index: Optional[SchemaIndex] = None) -> SchemaTemplate:
+        """
+        the schema template with its tab config replaced by the template_yaml's tabs, for building a spreadsheet.
+
+        Shares everything else with this generator's schema template, or that of schema_index if given, which
+        spreadsheet builders only read, rather than parsing the schemas again. Cached for jobs requesting the same tabs.
+        """
+        tab_config_dict = template_yaml.to_yml_dict()
+        schema_index = schema_index if schema_index is not None else self.schema_index
+        schema_template = schema_index.schema_template
+        key = (schema_index.version, json.dumps(tab_config_dict))
 
-            return spreadsheet_file.name
+        def with_tab_config() -> SchemaTemplate:
+            spreadsheet_template = copy(schema_template)
+            spreadsheet_template.spreadsheet_configuration = TabConfig(tab_config_dict)
+            return spreadsheet_template
 
-    def tab_for_type(self, type_spec: TypeSpec) -> ParsedTab:
+        return self.spreadsheet_template_cache.get_or_generate(key, with_tab_config)
+
+    def tab_for_type(self, type_spec: TypeSpec, schema_index: Optional[SchemaIndex] = None) -> ParsedTab:
+        """
+        the layout of the tab for type_spec, which is cached and shared with other callers so mustn't be modified
+        :param schema_index: the release of the schemas to lay the tab out from, if not the current one
+        """
+        schema_index = schema_index if schema_index is not None else self.schema_index
+        type_spec_json = json.dumps(type_spec.to_json_dict(), sort_keys=True)
+        return self.tab_layout_cache.get_or_generate((schema_index.version, type_spec_json),
+                                                     lambda: self._layout_tab(type_spec, schema_index))
+
+    def _layout_tab(self, type_spec: TypeSpec, schema_index: SchemaIndex) -> ParsedTab:
         schema_name = type_spec.schema_name
-        schema_properties = self.metadata_properties_for_type(schema_name)
-        schema_spec = ParseUtils.parse_schema_spec(schema_name, schema_properties)
+        schema_spec = schema_index.schema_spec(schema_name)
 
-        parsed_tab = self._generate_tab(self.tab_name_for_type(schema_spec), schema_spec,
+        parsed_tab = self._generate_tab(self.tab_name_for_type(schema_spec, schema_index), schema_spec,
                                         include_modules=type_spec.include_modules,
-                                        context=[schema_name])
-        parsed_tab.columns.extend(self.links_for_tab(type_spec))
-        parsed_tab.columns.extend(self.process_columns() if type_spec.embed_process else [])
+                                        context=[schema_name], schema_index=schema_index)
+        parsed_tab.columns.extend(self.links_for_tab(type_spec, schema_index))
+        parsed_tab.columns.extend(self.process_columns(schema_index) if type_spec.embed_process else [])
 
         return parsed_tab
 
-    def _generate_tab(self, tab_name: str, schema_spec: SchemaSpec, include_modules: IncludeModules, context: List[str]) -> ParsedTab:
+    def _generate_tab(self, tab_name: str, schema_spec: SchemaSpec, include_modules: IncludeModules, context: List[str],
+                      schema_index: SchemaIndex) -> ParsedTab:
         columns: List[TabColumn] = []
         subtabs: List[ParsedTab] = []
 
@@ -210,9 +323,9 @@ class SpreadsheetGenerator:
                         columns.extend(self.columns_for_field(field, context=context + [field.field_name]))
                     else:
                         # generate sub-tabs for this multivalue module
-                        subtab_name = f'{tab_name} - {self.tab_name_for_sub_module(schema_spec, field)}'
+                        subtab_name = f'{tab_name} - {self.tab_name_for_sub_module(schema_spec, field, schema_index)}'
                         subtab = self._generate_tab(subtab_name, field, IncludeAllModules(),
-                                                    context=context + [field.field_name])
+                                                    context=context + [field.field_name], schema_index=schema_index)
                         subtabs.append(subtab)
                 else:
                     columns.extend(self.columns_for_field(field, context=context + [field.field_name]))
@@ -221,37 +334,26 @@ class SpreadsheetGenerator:
 
         return ParsedTab(schema_spec.field_name, tab_name, columns, subtabs)
 
-    # TODO: make this a method of SchemaTemplate, and refactor SchemaTemplate.tabs to make this less nutty
-    def tab_name_for_type(self, schema_spec: SchemaSpec) -> str:
-        tab_config_entry = list(filter(lambda entry: schema_spec.field_name in entry, self.schema_template.tabs))[0]
-        tab_display_name = tab_config_entry[schema_spec.field_name]["display_name"]
-        return tab_display_name
+    def tab_name_for_type(self, schema_spec: SchemaSpec, schema_index: Optional[SchemaIndex] = None) -> str:
+        schema_index = schema_index if schema_index is not None else self.schema_index
+        return schema_index.display_name(schema_spec.field_name)
 
-    def tab_name_for_sub_module(self, parent_schema: SchemaSpec, sub_module: SchemaSpec):
-        try:
-            parent_schema_json = [s for s in self.schema_template.json_schemas
-                                  if "name" in s and s["name"] == parent_schema.field_name][0]
-            sub_schema_display_name = parent_schema_json["properties"][sub_module.field_name]["user_friendly"]
-            return sub_schema_display_name
-        except (IndexError, KeyError):
-            return sub_module.field_name
-
-    def metadata_properties_for_type(self, schema_name: str) -> Dict:
-        try:
-            return self.schema_template.meta_data_properties[schema_name]
-        except KeyError as e:
-            raise UnknownSchemaException(f'Unknown schema: {schema_name}')
+    def tab_name_for_sub_module(self, parent_schema: SchemaSpec, sub_module: SchemaSpec,
+                                schema_index: Optional[SchemaIndex] = None):
+        schema_index = schema_index if schema_index is not None else self.schema_index
+        return schema_index.sub_module_display_name(parent_schema.field_name, sub_module.field_name)
 
-    def links_for_tab(self, type_spec: TypeSpec) -> List[TabColumn]:
+    def links_for_tab(self, type_spec: TypeSpec, schema_index: Optional[SchemaIndex] = None) -> List[TabColumn]:
+        schema_index = schema_index if schema_index is not None else self.schema_index
         link_spec = type_spec.link_spec
         if not link_spec:
             return []
         else:
-            return [self.link_column_for_schema(ParseUtils.parse_schema_spec(entity, self.metadata_properties_for_type(entity)))
+            return [self.link_column_for_schema(schema_index.schema_spec(entity), schema_index)
                     for entity in link_spec.link_entities + link_spec.link_protocols]
 
-    def link_column_for_schema(self, schema_spec: SchemaSpec) -> TabColumn:
-        display_name = self.tab_name_for_type(schema_spec)
+    def link_column_for_schema(self, schema_spec: SchemaSpec, schema_index: Optional[SchemaIndex] = None) -> TabColumn:
+        display_name = self.tab_name_for_type(schema_spec, schema_index)
 
         if schema_spec.domain_entity == "biomaterial":
             return TabColumn(name=f'{display_name} - ID',
@@ -306,8 +408,9 @@ class SpreadsheetGenerator:
             return SpreadsheetGenerator.flatten([SpreadsheetGenerator.columns_for_field(field, context + [field.field_name])
                                                  for field in field.fields])
 
-    def process_columns(self) -> List[TabColumn]:
-        process_schema_spec = ParseUtils.parse_schema_spec("process", self.metadata_properties_for_type("process"))
+    def process_columns(self, schema_index: Optional[SchemaIndex] = None) -> List[TabColumn]:
+        schema_index = schema_index if schema_index is not None else self.schema_index
+        process_schema_spec = schema_index.schema_spec("process")
         return SpreadsheetGenerator.columns_for_field(process_schema_spec, ["process"])
 
     @staticmethod
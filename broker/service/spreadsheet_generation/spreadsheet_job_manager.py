@@ -1,12 +1,35 @@
-from dataclasses import dataclass
-from typing import Dict, BinaryIO, Optional
+from dataclasses import dataclass, replace
+from typing import Dict, BinaryIO, Optional, List
+import glob
+import hashlib
 import json
+import os
+import socket
+import tempfile
+import threading
+import time
 from enum import Enum
 from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetGenerator, SpreadsheetSpec
+from broker.service.spreadsheet_generation.spreadsheet_process_pool import SpreadsheetProcessPool
 import logging
 
+DEFAULT_MAX_QUEUED_JOBS = 100
+DEFAULT_LEASE_DURATION = 60
+MAX_JOB_ATTEMPTS = 3
+MAX_COMPLETED_JOBS = 1000
+QUEUE_FULL_RETRY_AFTER = 30
+LEASE_SUFFIX = '.lease'
+CLAIM_SUFFIX = '.claim'
+
+
+class JobQueueFullException(Exception):
+    def __init__(self, max_queued_jobs: int):
+        super().__init__(f'There are already {max_queued_jobs} spreadsheet jobs queued')
+        self.max_queued_jobs = max_queued_jobs
+
 
 class JobStatus(Enum):
     STARTED = "STARTED"
@@ -20,11 +43,17 @@ class JobSpec:
     job_id: str
     spreadsheet_path: str
     filename: str
+    spreadsheet_hash: Optional[str] = None  # sha256 of the generated spreadsheet, once the job is complete
+    schema_version: Optional[str] = None  # version of the schemas the spreadsheet was generated from
+    spreadsheet_spec: Optional[Dict] = None  # what to generate, so the job can be requeued after a restart
+    attempts: int = 0  # how many times the spreadsheet has started being generated
 
     @staticmethod
     def from_dict(data: Dict) -> 'JobSpec':
         try:
-            return JobSpec(JobStatus[data["status"]], data["job_id"], data["spreadsheet_path"], data["filename"])
+            return JobSpec(JobStatus[data["status"]], data["job_id"], data["spreadsheet_path"], data["filename"],
+                           data.get("spreadsheet_hash"), data.get("schema_version"), data.get("spreadsheet_spec"),
+                           data.get("attempts", 0))
         except:
             raise
 
@@ -33,44 +62,397 @@ class JobSpec:
             "status": self.status.value,
             "job_id": self.job_id,
             "spreadsheet_path": self.spreadsheet_path,
-            "filename": self.filename
+            "filename": self.filename,
+            "spreadsheet_hash": self.spreadsheet_hash,
+            "schema_version": self.schema_version,
+            "spreadsheet_spec": self.spreadsheet_spec,
+            "attempts": self.attempts
         }
 
 
 class SpreadsheetJobManager:
-    def __init__(self, spreadsheet_generator: SpreadsheetGenerator, output_dir_path: str, worker_pool: Optional[ThreadPoolExecutor]=None):
+    """
+    Queues spreadsheet jobs durably in output_dir_path: each unfinished job's <job_id>.json records the spec to
+    generate, and its <job_id>.lease is touched every lease_duration / 3 seconds while this manager holds the job,
+    queued or running. Once started, the manager requeues jobs whose lease has expired, e.g when the broker was
+    restarted, or killed, mid-job. A job abandoned MAX_JOB_ATTEMPTS times, or whose worker process died that often,
+    is failed rather than retried again. Brokers may share output_dir_path: an expired lease is claimed by creating
+    a <job_id>.<lease mtime>.claim file exclusively, so only one of them takes each abandoned job over, and
+    spreadsheets are generated to a temporary file that's renamed into place.
+
+    At most max_queued_jobs unfinished jobs are held at once, beyond which new jobs are refused with
+    JobQueueFullException.
+
+    The specs of the jobs the manager holds, and of the last MAX_COMPLETED_JOBS completed ones, are kept in memory,
+    so polling a job's status doesn't read its file. They're replaced, never changed, under the jobs lock, and read
+    without it.
+    """
+
+    def __init__(self, spreadsheet_generator: SpreadsheetGenerator, output_dir_path: str, worker_pool: Optional[ThreadPoolExecutor]=None,
+                 process_pool: Optional[SpreadsheetProcessPool]=None, max_queued_jobs: Optional[int]=None,
+                 lease_duration: Optional[float]=None):
+        """
+        :param worker_pool: threads running jobs, which generate spreadsheets themselves or wait on the process_pool
+        :param process_pool: if given, spreadsheets are generated in its processes rather than in worker_pool threads
+        """
         self.spreadsheet_generator = spreadsheet_generator
         self.output_dir_path = output_dir_path
         self.worker_pool = worker_pool if worker_pool is not None else ThreadPoolExecutor(5)
+        self.process_pool = process_pool
+        self.max_queued_jobs = max_queued_jobs if max_queued_jobs else DEFAULT_MAX_QUEUED_JOBS
+        self.lease_duration = lease_duration if lease_duration else DEFAULT_LEASE_DURATION
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+
+        self._running_jobs: Dict[str, JobSpec] = dict()
+        self._completed_jobs: Dict[str, JobSpec] = dict()
+        self._jobs_lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.requeued = 0
+        self.retried = 0
+        self.rejected = 0
 
         self.logger = logging.getLogger(__name__)
 
+    def start(self):
+        """
+        requeues jobs abandoned before a restart, then renews the leases of this manager's jobs, and requeues
+        abandoned ones, in the background. Jobs can't be requeued without an output_dir_path, so nothing is started.
+        """
+        if not self.output_dir_path:
+            self.logger.warning("No spreadsheet output directory, so abandoned spreadsheet jobs won't be requeued")
+            return
+        self.requeue_abandoned_jobs()
+        self._thread = threading.Thread(target=self._run, name='spreadsheet-job-leases', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
     def create_job(self, spreadsheet_spec: SpreadsheetSpec, filename: str) -> JobSpec:
-        job_id = spreadsheet_spec.hashcode()
+        """
+        Starts generating the spreadsheet, unless it's already being generated, in which case the caller shares that
+        job, or has already been generated from the current schemas, in which case the completed job is returned.
+        A shared or completed job keeps the filename it was first requested with.
+        """
+        spreadsheet_spec = spreadsheet_spec.canonical()
+        job_id = spreadsheet_spec.hashcode(self.spreadsheet_generator.schema_version)
         spreadsheet_output_path = f'{self.output_dir_path}/{job_id}.xlsx'
-        job_spec = JobSpec(JobStatus.STARTED, job_id, spreadsheet_output_path, filename)
-        job_spec_path = f'{self.output_dir_path}/{job_id}.json'
+        job_spec_path = self._job_spec_path(job_id)
 
-        with open(job_spec_path, "w") as job_spec_file:
-            json.dump(job_spec.to_dict(), job_spec_file)
+        with self._jobs_lock:
+            running_job_spec = self._running_jobs.get(job_id)
+            if running_job_spec:
+                return running_job_spec
+            completed_job_spec = self._completed_job_spec(job_id)
+            if completed_job_spec:
+                return completed_job_spec
+            leased = os.path.exists(self._lease_path(job_id))
+            if leased and not self._lease_expired(job_id):
+                # another broker sharing output_dir_path holds the job
+                leased_job_spec = self._leased_job_spec(job_id)
+                if leased_job_spec:
+                    return leased_job_spec
+            # the queue is checked before an abandoned job's lease is claimed, so a refused job can still be requeued
+            if len(self._running_jobs) >= self.max_queued_jobs:
+                self.rejected += 1
+                raise JobQueueFullException(self.max_queued_jobs)
+            claim_path = self._claim_expired_lease(job_id) if leased else None
+            if leased and not claim_path:
+                # another broker has just taken the abandoned job over
+                leased_job_spec = self._leased_job_spec(job_id)
+                if leased_job_spec:
+                    return leased_job_spec
 
-        self.worker_pool.submit(lambda: self._do_create_spreadsheet_job(spreadsheet_spec, job_spec_path, spreadsheet_output_path))
+            job_spec = JobSpec(JobStatus.STARTED, job_id, spreadsheet_output_path, filename,
+                               spreadsheet_spec=spreadsheet_spec.to_dict(), attempts=1)
+            try:
+                # the lease is taken first, so the job is never seen unfinished without one
+                self._write_lease(job_id)
+                self.write_job_spec(job_spec, job_spec_path)
+            except Exception:
+                self._release_claim(claim_path)
+                raise
+            self._running_jobs[job_id] = job_spec
+            # a completed job is rerun when its spreadsheet has gone
+            self._completed_jobs.pop(job_id, None)
+
+        self.worker_pool.submit(self._do_create_spreadsheet_job, job_id)
 
         return job_spec
 
-    def _do_create_spreadsheet_job(self, spreadsheet_spec: SpreadsheetSpec, job_spec_path: str, output_path: str):
-        job_result = self._maybe_create_spreadsheet(spreadsheet_spec, output_path)
-        job_spec = self.load_job_spec_from_path(job_spec_path)
-        completed_job_spec = JobSpec(job_result, job_spec.job_id, output_path, job_spec.filename)
-        self.write_job_spec(completed_job_spec, job_spec_path)
+    def requeue_abandoned_jobs(self) -> List[str]:
+        """
+        Requeues the unfinished jobs in output_dir_path whose lease has expired, as long as there are fewer than
+        max_queued_jobs queued. Any others are requeued by a later call.
+        :return: the ids of the requeued jobs
+        """
+        requeued_job_ids = []
+        for lease_path in glob.glob(os.path.join(self.output_dir_path, f'*{LEASE_SUFFIX}')):
+            job_id = os.path.basename(lease_path)[:-len(LEASE_SUFFIX)]
+            with self._jobs_lock:
+                if job_id in self._running_jobs or not self._lease_expired(job_id):
+                    continue
+                if len(self._running_jobs) >= self.max_queued_jobs:
+                    break
+                abandoned_by = self._read_lease(lease_path)
+                claim_path = self._claim_expired_lease(job_id)
+                if not claim_path:
+                    continue
+                try:
+                    job_spec = self._abandoned_job_spec(job_id)
+                    if not job_spec:
+                        continue
+                    job_spec = replace(job_spec, attempts=job_spec.attempts + 1)
+                    self._write_lease(job_id)
+                    self.write_job_spec(job_spec, self._job_spec_path(job_id))
+                except Exception:
+                    self._release_claim(claim_path)
+                    raise
+                self._running_jobs[job_id] = job_spec
+                self.requeued += 1
+
+            self.logger.warning(f'Requeued spreadsheet job {job_id} abandoned by {abandoned_by}, '
+                                f'attempt {job_spec.attempts}')
+            self.worker_pool.submit(self._do_create_spreadsheet_job, job_id)
+            requeued_job_ids.append(job_id)
+        return requeued_job_ids
 
-    def _maybe_create_spreadsheet(self, spreadsheet_spec: SpreadsheetSpec, output_path: str) -> JobStatus:
+    def _abandoned_job_spec(self, job_id: str) -> Optional[JobSpec]:
+        """
+        :return: the spec of the abandoned job, if it can be requeued. Otherwise the job is failed, or its lease is
+        removed if it has finished after all.
+        """
         try:
-            self.spreadsheet_generator.generate(spreadsheet_spec, output_path)
-            return JobStatus.COMPLETE
+            job_spec = self.load_job_spec(job_id)
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning(f'Ignoring abandoned spreadsheet job {job_id} with an unreadable job spec: {e}')
+            return None
+        if job_spec.status != JobStatus.STARTED:
+            self._remove_lease(job_id)
+            return None
+        if job_spec.spreadsheet_spec is None or job_spec.attempts >= MAX_JOB_ATTEMPTS:
+            self.logger.error(f'Failing abandoned spreadsheet job {job_id} after {job_spec.attempts} attempts')
+            self.write_job_spec(replace(job_spec, status=JobStatus.ERROR), self._job_spec_path(job_id))
+            self._remove_lease(job_id)
+            return None
+        return job_spec
+
+    def _leased_job_spec(self, job_id: str) -> Optional[JobSpec]:
+        """
+        :return: the spec of the job, if it's unfinished, as written by the broker holding its lease
+        """
+        try:
+            job_spec = self.load_job_spec_from_path(self._job_spec_path(job_id))
+        except (OSError, ValueError, KeyError):
+            return None
+        return job_spec if job_spec.status == JobStatus.STARTED else None
+
+    def _completed_job_spec(self, job_id: str) -> Optional[JobSpec]:
+        """
+        :return: the job's spec if its spreadsheet was generated from the current schemas, and is still there
+        """
+        try:
+            job_spec = self.load_job_spec(job_id)
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as e:
+            self.logger.warning(f'Ignoring unreadable job spec {self._job_spec_path(job_id)}: {e}')
+            return None
+        schema_version = self.spreadsheet_generator.schema_version
+        if job_spec.status == JobStatus.COMPLETE and schema_version is not None \
+                and job_spec.schema_version == schema_version and os.path.exists(job_spec.spreadsheet_path):
+            return job_spec
+        return None
+
+    def _do_create_spreadsheet_job(self, job_id: str):
+        """
+        Runs the job, then records its result. The lease is only removed once the job's final spec is written, so if
+        it can't be the lease expires and the job is requeued, rather than staying STARTED forever.
+        """
+        completed_job_spec = None
+        try:
+            completed_job_spec = self._run_job(job_id)
+        finally:
+            with self._jobs_lock:
+                # the completed spec is registered before the running one is removed, so reads always find one
+                if completed_job_spec and completed_job_spec.status == JobStatus.COMPLETE:
+                    self._remember_completed_job(completed_job_spec)
+                self._running_jobs.pop(job_id, None)
+                if completed_job_spec:
+                    self._remove_lease(job_id)
+
+    def _run_job(self, job_id: str) -> Optional[JobSpec]:
+        """
+        :return: the job's final spec, once it's written, or None if neither it nor an ERROR spec could be
+        """
+        try:
+            job_result = self._maybe_create_spreadsheet(job_id)
+            job_spec = self._running_jobs[job_id]
+            spreadsheet_hash = None
+            schema_version = None
+            if job_result == JobStatus.COMPLETE:
+                spreadsheet_hash = self.hash_spreadsheet(job_spec.spreadsheet_path)
+                schema_version = self.spreadsheet_generator.schema_version
+            completed_job_spec = replace(job_spec, status=job_result, spreadsheet_hash=spreadsheet_hash,
+                                         schema_version=schema_version)
+            self.write_job_spec(completed_job_spec, self._job_spec_path(job_id))
+            return completed_job_spec
+        except Exception as e:
+            self.logger.exception(f'Recording the result of spreadsheet job {job_id} failed: {e}')
+        try:
+            failed_job_spec = replace(self._running_jobs[job_id], status=JobStatus.ERROR, spreadsheet_hash=None,
+                                      schema_version=None)
+            self.write_job_spec(failed_job_spec, self._job_spec_path(job_id))
+            return failed_job_spec
         except Exception as e:
-            self.logger.exception(e)
-            return JobStatus.ERROR
+            self.logger.exception(f'Failing spreadsheet job {job_id} failed, leaving its lease to expire: {e}')
+            return None
+
+    def _maybe_create_spreadsheet(self, job_id: str) -> JobStatus:
+        job_spec = self._running_jobs[job_id]
+        while True:
+            try:
+                spreadsheet_spec = SpreadsheetSpec.from_dict(job_spec.spreadsheet_spec)
+                self._generate_spreadsheet(spreadsheet_spec, job_spec)
+                return JobStatus.COMPLETE
+            except BrokenProcessPool as e:
+                # the worker process died mid-job, e.g killed for using too much memory, which the job may not have
+                # caused
+                if job_spec.attempts >= MAX_JOB_ATTEMPTS:
+                    self.logger.error(f'Failing spreadsheet job {job_id} after {job_spec.attempts} attempts: {e}')
+                    return JobStatus.ERROR
+                self.logger.warning(f'Retrying spreadsheet job {job_id}: {e}')
+                job_spec = self._retry(job_spec)
+            except Exception as e:
+                self.logger.exception(e)
+                return JobStatus.ERROR
+
+    def _generate_spreadsheet(self, spreadsheet_spec: SpreadsheetSpec, job_spec: JobSpec):
+        """
+        generates the spreadsheet to a temporary file, then renames it into place, so a spreadsheet being downloaded
+        is never half-written, even if another broker is generating it too
+        """
+        spreadsheet_dir = os.path.dirname(job_spec.spreadsheet_path)
+        with tempfile.NamedTemporaryFile(dir=spreadsheet_dir, prefix=f'{job_spec.job_id}.', suffix=".tmp",
+                                         delete=False) as spreadsheet_file:
+            temp_spreadsheet_path = spreadsheet_file.name
+        try:
+            (self.process_pool or self.spreadsheet_generator).generate(spreadsheet_spec, temp_spreadsheet_path)
+            os.replace(temp_spreadsheet_path, job_spec.spreadsheet_path)
+        except BaseException:
+            self._remove_file(temp_spreadsheet_path)
+            raise
+
+    def _retry(self, job_spec: JobSpec) -> JobSpec:
+        job_spec = replace(job_spec, attempts=job_spec.attempts + 1)
+        with self._jobs_lock:
+            self.write_job_spec(job_spec, self._job_spec_path(job_spec.job_id))
+            self._running_jobs[job_spec.job_id] = job_spec
+            self.retried += 1
+        return job_spec
+
+    def stats(self) -> Dict:
+        with self._jobs_lock:
+            return {
+                'jobs': len(self._running_jobs),
+                'completed_jobs_in_memory': len(self._completed_jobs),
+                'max_queued_jobs': self.max_queued_jobs,
+                'lease_duration': self.lease_duration,
+                'requeued': self.requeued,
+                'retried': self.retried,
+                'rejected': self.rejected
+            }
+
+    def _run(self):
+        while not self._stopped.wait(self.lease_duration / 3):
+            try:
+                self._renew_leases()
+                self.requeue_abandoned_jobs()
+            except Exception as e:
+                self.logger.exception(f'Renewing spreadsheet job leases failed: {e}')
+
+    def _renew_leases(self):
+        with self._jobs_lock:
+            job_ids = list(self._running_jobs)
+        for job_id in job_ids:
+            try:
+                os.utime(self._lease_path(job_id))
+            except FileNotFoundError:
+                pass  # the job has just finished
+
+    def _lease_expired(self, job_id: str) -> bool:
+        try:
+            return os.stat(self._lease_path(job_id)).st_mtime_ns / 1e9 < time.time() - self.lease_duration
+        except FileNotFoundError:
+            return False
+
+    def _claim_expired_lease(self, job_id: str) -> Optional[str]:
+        """
+        Claims the job's lease if it has expired. Only one claim can be created for each expiry, as a renewed or
+        rewritten lease has a new mtime, so only one of the brokers finding the expired lease at once gets it.
+        :return: the path of the claim if this manager claimed the lease, and so should write a new one and take the
+        job over. If it then can't, the claim must be released, or the job can never be claimed again.
+        """
+        try:
+            lease_mtime_ns = os.stat(self._lease_path(job_id)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if lease_mtime_ns / 1e9 >= time.time() - self.lease_duration:
+            return None
+        claim_path = f'{self.output_dir_path}/{job_id}.{lease_mtime_ns}{CLAIM_SUFFIX}'
+        try:
+            claim_fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+        with os.fdopen(claim_fd, "w") as claim_file:
+            claim_file.write(self.owner)
+        return claim_path
+
+    def _release_claim(self, claim_path: Optional[str]):
+        if claim_path:
+            self._remove_file(claim_path)
+
+    @staticmethod
+    def _read_lease(lease_path: str) -> Optional[str]:
+        try:
+            with open(lease_path, "r") as lease_file:
+                return lease_file.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_lease(self, job_id: str):
+        with open(self._lease_path(job_id), "w") as lease_file:
+            lease_file.write(self.owner)
+
+    def _remove_lease(self, job_id: str):
+        self._remove_file(self._lease_path(job_id))
+        for claim_path in glob.glob(f'{self.output_dir_path}/{job_id}.*{CLAIM_SUFFIX}'):
+            self._remove_file(claim_path)
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _lease_path(self, job_id: str) -> str:
+        return f'{self.output_dir_path}/{job_id}{LEASE_SUFFIX}'
+
+    def _job_spec_path(self, job_id: str) -> str:
+        return f'{self.output_dir_path}/{job_id}.json'
+
+    @staticmethod
+    def hash_spreadsheet(spreadsheet_path: str) -> str:
+        spreadsheet_hash = hashlib.sha256()
+        with open(spreadsheet_path, "rb") as spreadsheet_file:
+            for chunk in iter(lambda: spreadsheet_file.read(1024 * 1024), b""):
+                spreadsheet_hash.update(chunk)
+        return spreadsheet_hash.hexdigest()
 
     def status_for_job(self, job_id: str) -> JobStatus:
         return self.load_job_spec(job_id).status
@@ -80,7 +462,24 @@ class SpreadsheetJobManager:
         return open(spreadsheet_path, "rb")
 
     def load_job_spec(self, job_id) -> JobSpec:
-        return SpreadsheetJobManager.load_job_spec_from_path(f'{self.output_dir_path}/{job_id}.json')
+        """
+        :return: the job's spec from memory if the manager holds the job or completed it recently, otherwise from its
+        file
+        """
+        job_spec = self._running_jobs.get(job_id) or self._completed_jobs.get(job_id)
+        if job_spec:
+            return job_spec
+        job_spec = SpreadsheetJobManager.load_job_spec_from_path(self._job_spec_path(job_id))
+        if job_spec.status == JobStatus.COMPLETE:
+            with self._jobs_lock:
+                self._remember_completed_job(job_spec)
+        return job_spec
+
+    def _remember_completed_job(self, job_spec: JobSpec):
+        self._completed_jobs.pop(job_spec.job_id, None)
+        self._completed_jobs[job_spec.job_id] = job_spec
+        if len(self._completed_jobs) > MAX_COMPLETED_JOBS:
+            del self._completed_jobs[next(iter(self._completed_jobs))]
 
     @staticmethod
     def load_job_spec_from_path(job_spec_path: str) -> JobSpec:
@@ -89,6 +488,11 @@ class SpreadsheetJobManager:
 
     @staticmethod
     def write_job_spec(job_spec: JobSpec, job_spec_path: str):
-        with open(job_spec_path, "w") as job_spec_file:
+        """
+        Writes the job spec to a temporary file renamed over the old one, so it's never read half written
+        """
+        job_spec_dir = os.path.dirname(os.path.abspath(job_spec_path))
+        with tempfile.NamedTemporaryFile("w", dir=job_spec_dir, suffix=".tmp", delete=False) as job_spec_file:
             json.dump(job_spec.to_dict(), job_spec_file)
+        os.replace(job_spec_file.name, job_spec_path)
 
@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from broker.service.spreadsheet_generation.schema_template_loader import schema_template_snapshot, \
+    schema_template_from_snapshot
+from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetGenerator, SpreadsheetSpec
+
+DEFAULT_PROCESSES = 2
+
+# the generator of a worker process, with the schemas it was started with
+_worker_spreadsheet_generator: Optional[SpreadsheetGenerator] = None
+
+
+def _start_worker(schema_snapshot: Dict):
+    global _worker_spreadsheet_generator
+    _worker_spreadsheet_generator = SpreadsheetGenerator(None, schema_template_from_snapshot(schema_snapshot))
+
+
+def _generate(spreadsheet_spec: SpreadsheetSpec, output_path: str) -> int:
+    _worker_spreadsheet_generator.generate(spreadsheet_spec, output_path)
+    return os.getpid()
+
+
+class SpreadsheetProcessPool:
+    """
+    Generates spreadsheets in worker processes, so laying out, building and saving them, which is CPU-bound pure
+    Python, doesn't hold the GIL against the threads serving requests.
+
+    Workers are started with the SpreadsheetGenerator's schemas preloaded, and are replaced by a new set of workers
+    when the generator's schemas change, or once the pool has generated max_jobs_per_process spreadsheets per
+    process, bounding how much memory long-lived workers accumulate. Replaced workers finish the spreadsheets they
+    were given before exiting. If a worker dies, e.g killed for using too much memory, the spreadsheets the pool was
+    generating fail with BrokenProcessPool, and the next one is given to a new set of workers.
+
+    Workers are spawned rather than forked, as forking a process with running threads can copy locks they hold.
+    """
+
+    def __init__(self, spreadsheet_generator: SpreadsheetGenerator, processes: Optional[int] = None,
+                 max_jobs_per_process: Optional[int] = None):
+        self.spreadsheet_generator = spreadsheet_generator
+        self.processes = processes if processes else DEFAULT_PROCESSES
+        self.max_jobs_per_process = max_jobs_per_process
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._schema_version = None
+        self._executor_jobs = 0
+        self._lock = threading.Lock()
+
+        self.jobs = 0
+        self.recycles = 0
+
+    def generate(self, spreadsheet_spec: SpreadsheetSpec, output_path: str) -> str:
+        """
+        generates the spreadsheet in a worker process, blocking until it's saved
+        """
+        self._submit(spreadsheet_spec, output_path).result()
+        return output_path
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'processes': self.processes,
+                'max_jobs_per_process': self.max_jobs_per_process,
+                'schema_version': self._schema_version,
+                'jobs': self.jobs,
+                'recycles': self.recycles
+            }
+
+    def _submit(self, spreadsheet_spec: SpreadsheetSpec, output_path: str):
+        # the generator's schemas are read, and loaded if need be, before taking the lock
+        schema_index = self.spreadsheet_generator.schema_index
+        with self._lock:
+            if self._executor is None or self._schema_version != schema_index.version or self._worn_out():
+                self._replace_executor(schema_index.schema_template, schema_index.version)
+            try:
+                future = self._executor.submit(_generate, spreadsheet_spec, output_path)
+            except BrokenProcessPool:
+                self._replace_executor(schema_index.schema_template, schema_index.version)
+                future = self._executor.submit(_generate, spreadsheet_spec, output_path)
+            self._executor_jobs += 1
+            self.jobs += 1
+            return future
+
+    def _worn_out(self) -> bool:
+        return self.max_jobs_per_process is not None \
+               and self._executor_jobs >= self.max_jobs_per_process * self.processes
+
+    def _replace_executor(self, schema_template, schema_version: str):
+        old_executor = self._executor
+        self._executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_start_worker,
+                                             initargs=(schema_template_snapshot(schema_template),))
+        self._schema_version = schema_version
+        self._executor_jobs = 0
+        if old_executor:
+            self.recycles += 1
+            # the old workers exit once they've finished the spreadsheets already given to them
+            old_executor.shutdown(wait=False)
@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+MAX_TAB_LAYOUTS = 256
+MAX_SPREADSHEET_TEMPLATES = 32
+
+
+class LruCache:
+    """
+    Thread-safe LRU cache of values that are deterministic in their key, and cheap enough to generate that concurrent
+    misses for the same key may both generate it. Cached values are shared by every caller, and mustn't be modified.
+    """
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.clears = 0
+
+    def get_or_generate(self, key: Hashable, generate: Callable):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+
+        # generated outside the lock: concurrent misses for the same key only duplicate deterministic work
+        value = generate()
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.clears += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._cache),
+                'max_size': self.cache_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'clears': self.clears
+            }
+
+
+class TabLayoutCache(LruCache):
+    """
+    LRU cache of the ParsedTab for each TypeSpec, so the tabs requested in spreadsheet after spreadsheet aren't laid
+    out again.
+
+    Keys must identify the schema release as well as the TypeSpec, as a layout depends on both.
+    """
+
+    def __init__(self, cache_size=None):
+        super().__init__(MAX_TAB_LAYOUTS if not cache_size else cache_size)
+
+
+class SpreadsheetTemplateCache(LruCache):
+    """
+    LRU cache of the SchemaTemplate each combination of tabs is built from, so spreadsheets requesting the same tabs
+    share one. Each is a shallow copy of the release's SchemaTemplate with its own tab config, so fewer are kept than
+    tab layouts.
+
+    Keys must identify the schema release as well as the tabs.
+    """
+
+    def __init__(self, cache_size=None):
+        super().__init__(MAX_SPREADSHEET_TEMPLATES if not cache_size else cache_size)
@@ -22,7 +22,8 @@ def sort(specs):
                 del adjacency[next_spec.schema_name]  # visited
 
     for _, data in adjacency.items():
-        specs.append(data.spec)
+        if data.spec is not None:  # linked to, but not in specs
+            specs.append(data.spec)
 
 
 def _construct_graph(specs) -> dict:
@@ -1,23 +1,138 @@
-from expiringdict import ExpiringDict
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from time import monotonic
+
 from .exception.cache_miss_exception import CacheMissException
 
-FIVE_MINUTES = 60 * 5
 MAX_CACHE_SIZE = 10000
 
 
 class SubmissionSummaryCache:
+    """
+    Thread-safe LRU cache of submission summaries, intended to be shared by every SummaryService in the process.
+
+    Entries are keyed by submission uuid and versioned by SummaryService.summary_version, i.e the submission's
+    updateDate and the scrape config: a lookup with a different version invalidates the entry, so a summary is served
+    for as long as its submission and the scrape config are unchanged and the entry has not been evicted. An optional
+    `expiry` (in seconds) additionally bounds how long an entry is kept.
+
+    get_or_generate coalesces concurrent misses for the same submission version: the first caller generates the
+    summary and every other caller waits on its result instead of re-crawling.
+    """
 
     def __init__(self, cache_size=None, expiry=None):
         self.cache_size = MAX_CACHE_SIZE if not cache_size else cache_size
-        self.expiry = FIVE_MINUTES if not expiry else expiry
+        self.expiry = expiry if expiry else None
+
+        self._cache = OrderedDict()  # uuid -> (summary, version, expiry time)
+        self._in_flight = dict()  # (uuid, version) -> Future of the summary being generated
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, uuid, version=None):
+        with self._lock:
+            return self._get(uuid, version)
+
+    def get_if_cached(self, uuid, version=None):
+        """
+        Returns the cached summary, or None without counting a miss, for callers that generate missing summaries
+        through get_or_generate
+        """
+        with self._lock:
+            try:
+                return self._get(uuid, version, count_miss=False)
+            except CacheMissException:
+                return None
 
-        self._cache = ExpiringDict(self.cache_size, self.expiry)
+    def insert(self, uuid, summary, version=None):
+        with self._lock:
+            self._insert(uuid, summary, version)
+
+    def get_or_generate(self, uuid, generate, version=None):
+        """
+        Returns the cached summary for this version of the submission, calling generate() to create and cache it on
+        a miss. If another thread is already generating the same summary, waits for and returns that thread's result.
+
+        :param uuid: the submission uuid
+        :param generate: a no-arg callable returning the summary
+        :param version: the version of the summary, i.e SummaryService.summary_version
+        :return: the summary
+        """
+        key = (uuid, version)
+        with self._lock:
+            try:
+                return self._get(uuid, version)
+            except CacheMissException:
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    in_flight = self._in_flight[key] = Future()
+                    is_leader = True
+                else:
+                    self.coalesced += 1
+                    is_leader = False
+
+        if not is_leader:
+            return in_flight.result()
 
-    def get(self, uuid):
         try:
-            return self._cache[uuid]
-        except KeyError:
+            summary = generate()
+        except Exception as e:
+            in_flight.set_exception(e)
+            raise
+        else:
+            in_flight.set_result(summary)
+            self.insert(uuid, summary, version)
+            return summary
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._cache),
+                'max_size': self.cache_size,
+                'expiry': self.expiry,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'in_flight': len(self._in_flight)
+            }
+
+    def _get(self, uuid, version, count_miss=True):
+        entry = self._cache.get(uuid)
+        if entry is not None and entry[1] != version:
+            del self._cache[uuid]
+            self.invalidations += 1
+            entry = None
+        elif entry is not None and entry[2] is not None and entry[2] <= monotonic():
+            del self._cache[uuid]
+            self.expirations += 1
+            entry = None
+
+        if entry is None:
+            if count_miss:
+                self.misses += 1
             raise CacheMissException(uuid)
 
-    def insert(self, uuid, summary):
-        self._cache[uuid] = summary
+        self._cache.move_to_end(uuid)
+        self.hits += 1
+        return entry[0]
+
+    def _insert(self, uuid, summary, version):
+        expires_at = monotonic() + self.expiry if self.expiry else None
+        self._cache[uuid] = (summary, version, expires_at)
+        self._cache.move_to_end(uuid)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+            self.evictions += 1
@@ -1,47 +1,94 @@
+import hashlib
 import json
+import logging
 import os
-from functools import reduce
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+from time import perf_counter
+from typing import Dict
 from typing import Generator
 from typing import Iterable
+from typing import Tuple
 
 from hca_ingest.api.ingestapi import IngestApi
-from jsonpath_rw import parse
 
 from broker.common.entity_summary import EntitySummary
 from broker.common.project_summary import ProjectSummary
 from broker.common.submission_summary import SubmissionSummary
-from .exception.cache_miss_exception import CacheMissException
+from .scrape_paths import compile_path
+from .scrape_reducers import Reducer, SumReducer, CountReducer, UniqueReducer, CollectReducer
 from .submission_summary_cache import SubmissionSummaryCache
 
+# The entity collections of a submission, each with the entity type its scrape directives are configured for and
+# the SubmissionSummary field summarising it. The order is the order in which scrape results are combined.
+EntityType = namedtuple('EntityType', ['collection', 'directive_type', 'summary_field'])
+ENTITY_TYPES = [EntityType('biomaterials', 'biomaterial', 'biomaterial_summary'),
+                EntityType('processes', 'process', 'process_summary'),
+                EntityType('protocols', 'protocol', 'protocol_summary'),
+                EntityType('files', 'file', 'file_summary'),
+                EntityType('projects', 'project', 'project_summary')]
 
-# TODO: consider storing generators here and generating the complete summary in one pass
-class SubmissionEntities:
-    def __init__(self, biomaterials=None, projects=None, processes=None, protocols=None, files=None):
-        self.biomaterials = biomaterials if biomaterials else []
-        self.projects = projects if projects else []
-        self.processes = processes if processes else []
-        self.protocols = protocols if protocols else []
-        self.files = files if files else []
+DEFAULT_SCRAPE_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'scrape_config.json')
+
+# page size when fetching projected entities, which are a few dozen bytes each rather than whole documents
+PROJECTED_PAGE_SIZE = 500
 
 
 class SummaryService:
 
-    def __init__(self, ingest_api=None, submission_summary_cache=None):
+    def __init__(self, ingest_api=None, submission_summary_cache=None, worker_pool=None, submission_scraper_loader=None,
+                 submission_worker_pool=None, summary_store=None, entity_type_projection=None):
         self.ingestapi = IngestApi() if not ingest_api else ingest_api
         self.submission_summary_cache = SubmissionSummaryCache() if not submission_summary_cache else submission_summary_cache
-
-    def summary_for_project(self, project_resource) -> ProjectSummary:
+        self.worker_pool = worker_pool if worker_pool is not None else ThreadPoolExecutor(2 * len(ENTITY_TYPES))
+        self.submission_worker_pool = submission_worker_pool if submission_worker_pool is not None else ThreadPoolExecutor(4)
+        self.submission_scraper_loader = submission_scraper_loader if submission_scraper_loader else SubmissionScraperLoader()
+        self.summary_store = summary_store
+        # name of an ingest API projection of entities to only their content.describedBy. When set, entity types with
+        # no scrape directives needing their content are counted from projected entities instead of whole documents
+        self.entity_type_projection = entity_type_projection
+        self.logger = logging.getLogger(__name__)
+
+    def summary_for_project(self, project_resource, time_budget=None, submissions=None) -> ProjectSummary:
+        """
+        Summarises the submissions in the project concurrently on the submission worker pool, adding each submission
+        summary to the project summary as it arrives. Cached submission summaries are added straight away.
+
+        :param project_resource: the project
+        :param time_budget: seconds to wait for submission summaries. If they are not all done in time, the summary of
+        those that are is returned, marked as incomplete. The rest carry on being generated, and cached, in the
+        background.
+        :param submissions: the project's submissions, if they have already been fetched
+        :return: A ProjectSummary for this project
+        """
+        deadline = perf_counter() + time_budget if time_budget is not None else None
         project_summary = ProjectSummary()
 
-        project_submissions = self.get_submissions_in_project(project_resource)
-        submission_summaries = [self.summary_for_submission(submission) for submission in project_submissions]
-
-        for summary in submission_summaries:
-            project_summary.add_submission_summary(summary)
+        summarising = []
+        if submissions is None:
+            submissions = self.get_submissions_in_project(project_resource)
+        for submission in submissions:
+            cached_summary = self.submission_summary_cache.get_if_cached(self.uuid_from_submission(submission),
+                                                                         self.summary_version(submission))
+            if cached_summary is not None:
+                project_summary.add_submission_summary(cached_summary)
+            else:
+                summarising.append(self.submission_worker_pool.submit(self.summary_for_submission, submission))
+
+        timeout = max(deadline - perf_counter(), 0) if deadline is not None else None
+        try:
+            for submission_summary in as_completed(summarising, timeout=timeout):
+                project_summary.add_submission_summary(submission_summary.result())
+        except TimeoutError:
+            project_summary.complete = False
+            pending = len([submission_summary for submission_summary in summarising if not submission_summary.done()])
+            self.logger.info(f'Project summary time budget of {time_budget}s ran out with {pending} of '
+                             f'{len(summarising)} submission summaries still being generated')
 
         return project_summary
 
-    def summary_for_submission(self, submission_resource) -> SubmissionSummary:
+    def summary_for_submission(self, submission_resource, worker_pool=None) -> SubmissionSummary:
         """
         Given a submission URI, returns a detailed summary of the submission.
 
@@ -52,64 +99,115 @@ class SummaryService:
         title, # of cells, organ, donor, ...
 
         :param submission_uri: URI string for the submission
+        :param worker_pool: the pool to summarise entity types on, if not the service's worker pool
         :return: A SubmissionSummary for this submission
         """
         submission_uuid = self.uuid_from_submission(submission_resource)
+        return self.submission_summary_cache.get_or_generate(
+            submission_uuid, lambda: self.stored_or_generated_summary(submission_resource, worker_pool),
+            self.summary_version(submission_resource))
 
-        try:
-            submission_summary = self.submission_summary_cache.get(submission_uuid)
-            return submission_summary
-        except CacheMissException:
-            submission_summary = SubmissionSummary()
-            submission_uri = submission_resource['_links']['self']['href']
-
-            submissions_entities = self.get_all_entities_in_submission(submission_uri)
-            submission_summary = self.add_entity_count_breakdown(submission_summary, submissions_entities)
-
-            scrape_config_path = os.path.join(os.path.dirname(__file__), 'scrape_config.json')  # TODO: pass config in
-            submission_scraper = SubmissionScraper.from_file(scrape_config_path)
-
-            submission_summary = self.add_specific_submission_information(submission_summary,
-                                                                          submissions_entities,
-                                                                          submission_scraper) # TODO: pass a scrape-config
-
-            submission_summary.create_date = submission_resource['submissionDate']
-            submission_summary.last_updated_date = submission_resource['updateDate']
-            submission_summary.submission_status = submission_resource['submissionState']
-
-            self.submission_summary_cache.insert(submission_uuid, submission_summary)
-            return submission_summary
-
-    def add_entity_count_breakdown(self, submission_summary, submission_entities):
-        submission_summary.biomaterial_summary = self.generate_summary_for_entity(submission_entities.biomaterials)
-        submission_summary.project_summary = self.generate_summary_for_entity(submission_entities.projects)
-        submission_summary.protocol_summary = self.generate_summary_for_entity(submission_entities.protocols)
-        submission_summary.file_summary = self.generate_summary_for_entity(submission_entities.files)
-        submission_summary.process_summary = self.generate_summary_for_entity(submission_entities.processes)
-        return submission_summary
+    def summary_version(self, submission_resource) -> str:
+        """
+        :return: the version of the submission's summary, which changes with the submission's updateDate and with the
+        scrape config its scrape_result comes from, so summaries scraped with a config since reloaded aren't served
+        """
+        scraper = self.submission_scraper_loader.get()
+        return f'{submission_resource.get("updateDate")}@{scraper.fingerprint}'
 
+    def stored_or_generated_summary(self, submission_resource, worker_pool=None) -> SubmissionSummary:
+        """
+        Returns the summary of this version of the submission from the summary store, if there is one, and otherwise
+        generates it and stores it
+        """
+        if not self.summary_store:
+            return self.generate_summary_for_submission(submission_resource, worker_pool)
+
+        submission_uuid = self.uuid_from_submission(submission_resource)
+        submission_version = self.summary_version(submission_resource)
+        submission_summary = self.summary_store.get(submission_uuid, submission_version)
+        if submission_summary is None:
+            submission_summary = self.generate_summary_for_submission(submission_resource, worker_pool)
+            self.summary_store.put(submission_uuid, submission_summary, submission_version)
+        return submission_summary
 
-    def add_specific_submission_information(self, submission_summary, submission_entities, submission_scraper):
+    def generate_summary_for_submission(self, submission_resource, worker_pool=None) -> SubmissionSummary:
         """
-        Using the submission scraper, primed with scrape directives, collects and processes designated information
-        from the submission
-        :param submission_summary:
-        :param submission_entities:
-        :param submission_scraper:
-        :return:
+        Summarises every entity type in the submission concurrently on the worker pool, or the given one, so the time
+        taken is that of the largest entity type rather than the sum of all of them
         """
-        submission_summary.scrape_result = submission_scraper.scrape(submission_entities)
+        submission_summary = SubmissionSummary()
+        submission_uri = submission_resource['_links']['self']['href']
+
+        submission_scraper = self.submission_scraper_loader.get()
+
+        worker_pool = worker_pool if worker_pool is not None else self.worker_pool
+        summarising = [(entity_type, worker_pool.submit(self.summarise_entities_in_submission,
+                                                        submission_uri, entity_type, submission_scraper))
+                       for entity_type in ENTITY_TYPES]
+        for entity_type, entity_type_summary in summarising:
+            entity_summary, scrape_result = entity_type_summary.result()
+            setattr(submission_summary, entity_type.summary_field, entity_summary)
+            submission_summary.scrape_result.update(scrape_result)
+
+        submission_summary.create_date = submission_resource['submissionDate']
+        submission_summary.last_updated_date = submission_resource['updateDate']
+        submission_summary.submission_status = submission_resource['submissionState']
+
         return submission_summary
 
+    def summarise_entities_in_submission(self, submission_uri, entity_type: EntityType,
+                                         submission_scraper: 'SubmissionScraper') -> Tuple[EntitySummary, dict]:
+        """
+        Streams the entities of one type in the submission through a single pass: each entity is counted and fed to
+        the scrape directives for its type as it arrives, then dropped, so only the current page of entities is held.
+
+        If the scrape directives for the type only need to know each entity's specific type, and an entity type
+        projection is configured, only that is fetched rather than the whole entities
+
+        :return: the EntitySummary of the entities and the result of scraping them
+        """
+        start = perf_counter()
+        scrape_seconds = 0.0
+        entity_summary = EntitySummary()
+        scrape = submission_scraper.new_scrape(entity_type.directive_type)
+
+        if self.entity_type_projection and not submission_scraper.needs_content(entity_type.directive_type):
+            entities = self.get_entity_types_in_submission(submission_uri, entity_type.collection)
+        else:
+            entities = self.get_entities_in_submission(submission_uri, entity_type.collection)
+
+        for entity in entities:
+            specific_type = self.parse_specific_entity_type(entity)
+            entity_summary.add_entity(specific_type)
+            scrape_start = perf_counter()
+            scrape.add(entity, specific_type)
+            scrape_seconds += perf_counter() - scrape_start
+
+        self.submission_scraper_loader.record_scrape(entity_summary.count, scrape_seconds)
+        self.logger.info(f'Summarised {entity_summary.count} {entity_type.collection} from {submission_uri} '
+                         f'in {perf_counter() - start:.3f}s ({scrape_seconds:.3f}s scraping)')
+        return entity_summary, scrape.result()
+
     def get_entities_in_submission(self, submission_uri, entity_type) -> Generator[dict, None, None]:
         yield from self.ingestapi.get_entities(submission_uri, entity_type)
 
-    def get_all_entities_in_submission(self, submission_uri):
-        return SubmissionEntities(list(self.get_entities_in_submission(submission_uri, 'biomaterials')),
-                                  list(self.get_entities_in_submission(submission_uri, 'projects')),
-                                  list(self.get_entities_in_submission(submission_uri, 'processes')),
-                                  list(self.get_entities_in_submission(submission_uri, 'protocols')),
-                                  list(self.get_entities_in_submission(submission_uri, 'files')))
+    def get_entity_types_in_submission(self, submission_uri, entity_type) -> Generator[dict, None, None]:
+        """
+        Like get_entities_in_submission, but fetches the entities through the entity type projection, so they only
+        hold their content.describedBy
+        """
+        submission = self.ingestapi.get(submission_uri).json()
+        if entity_type not in submission['_links']:
+            return
+
+        params = {'size': PROJECTED_PAGE_SIZE, 'projection': self.entity_type_projection}
+        result = self.ingestapi.get(submission['_links'][entity_type]['href'], params=params).json()
+        while True:
+            yield from result.get('_embedded', {}).get(entity_type, [])
+            if 'next' not in result['_links']:
+                break
+            result = self.ingestapi.get(result['_links']['next']['href']).json()
 
     def get_submissions_in_project(self, project_resource) -> Generator[dict, None, None]:
         yield from self.ingestapi.get_related_entities('submissionEnvelopes', project_resource, 'submissionEnvelopes')
@@ -125,17 +223,8 @@ class SummaryService:
         :return: a summary with a count of each entity type, further broken down by count of each specific entity type
         """
         entity_summary = EntitySummary()
-
-        entity_specific_types = dict()
         for entity in entities:
-            specific_type = SummaryService.parse_specific_entity_type(entity)
-            if specific_type not in entity_specific_types:
-                entity_specific_types[specific_type] = {'count': 0}
-
-            entity_specific_types[specific_type]['count'] += 1
-            entity_summary.count += 1
-
-        entity_summary.breakdown = entity_specific_types
+            entity_summary.add_entity(SummaryService.parse_specific_entity_type(entity))
         return entity_summary
 
     @staticmethod
@@ -158,6 +247,68 @@ class SummaryService:
         return submission_resource['uuid']['uuid']
 
 
+class SubmissionScraperLoader:
+    """
+    Compiles a scrape config file into a SubmissionScraper once and shares it, recompiling only when the file's
+    modification time changes. A SubmissionScraper holds no per-submission state, so one can be used by any number of
+    concurrent summaries.
+
+    Also keeps timing metrics for compiling the scraper versus applying it to entities.
+    """
+
+    def __init__(self, config_path=DEFAULT_SCRAPE_CONFIG_PATH):
+        self.config_path = config_path
+        self._scraper = None
+        self._config_mtime = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+        self.compilations = 0
+        self.compile_seconds = 0.0
+        self.scraped_entities = 0
+        self.scrape_seconds = 0.0
+
+    def get(self) -> 'SubmissionScraper':
+        config_mtime = os.stat(self.config_path).st_mtime_ns
+        if config_mtime != self._config_mtime:
+            with self._lock:
+                if config_mtime != self._config_mtime:
+                    self._compile(config_mtime)
+        return self._scraper
+
+    def _compile(self, config_mtime):
+        start = perf_counter()
+        try:
+            scraper = SubmissionScraper.from_file(self.config_path)
+        except Exception as e:
+            if self._scraper is None:
+                raise
+            self.logger.exception(f'Could not reload scrape config {self.config_path}, keeping the previous one: {e}')
+        else:
+            elapsed = perf_counter() - start
+            self._scraper = scraper
+            self.compilations += 1
+            self.compile_seconds += elapsed
+            self.logger.info(f'Compiled scrape config {self.config_path} in {elapsed:.3f}s')
+        finally:
+            self._config_mtime = config_mtime
+
+    def record_scrape(self, entity_count, seconds):
+        with self._lock:
+            self.scraped_entities += entity_count
+            self.scrape_seconds += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'config_path': self.config_path,
+                'compilations': self.compilations,
+                'compile_seconds': self.compile_seconds,
+                'scraped_entities': self.scraped_entities,
+                'scrape_seconds': self.scrape_seconds
+            }
+
+
 class ScrapeConfig:
     """
     Represents a configuration file used to configure a SubmissionScraper
@@ -176,8 +327,8 @@ class SubmissionScraper:
     class Directive:
         """
         A directive will instruct the scraper on where and how to find info to be scraped. Can be constructed
-        with an optional reducer function to combine matching scraped data. The reducer function should take a
-        collection of matching field-values as param and return a single value
+        with an optional Reducer to combine matching scraped data. Matching field-values are folded into the
+        reducer's accumulator as they are found
         """
 
         def __init__(self, placeholder=None, entity_type=None, identifier=None, paths=None, reducer=None):
@@ -186,115 +337,165 @@ class SubmissionScraper:
             self.identifier = identifier
             self.paths = paths
             self.reducer = reducer
-            self.parsers = [parse(path) for path in self.paths]
+            self.accessors = [compile_path(path) for path in self.paths]
             self.apply = None
 
+        @property
+        def needs_content(self) -> bool:
+            """
+            whether the directive reads the entities' content, rather than only counting entities of its identifier
+            """
+            return bool(self.paths) or not isinstance(self.reducer, CountReducer)
+
         def build(self):
             self.apply = self.generateApplyFunction()
 
         def generateApplyFunction(self):
             """
-            If an identifier is specified, we want the following algorithm:
-            - return entities matching the identifier
+            The generated function is applied to one entity at a time. Entities are matched against the identifier,
+            if one is specified, by the scraper's DirectiveIndex before the function is applied.
 
-            If a path is specified, we want the algorithm to additionally:
-            - return matched fields within eligible entities
-            :return:
+            If a path is specified, we want the algorithm to:
+            - return matched fields within the entity
+
+            Otherwise, the entity itself is the match
+            :return: a function returning the values matched in a single entity
             """
-            parsers = self.parsers
+            accessors = self.accessors
             identifier = self.identifier
 
-            def identify(entities):  # TODO: move parse_specific_entity_type
-                return list(filter(lambda entity: SummaryService.parse_specific_entity_type(entity) == self.identifier, entities))
-
-            def pathMatch(entities):
-                found_values = []
-                for entity in entities:
-                    for parser in parsers:
-                        found_values += [match.value for match in parser.find(entity['content'])]
-                return found_values
+            def pathMatch(entity):
+                for accessor in accessors:
+                    yield from accessor.find_values(entity['content'])
 
             def combined_function():
-                if identifier:
-                    if parsers and (len(parsers) > 0):
-                        return lambda entities: pathMatch(identify(entities))
-                    else:
-                        return lambda entities: identify(entities)
-                elif parsers and (len(parsers) > 0):
-                    return lambda entities: pathMatch(entities)
+                if accessors and (len(accessors) > 0):
+                    return lambda entity: pathMatch(entity)
+                elif identifier:
+                    return lambda entity: (entity,)
                 else:
                     raise Exception("Can't generate a parse directive without either an identifier or path matcher")
 
             return combined_function()
 
+    class DirectiveIndex:
+        """
+        The directives for one entity type, indexed by the specific entity type they apply to. Directives with an
+        identifier only apply to entities of that specific type, those without one apply to every entity
+        """
 
-    class GroupedDirectives:
-        def __init__(self):
-            self.biomaterial_directives = []
-            self.processes_directives = []
-            self.protocol_directives = []
-            self.file_directives = []
-            self.project_directives = []
-
-    def __init__(self, directives=None):
-        self.directives = directives if directives else []
-        for directive in self.directives:
-            directive.build()
-        self.grouped_directives = self.group_directives(self.directives)
+        def __init__(self, directives: Iterable['SubmissionScraper.Directive'] = ()):
+            self.directives = tuple(directives)
+            self.untargeted = tuple(i for i, directive in enumerate(self.directives) if not directive.identifier)
+            targeted = dict()
+            for i, directive in enumerate(self.directives):
+                if directive.identifier:
+                    targeted.setdefault(directive.identifier, []).append(i)
+            self.targeted = {identifier: tuple(positions) for identifier, positions in targeted.items()}
 
+        def positions_for(self, specific_type: str) -> Tuple[int, ...]:
+            """
+            :return: the positions in self.directives of the directives applying to entities of the specific type
+            """
+            return tuple(sorted(self.untargeted + self.targeted.get(specific_type, ())))
 
-    def scrape(self, submission_entities: SubmissionEntities) -> dict:
+    class Scrape:
         """
-        given a SubmissionEntities obj, scrapes as directed
-        :param submission_entities:
-        :return:
+        A scrape of the entities of one type. Entities are added one at a time, only the directives indexed for the
+        entity's specific type are applied to it, and the values they find are folded into their accumulators straight
+        away
         """
 
-        #  gets scrape dicts for each entity type, combines all into a single dict
+        def __init__(self, directive_index: 'SubmissionScraper.DirectiveIndex'):
+            self.directive_index = directive_index
+            self.directives = directive_index.directives
+            self.accumulators = [directive.reducer.init() for directive in self.directives]
+            self._positions_by_specific_type = dict()
+
+        def add(self, entity, specific_type=None):
+            """
+            :param entity:
+            :param specific_type: the specific type of the entity, if already known
+            """
+            if not self.directives:
+                return
+            if specific_type is None:
+                specific_type = SummaryService.parse_specific_entity_type(entity)
+
+            positions = self._positions_by_specific_type.get(specific_type)
+            if positions is None:
+                positions = self._positions_by_specific_type[specific_type] = self.directive_index.positions_for(specific_type)
+
+            for i in positions:
+                directive = self.directives[i]
+                reducer = directive.reducer
+                accumulator = self.accumulators[i]
+                for value in directive.apply(entity):
+                    accumulator = reducer.add(accumulator, value)
+                self.accumulators[i] = accumulator
+
+        def merge(self, other: 'SubmissionScraper.Scrape') -> 'SubmissionScraper.Scrape':
+            """
+            merges a scrape of other entities, using the same directives, into this one
+            :param other:
+            :return: self
+            """
+            self.accumulators = [directive.reducer.merge(accumulator, other_accumulator)
+                                 for directive, accumulator, other_accumulator
+                                 in zip(self.directives, self.accumulators, other.accumulators)]
+            return self
+
+        def result(self) -> dict:
+            return {directive.placeholder: directive.reducer.finish(accumulator)
+                    for directive, accumulator in zip(self.directives, self.accumulators)}
 
-        scrapes = [self.apply_directives(submission_entities.biomaterials, self.grouped_directives.biomaterial_directives),
-                   self.apply_directives(submission_entities.processes, self.grouped_directives.processes_directives),
-                   self.apply_directives(submission_entities.protocols, self.grouped_directives.protocol_directives),
-                   self.apply_directives(submission_entities.files, self.grouped_directives.file_directives),
-                   self.apply_directives(submission_entities.projects, self.grouped_directives.project_directives)]
+    def __init__(self, directives=None, fingerprint=None):
+        """
+        :param fingerprint: a hash of the scrape config the directives were compiled from
+        """
+        self.directives = tuple(directives) if directives else ()
+        self.fingerprint = fingerprint
+        for directive in self.directives:
+            directive.build()
+        self.directive_indexes = self.index_directives(self.directives)
 
-        return reduce(lambda scrape_a, scrape_b: {**scrape_a, **scrape_b}, scrapes)
+    def directives_for(self, entity_type: str) -> Tuple['SubmissionScraper.Directive', ...]:
+        return self.directive_indexes.get(entity_type, SubmissionScraper.DirectiveIndex()).directives
 
-    @staticmethod
-    def apply_directives(entities, directives):
+    def needs_content(self, entity_type: str) -> bool:
         """
-        Applies scrape directives: for each, calls it matcher and reduces output using directive's reducer function
-        A dictionary of results is returned
+        :return: whether any directive for the entity type reads the content of entities, as opposed to only their
+        specific type
+        """
+        return any(directive.needs_content for directive in self.directives_for(entity_type))
 
-        :param entities:
-        :param directives:
+    def new_scrape(self, entity_type: str) -> 'SubmissionScraper.Scrape':
+        """
+        starts a scrape of entities of the given type (e.g biomaterial, file, ...) using the directives for that type
+        :param entity_type:
         :return:
         """
-        scrape_result = dict()
-
-        for directive in directives:
-            found_values = directive.apply(entities)
-            scrape_result[directive.placeholder] = directive.reducer(found_values)
-
-        return scrape_result
+        return SubmissionScraper.Scrape(self.directive_indexes.get(entity_type, SubmissionScraper.DirectiveIndex()))
 
     @staticmethod
-    def group_directives(directives: Iterable[Directive]):
-        grouped_directives = SubmissionScraper.GroupedDirectives()
-
-        grouped_directives.biomaterial_directives = filter(lambda directive: directive.entity_type == 'biomaterial',directives)
-        grouped_directives.project_directives = filter(lambda directive: directive.entity_type == 'project', directives)
-        grouped_directives.protocol_directives = filter(lambda directive: directive.entity_type == 'protocol', directives)
-        grouped_directives.processes_directives = filter(lambda directive: directive.entity_type == 'process', directives)
-        grouped_directives.file_directives = filter(lambda directive: directive.entity_type == 'file', directives)
+    def index_directives(directives: Iterable[Directive]) -> Dict[str, 'SubmissionScraper.DirectiveIndex']:
+        """
+        :return: a DirectiveIndex for each entity type (e.g biomaterial, file, ...) with directives
+        """
+        directives_by_entity_type = dict()
+        for directive in directives:
+            directives_by_entity_type.setdefault(directive.entity_type, []).append(directive)
 
-        return grouped_directives
+        return {entity_type: SubmissionScraper.DirectiveIndex(entity_type_directives)
+                for entity_type, entity_type_directives in directives_by_entity_type.items()}
 
     @staticmethod
     def from_file(file_path):
-        scrape_configs = SubmissionScraper.scrape_configs_from_file(file_path)
+        with open(file_path, 'rb') as config_file:
+            config_json = config_file.read()
+        scrape_configs = SubmissionScraper.scrape_configs_from_dicts(json.loads(config_json)['configs'])
         directives = SubmissionScraper.directives_from_scrape_configs(scrape_configs)
-        return SubmissionScraper(list(directives))
+        return SubmissionScraper(list(directives), hashlib.sha256(config_json).hexdigest())
 
     @staticmethod
     def scrape_configs_from_dicts(configs: Iterable[dict]) -> Generator[ScrapeConfig, None, None]:
@@ -326,12 +527,12 @@ class SubmissionScraper:
                                                                      SubmissionScraper.reducer_for(scrape_config.post_process)), scrape_configs)
 
     @staticmethod
-    def reducer_for(post_process_func: str):
+    def reducer_for(post_process_func: str) -> Reducer:
         if post_process_func == "sum":
-            return lambda collection: reduce((lambda x, y: x + y), collection, 0)
+            return SumReducer()
         elif post_process_func == "count":
-            return lambda collection: reduce((lambda x, y: x + 1), collection, 0)
+            return CountReducer()
         elif post_process_func == "unique":
-            return lambda collection: list(set(collection))
+            return UniqueReducer()
         else:
-            return lambda collection: collection  # just return the collection
+            return CollectReducer()  # just return the collection
@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from time import time
+from typing import Optional
+
+from broker.common.submission_summary import SubmissionSummary
+from broker.common.util import encode_json
+
+SUMMARY_STORE_FILENAME = 'submission_summaries.sqlite'
+# version of the stored summaries' JSON, bumped when SubmissionSummary.to_dict changes incompatibly
+SUMMARY_FORMAT = 1
+
+
+class SummaryStore:
+    """
+    Persistent store of submission summaries, keyed by submission uuid and versioned by SummaryService.summary_version,
+    so a summary scraped with an earlier scrape config is replaced, like one of an earlier updateDate.
+    Unlike the SubmissionSummaryCache it outlives the process and can be shared by every worker of a deployment.
+    """
+
+    def get(self, uuid, version=None) -> Optional[SubmissionSummary]:
+        """
+        :return: the stored summary of this version of the submission, or None if there is none
+        """
+        raise NotImplementedError
+
+    def put(self, uuid, summary: SubmissionSummary, version=None):
+        raise NotImplementedError
+
+    def version_of(self, uuid) -> Optional[str]:
+        """
+        :return: the version of the stored summary of the submission, or None if there is none
+        """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class SqliteSummaryStore(SummaryStore):
+    """
+    SummaryStore in a SQLite database file. Summaries are stored as the JSON of SubmissionSummary.to_dict, with the
+    SUMMARY_FORMAT it was stored in. A summary stored in another format, or which can't be read, is treated as missing,
+    so it's summarised again and replaced.
+    Each thread has its own connection, and the database is in WAL mode so readers are not blocked by the indexer.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        with connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS submission_summary ('
+                               'uuid TEXT PRIMARY KEY, version TEXT, summary TEXT NOT NULL, stored_at REAL NOT NULL)')
+
+    @staticmethod
+    def in_storage_dir(storage_dir) -> 'SqliteSummaryStore':
+        return SqliteSummaryStore(os.path.join(storage_dir, SUMMARY_STORE_FILENAME))
+
+    def get(self, uuid, version=None) -> Optional[SubmissionSummary]:
+        row = self._connection().execute('SELECT version, summary FROM submission_summary WHERE uuid = ?',
+                                         (uuid,)).fetchone()
+        summary = self._decode(uuid, row[1]) if row is not None and row[0] == version else None
+        with self._stats_lock:
+            if summary:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return summary
+
+    def put(self, uuid, summary: SubmissionSummary, version=None):
+        connection = self._connection()
+        with connection:
+            connection.execute('INSERT OR REPLACE INTO submission_summary (uuid, version, summary, stored_at) '
+                               'VALUES (?, ?, ?, ?)', (uuid, version, self._encode(summary), time()))
+        with self._stats_lock:
+            self.writes += 1
+
+    def version_of(self, uuid) -> Optional[str]:
+        row = self._connection().execute('SELECT version FROM submission_summary WHERE uuid = ?', (uuid,)).fetchone()
+        return row[0] if row is not None else None
+
+    def stats(self) -> dict:
+        size = self._connection().execute('SELECT COUNT(*) FROM submission_summary').fetchone()[0]
+        with self._stats_lock:
+            return {
+                'path': self.path,
+                'size': size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes
+            }
+
+    @staticmethod
+    def _encode(summary: SubmissionSummary) -> str:
+        return encode_json({'format': SUMMARY_FORMAT, 'summary': summary.to_dict()})
+
+    def _decode(self, uuid, stored_summary: str) -> Optional[SubmissionSummary]:
+        try:
+            data = json.loads(stored_summary)
+            if not isinstance(data, dict) or data.get('format') != SUMMARY_FORMAT:
+                return None
+            return SubmissionSummary.from_dict(data['summary'])
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self.logger.warning(f'Ignoring unreadable stored summary of submission {uuid}: {e}')
+            return None
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=30)
+        return connection
+
+
+class SummaryIndexer:
+    """
+    Background thread keeping the summary store up to date: every `interval` seconds it lists the submissions in
+    ingest and summarises those whose summary version, i.e updateDate and scrape config, differs from the version in
+    the store, so summary requests are served precomputed summaries.
+    """
+
+    def __init__(self, summary_service, interval: float):
+        self.summary_service = summary_service
+        self.interval = interval
+        self.logger = logging.getLogger(__name__)
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.runs = 0
+        self.indexed = 0
+        self.failed = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='summary-indexer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
+    def index(self) -> int:
+        """
+        Summarises every submission whose stored summary is missing or out of date
+        :return: the number of submissions summarised
+        """
+        ingest_api = self.summary_service.ingestapi
+        summary_store = self.summary_service.summary_store
+        submissions_url = ingest_api.get_resource_repository_url('submissionEnvelopes')
+
+        indexed = 0
+        for submission in ingest_api.get_all(submissions_url, 'submissionEnvelopes'):
+            if self._stopped.is_set():
+                break
+            submission_uuid = self.summary_service.uuid_from_submission(submission)
+            if summary_store.version_of(submission_uuid) == self.summary_service.summary_version(submission):
+                continue
+            try:
+                self.summary_service.summary_for_submission(submission)
+                indexed += 1
+            except Exception as e:
+                self.failed += 1
+                self.logger.warning(f'Could not index the summary of submission {submission_uuid}: {e}')
+
+        self.runs += 1
+        self.indexed += indexed
+        return indexed
+
+    def stats(self) -> dict:
+        return {
+            'interval': self.interval,
+            'runs': self.runs,
+            'indexed': self.indexed,
+            'failed': self.failed
+        }
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                indexed = self.index()
+                self.logger.info(f'Indexed the summaries of {indexed} new or updated submissions')
+            except Exception as e:
+                self.logger.exception(f'Summary indexing failed: {e}')
+            self._stopped.wait(self.interval)
@@ -1,15 +1,13 @@
 import io
 from http import HTTPStatus
 
-import jsonpickle
 from flask import Blueprint, send_file, request
 from flask import current_app as app
 from hca_ingest.utils.date import parse_date_string
 
-from broker.common.util import response_json
+from broker.common.util import response_json, encode_json, strong_etag, not_modified, revalidated
 from broker.service.spreadsheet_storage import SubmissionSpreadsheetDoesntExist
 from broker.service.spreadsheet_storage import SpreadsheetStorageService
-from broker.service.summary_service import SummaryService
 from broker.submissions.export_to_spreadsheet_service import ExportToSpreadsheetService
 
 submissions_bp = Blueprint(
@@ -52,13 +50,20 @@ def download_spreadsheet(submission_uuid):
     # Don't switch to the pythonic 'key' in dictionary pattern here since
     # the service starts jobs with finishedDate set to None
     if spreadsheet_job.get('finishedDate'):
+        # a spreadsheet is never changed once its generation job has finished
+        etag = strong_etag(submission_uuid, spreadsheet_job.get('createdDate'), spreadsheet_job.get('finishedDate'))
+        not_modified_response = not_modified(etag)
+        if not_modified_response:
+            return not_modified_response
+
         create_date = parse_date_string(spreadsheet_job.get('createdDate'))
         spreadsheet_details = ExportToSpreadsheetService.get_spreadsheet_details(
             app.SPREADSHEET_STORAGE_DIR, submission_uuid, create_date)
-        return send_file(spreadsheet_details.filepath,
-                         as_attachment=True,
-                         cache_timeout=0,
-                         attachment_filename=spreadsheet_details.filename)
+        return revalidated(send_file(spreadsheet_details.filepath,
+                                     as_attachment=True,
+                                     cache_timeout=0,
+                                     add_etags=False,
+                                     attachment_filename=spreadsheet_details.filename), etag)
     elif spreadsheet_job.get('createdDate'):
         return response_json(HTTPStatus.ACCEPTED, {'message': 'The spreadsheet is being generated.'})
     else:
@@ -92,10 +97,14 @@ def get_submission_spreadsheet(submission_uuid):
 @submissions_bp.route('/<submission_uuid>/summary', methods=['GET'])
 def submission_summary(submission_uuid):
     submission = app.ingest_api.get_submission_by_uuid(submission_uuid)
-    summary = SummaryService(app.ingest_api).summary_for_submission(submission)
-
-    return app.response_class(
-        response=jsonpickle.encode(summary, unpicklable=False),
+    etag = strong_etag(submission_uuid, app.summary_service.summary_version(submission))
+    not_modified_response = not_modified(etag)
+    if not_modified_response:
+        return not_modified_response
+
+    summary = app.summary_service.summary_for_submission(submission)
+    return revalidated(app.response_class(
+        response=encode_json(summary.to_dict()),
         status=HTTPStatus.OK,
         mimetype='application/json'
-    )
+    ), etag)
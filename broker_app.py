@@ -12,15 +12,24 @@ from flask import json
 from flask_cors import CORS, cross_origin
 from hca_ingest.api.ingestapi import IngestApi
 
+from broker.common.util import response_json, encode_json, iter_encode_json
+from broker.common.util import strong_etag, not_modified, revalidated, uncacheable
 from broker.import_geo.routes import import_geo_bp
 from broker.schemas.routes import schemas_bp
+from broker.service.bulk_summaries import BulkSummaries, MAX_BULK_SUMMARIES
+from broker.service.spreadsheet_generation.schema_template_loader import SchemaTemplateLoader
 from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetGenerator
 from broker.service.spreadsheet_generation.spreadsheet_job_manager import (
     SpreadsheetJobManager,
     SpreadsheetSpec,
-    JobStatus
+    JobStatus,
+    JobQueueFullException,
+    QUEUE_FULL_RETRY_AFTER
 )
-from broker.service.summary_service import SummaryService
+from broker.service.spreadsheet_generation.spreadsheet_process_pool import SpreadsheetProcessPool
+from broker.service.submission_summary_cache import SubmissionSummaryCache, MAX_CACHE_SIZE
+from broker.service.summary_service import SummaryService, SubmissionScraperLoader, DEFAULT_SCRAPE_CONFIG_PATH
+from broker.service.summary_store import SqliteSummaryStore, SummaryIndexer
 from broker.submissions import submissions_bp
 from broker.upload import upload_bp
 
@@ -45,11 +54,82 @@ def add_routes(app):
     @app.route('/projects/<project_uuid>/summary', methods=['GET'])
     def project_summary(project_uuid):
         project = app.ingest_api.get_project_by_uuid(project_uuid)
-        summary = SummaryService(app.ingest_api).summary_for_project(project)
+        submissions = list(app.summary_service.get_submissions_in_project(project))
+        # the summary only changes when the project's set of submissions, or one of them, or the scrape config does
+        etag = strong_etag(project_uuid, *sorted(f'{app.summary_service.uuid_from_submission(submission)}@'
+                                                 f'{app.summary_service.summary_version(submission)}'
+                                                 for submission in submissions))
+        not_modified_response = not_modified(etag)
+        if not_modified_response:
+            return not_modified_response
+
+        summary = app.summary_service.summary_for_project(project, app.PROJECT_SUMMARY_TIME_BUDGET, submissions)
+
+        # streamed, as the breakdowns of large projects can run to thousands of entries
+        response = app.response_class(
+            response=iter_encode_json(summary.to_dict()),
+            status=HTTPStatus.OK,
+            mimetype='application/json'
+        )
+        # an incomplete summary is superseded as soon as the rest of the submissions are summarised
+        return revalidated(response, etag) if summary.complete else uncacheable(response)
+
+    @cross_origin()
+    @app.route('/summaries', methods=['POST'])
+    def bulk_summaries():
+        request_json = json.loads(request.data)
+        submission_uuids = request_json.get('submissions', []) if isinstance(request_json, dict) else None
+        project_uuids = request_json.get('projects', []) if isinstance(request_json, dict) else None
+        # checked before streaming, as the response can't be an error once the first summary is sent
+        if not isinstance(submission_uuids, list) or not isinstance(project_uuids, list) \
+                or not all(isinstance(uuid, str) for uuid in submission_uuids + project_uuids):
+            return response_json(HTTPStatus.BAD_REQUEST, {'message': 'submissions and projects must be lists of uuids'})
+        if len(submission_uuids) + len(project_uuids) > MAX_BULK_SUMMARIES:
+            return response_json(HTTPStatus.BAD_REQUEST,
+                                 {'message': f'At most {MAX_BULK_SUMMARIES} summaries can be requested at once'})
+
+        summaries = app.bulk_summaries.summarise(submission_uuids, project_uuids)
+
+        def ndjson():
+            try:
+                for summary in summaries:
+                    yield encode_json(summary) + '\n'
+            finally:
+                # the client may have disconnected, leaving summaries to cancel
+                summaries.close()
 
         return app.response_class(
-            response=jsonpickle.encode(summary, unpicklable=False),
+            response=ndjson(),
             status=HTTPStatus.OK,
+            mimetype='application/x-ndjson'
+        )
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        app_metrics = {
+            'submission_summary_cache': app.submission_summary_cache.stats(),
+            'submission_scraper': app.summary_service.submission_scraper_loader.stats()
+        }
+        if app.summary_store:
+            app_metrics['summary_store'] = app.summary_store.stats()
+        if app.summary_indexer:
+            app_metrics['summary_indexer'] = app.summary_indexer.stats()
+        app_metrics['spreadsheet_generator'] = app.spreadsheet_generator.stats()
+        app_metrics['spreadsheet_jobs'] = app.spreadsheet_job_manager.stats()
+        if app.spreadsheet_process_pool:
+            app_metrics['spreadsheet_process_pool'] = app.spreadsheet_process_pool.stats()
+        return app.response_class(
+            response=json.dumps(app_metrics),
+            status=HTTPStatus.OK,
+            mimetype='application/json'
+        )
+
+    @app.route('/ready', methods=['GET'])
+    def ready():
+        schema_status = app.schema_template_loader.status()
+        return app.response_class(
+            response=json.dumps({'ready': schema_status['ready'], 'schemas': schema_status}),
+            status=HTTPStatus.OK if schema_status['ready'] else HTTPStatus.SERVICE_UNAVAILABLE,
             mimetype='application/json'
         )
 
@@ -59,7 +139,16 @@ def add_routes(app):
         request_json = json.loads(request.data)
         filename = request_json["filename"]
         spreadsheet_spec = SpreadsheetSpec.from_dict(request_json["spec"])
-        job_spec = app.spreadsheet_job_manager.create_job(spreadsheet_spec, filename)
+        try:
+            job_spec = app.spreadsheet_job_manager.create_job(spreadsheet_spec, filename)
+        except JobQueueFullException as e:
+            response = app.response_class(
+                response=json.dumps({'message': f'{e}, please try again later.'}),
+                status=HTTPStatus.TOO_MANY_REQUESTS,
+                mimetype='application/json'
+            )
+            response.headers['Retry-After'] = str(QUEUE_FULL_RETRY_AFTER)
+            return response
 
         return app.response_class(
             response=jsonpickle.encode({
@@ -79,7 +168,7 @@ def add_routes(app):
     def get_spreadsheet(job_id: str):
         job_spec = app.spreadsheet_job_manager.load_job_spec(job_id)
         if job_spec.status == JobStatus.STARTED:
-            return app.response_class(
+            return uncacheable(app.response_class(
                 response=jsonpickle.encode({
                     "job_id": job_id,
                     "_links": {
@@ -90,15 +179,22 @@ def add_routes(app):
                 }, unpicklable=False),
                 status=HTTPStatus.ACCEPTED,
                 mimetype='application/hal+json'
-            )
+            ))
         elif job_spec.status == JobStatus.COMPLETE:
+            etag = strong_etag(job_id, job_spec.spreadsheet_hash) if job_spec.spreadsheet_hash else None
+            not_modified_response = not_modified(etag) if etag else None
+            if not_modified_response:
+                return not_modified_response
+
             with app.spreadsheet_job_manager.spreadsheet_for_job(job_id) as spreadsheet_blob:
-                return send_file(
+                response = send_file(
                     io.BytesIO(spreadsheet_blob.read()),
                     mimetype='application/octet-stream',
                     as_attachment=True,
-                    attachment_filename=job_spec.filename
+                    attachment_filename=job_spec.filename,
+                    cache_timeout=0
                 )
+            return revalidated(response, etag) if etag else uncacheable(response)
         elif job_spec.status == JobStatus.ERROR:
             return app.response_class(
                 response=jsonpickle.encode(dict(message=f'Server error creating spreadsheet with job id {str(job_id)}.'
@@ -132,8 +228,55 @@ def create_app():
 
     app.ingest_api = IngestApi()
     app.IngestApi = IngestApi
-    spreadsheet_generator = SpreadsheetGenerator(app.ingest_api)
-    app.spreadsheet_job_manager = SpreadsheetJobManager(spreadsheet_generator, app.SPREADSHEET_STORAGE_DIR)
+    project_summary_time_budget = os.getenv('PROJECT_SUMMARY_TIME_BUDGET')
+    app.PROJECT_SUMMARY_TIME_BUDGET = float(project_summary_time_budget) if project_summary_time_budget else None
+    summary_cache_expiry = os.getenv('SUMMARY_CACHE_EXPIRY')
+    app.submission_summary_cache = SubmissionSummaryCache(int(os.getenv('SUMMARY_CACHE_SIZE', MAX_CACHE_SIZE)),
+                                                          int(summary_cache_expiry) if summary_cache_expiry else None)
+    submission_scraper_loader = SubmissionScraperLoader(os.getenv('SUMMARY_SCRAPE_CONFIG', DEFAULT_SCRAPE_CONFIG_PATH))
+    summary_store_path = os.getenv('SUMMARY_STORE')
+    if summary_store_path:
+        app.summary_store = SqliteSummaryStore(summary_store_path)
+    elif app.SPREADSHEET_STORAGE_DIR:
+        app.summary_store = SqliteSummaryStore.in_storage_dir(app.SPREADSHEET_STORAGE_DIR)
+    else:
+        app.summary_store = None
+    app.summary_service = SummaryService(app.ingest_api, app.submission_summary_cache,
+                                         submission_scraper_loader=submission_scraper_loader,
+                                         summary_store=app.summary_store,
+                                         entity_type_projection=os.getenv('SUMMARY_ENTITY_TYPE_PROJECTION'))
+    app.bulk_summaries = BulkSummaries(app.summary_service)
+    summary_indexer_interval = os.getenv('SUMMARY_INDEXER_INTERVAL')
+    app.summary_indexer = None
+    if app.summary_store and summary_indexer_interval:
+        app.summary_indexer = SummaryIndexer(app.summary_service, float(summary_indexer_interval))
+        app.summary_indexer.start()
+    app.spreadsheet_generator = SpreadsheetGenerator(app.ingest_api)
+    schema_snapshot_path = os.getenv('SCHEMA_SNAPSHOT')
+    schema_refresh_interval = os.getenv('SCHEMA_REFRESH_INTERVAL')
+    schema_refresh_interval = float(schema_refresh_interval) if schema_refresh_interval else None
+    if schema_snapshot_path or not app.SPREADSHEET_STORAGE_DIR:
+        app.schema_template_loader = SchemaTemplateLoader(app.spreadsheet_generator, app.ingest_api,
+                                                          schema_snapshot_path, schema_refresh_interval)
+    else:
+        app.schema_template_loader = SchemaTemplateLoader.in_storage_dir(app.spreadsheet_generator, app.ingest_api,
+                                                                         app.SPREADSHEET_STORAGE_DIR,
+                                                                         schema_refresh_interval)
+    app.schema_template_loader.start()
+    spreadsheet_processes = os.getenv('SPREADSHEET_PROCESSES')
+    spreadsheet_process_max_jobs = os.getenv('SPREADSHEET_PROCESS_MAX_JOBS')
+    app.spreadsheet_process_pool = None
+    if spreadsheet_processes:
+        app.spreadsheet_process_pool = SpreadsheetProcessPool(
+            app.spreadsheet_generator, int(spreadsheet_processes),
+            int(spreadsheet_process_max_jobs) if spreadsheet_process_max_jobs else None)
+    spreadsheet_job_queue_depth = os.getenv('SPREADSHEET_JOB_QUEUE_DEPTH')
+    spreadsheet_job_lease = os.getenv('SPREADSHEET_JOB_LEASE')
+    app.spreadsheet_job_manager = SpreadsheetJobManager(
+        app.spreadsheet_generator, app.SPREADSHEET_STORAGE_DIR, process_pool=app.spreadsheet_process_pool,
+        max_queued_jobs=int(spreadsheet_job_queue_depth) if spreadsheet_job_queue_depth else None,
+        lease_duration=float(spreadsheet_job_lease) if spreadsheet_job_lease else None)
+    app.spreadsheet_job_manager.start()
 
     app.register_blueprint(upload_bp)
     app.register_blueprint(submissions_bp)
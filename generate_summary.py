@@ -1,27 +1,45 @@
 import argparse
+import csv
+import logging
+import os
+import sys
 import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from time import perf_counter
 
-import jsonpickle
 from hca_ingest.api.ingestapi import IngestApi
 
+from broker.common.util import encode_json
 from broker.common.util.tsv_summary_util import TSVSummaryUtil
 from broker.service.summary_service import SummaryService
 
+DEFAULT_WORKERS = 4
+
 
 def generate_submission_summary(uuid, ingest_url):
     ingest_api = IngestApi(ingest_url)
-    submission = ingest_api.getSubmissionByUuid(uuid)
-    summary = SummaryService(ingest_api).summary_for_submission(submission)
-
-    return summary
+    return submission_summary(SummaryService(ingest_api), uuid)
 
 
 def generate_project_summary(uuid, ingest_url):
     ingest_api = IngestApi(ingest_url)
-    project = ingest_api.getProjectByUuid(uuid)
-    summary = SummaryService(ingest_api).summary_for_project(project)
+    return project_summary(SummaryService(ingest_api), uuid)
+
+
+def submission_summary(summary_service: SummaryService, uuid):
+    submission = summary_service.ingestapi.get_submission_by_uuid(uuid)
+    return summary_service.summary_for_submission(submission)
 
-    return summary
+
+def project_summary(summary_service: SummaryService, uuid):
+    project = summary_service.ingestapi.get_project_by_uuid(uuid)
+    return summary_service.summary_for_project(project)
+
+
+def entity_count(summary) -> int:
+    return sum(getattr(summary, f'{entity_type}_summary').count
+               for entity_type in ['biomaterial', 'protocol', 'process', 'file', 'project']
+               if hasattr(summary, f'{entity_type}_summary'))
 
 
 def check_uuid(uuid_str):
@@ -32,33 +50,157 @@ def check_uuid(uuid_str):
         raise argparse.ArgumentTypeError("%s is an invalid uuid value" % uuid_str)
 
 
+def read_uuids(uuids_file):
+    """
+    :raises argparse.ArgumentTypeError: naming the first line that isn't a valid uuid
+    """
+    for line_number, line in enumerate(uuids_file, start=1):
+        uuid_str = line.strip()
+        if uuid_str and not uuid_str.startswith('#'):
+            try:
+                yield check_uuid(uuid_str)
+            except argparse.ArgumentTypeError as e:
+                raise argparse.ArgumentTypeError(f'line {line_number}: {e}')
+
+
+def read_checkpoint(checkpoint_path) -> set:
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path) as checkpoint_file:
+        return {line.strip() for line in checkpoint_file if line.strip()}
+
+
+class SummaryWriter:
+    """
+    Writes the summaries of many submissions or projects to one output, as they complete. Every summary is written
+    and flushed before its uuid is added to the checkpoint, so a run resumed from the checkpoint only repeats
+    summaries it hadn't finished writing.
+    """
+
+    def __init__(self, output, output_format, checkpoint_file=None, write_header=True):
+        self.output = output
+        self.output_format = output_format
+        self.checkpoint_file = checkpoint_file
+        self.tsv_writer = csv.writer(output, delimiter='\t', lineterminator='\n') if output_format == 'tsv' else None
+        if self.tsv_writer and write_header:
+            self.tsv_writer.writerow(TSVSummaryUtil.SUMMARY_ROW_HEADERS)
+
+    def write(self, uuid, summary):
+        if self.tsv_writer:
+            self.tsv_writer.writerows(TSVSummaryUtil.summary_rows(uuid, summary))
+        else:
+            self.output.write(encode_json({'uuid': uuid, 'summary': summary.to_dict()}) + '\n')
+        self.output.flush()
+        if self.checkpoint_file:
+            self.checkpoint_file.write(uuid + '\n')
+            self.checkpoint_file.flush()
+
+
+def summarise_all(summary_service: SummaryService, summary_type, uuids, summary_writer: SummaryWriter,
+                  workers=DEFAULT_WORKERS, done=frozenset()) -> dict:
+    """
+    Summarises the submissions or projects concurrently with the given number of workers, writing each summary as
+    it completes. At most twice as many summaries as workers are held at once, however many uuids there are.
+
+    :param done: uuids already summarised, e.g in the checkpoint of a previous run, which are skipped
+    :return: the summary counts and throughput
+    """
+    summarise = project_summary if summary_type == 'project' else submission_summary
+    stats = {'summarised': 0, 'skipped': 0, 'failed': 0, 'entities': 0}
+    start = perf_counter()
+
+    def write_completed(completed):
+        for future in completed:
+            uuid_str = pending.pop(future)
+            try:
+                summary = future.result()
+            except Exception as e:
+                stats['failed'] += 1
+                logging.getLogger(__name__).error(f'Could not summarise {summary_type} {uuid_str}: {e}')
+                continue
+            summary_writer.write(uuid_str, summary)
+            stats['summarised'] += 1
+            stats['entities'] += entity_count(summary)
+
+    pending = dict()
+    with ThreadPoolExecutor(workers) as executor:
+        for uuid_str in dict.fromkeys(uuids):
+            if uuid_str in done:
+                stats['skipped'] += 1
+                continue
+            if len(pending) >= 2 * workers:
+                completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+                write_completed(completed)
+            pending[executor.submit(summarise, summary_service, uuid_str)] = uuid_str
+        while pending:
+            completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+            write_completed(completed)
+
+    stats['seconds'] = perf_counter() - start
+    stats['entities_per_second'] = stats['entities'] / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
+
+
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='Process some integers.')
+    parser = argparse.ArgumentParser(description='Generate the summaries of one or many projects or submissions.')
     parser.add_argument('ingest_api', metavar='H', nargs=1,
                         help='the url of the ingest API (e.g https://api.ingest.dev.archive.data.humancellatlas.org)')
     parser.add_argument('summary_type', metavar='T', nargs=1, choices=['project', 'submission'],
                         help='the type of summary (project or submission)')
-    parser.add_argument('uuid', metavar='U', nargs=1, type=check_uuid,
-                        help='the uuid of the project/submission')
+    parser.add_argument('uuid', metavar='U', nargs='*', type=check_uuid,
+                        help='the uuids of the projects/submissions')
     parser.add_argument('output_format', metavar='O', nargs=1, choices=['json', 'tsv'],
-                        help='summary output format')
+                        help='summary output format: one JSON summary per line, or one TSV of all the summaries')
+    parser.add_argument('--uuids', metavar='FILE', type=argparse.FileType('r'),
+                        help='a file of uuids to summarise, one per line, or - for stdin')
+    parser.add_argument('--output', metavar='FILE',
+                        help='the file to write summaries to, by default stdout. Without this, --uuids or '
+                             '--checkpoint, the summary of a single uuid is printed as json, or written as tsv to '
+                             'report.tsv and scrape.tsv')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'number of summaries generated concurrently (default {DEFAULT_WORKERS})')
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help='file recording the uuids summarised so far. Those already in it are skipped, and the '
+                             'output file is appended to, so an interrupted run can be resumed')
 
     args = parser.parse_args()
 
-    uuid_str = args.uuid[0]
     summary_type = args.summary_type[0]
     ingest_url = args.ingest_api[0]
     output_format = args.output_format[0]
-
-    summary = generate_project_summary(uuid_str, ingest_url) if summary_type == 'project' else generate_submission_summary(uuid_str, ingest_url)
-
-    if output_format == 'json':
-        print(jsonpickle.encode(summary, unpicklable=False))
-    elif output_format == 'tsv':
-        if summary_type == 'project':
+    try:
+        uuids = list(args.uuid) + (list(read_uuids(args.uuids)) if args.uuids else [])
+    except argparse.ArgumentTypeError as e:
+        parser.error(f'argument --uuids: {e}')
+
+    if len(args.uuid) == 1 and not (args.uuids or args.output or args.checkpoint):
+        uuid_str = uuids[0]
+        summary = generate_project_summary(uuid_str, ingest_url) if summary_type == 'project' else generate_submission_summary(uuid_str, ingest_url)
+        if output_format == 'json':
+            print(encode_json(summary.to_dict()))
+        elif summary_type == 'project':
             TSVSummaryUtil.project_summary_to_tsv(summary)
         else:
             TSVSummaryUtil.submission_summary_to_tsv(summary)
+        sys.exit(0)
 
+    done = read_checkpoint(args.checkpoint)
+    resuming = bool(done) and args.output and os.path.exists(args.output) and os.path.getsize(args.output) > 0
+    output = open(args.output, 'a' if resuming else 'w') if args.output else sys.stdout
+    checkpoint_file = open(args.checkpoint, 'a') if args.checkpoint else None
 
-
+    summary_service = SummaryService(IngestApi(ingest_url), submission_worker_pool=ThreadPoolExecutor(args.workers))
+    try:
+        stats = summarise_all(summary_service, summary_type, uuids,
+                              SummaryWriter(output, output_format, checkpoint_file, write_header=not resuming),
+                              args.workers, done)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if checkpoint_file:
+            checkpoint_file.close()
+
+    print(f'Summarised {stats["summarised"]} {summary_type}s ({stats["skipped"]} already done, {stats["failed"]} failed): '
+          f'{stats["entities"]} entities in {stats["seconds"]:.1f}s, {stats["entities_per_second"]:.1f} entities/s',
+          file=sys.stderr)
+    sys.exit(1 if stats['failed'] else 0)
@@ -0,0 +1,79 @@
+"""
+Compares the per-entity cost of scraping a synthetic submission of 100k biomaterials using jsonpath_rw for every
+scrape path against using the compiled accessors, both for evaluating the biomaterial scrape paths alone and for the
+whole biomaterial scrape.
+
+usage: python -m test.benchmark.scrape_path_benchmark [entity count]
+"""
+import sys
+from time import perf_counter
+from unittest.mock import patch
+
+from broker.service.scrape_paths import JsonPathAccessor
+from broker.service.summary_service import SubmissionScraper, DEFAULT_SCRAPE_CONFIG_PATH
+
+
+def synthetic_biomaterials(count):
+    for i in range(count):
+        if i % 10 == 0:
+            yield {'content': {'describedBy': 'https://schema.humancellatlas.org/type/biomaterial/15.5.0/donor_organism',
+                               'biomaterial_core': {'biomaterial_id': f'donor_{i}'},
+                               'genus_species': [{'text': 'Homo sapiens', 'ontology': 'NCBITaxon:9606'}]}}
+        elif i % 10 < 4:
+            yield {'content': {'describedBy': 'https://schema.humancellatlas.org/type/biomaterial/10.4.0/specimen_from_organism',
+                               'biomaterial_core': {'biomaterial_id': f'specimen_{i}'},
+                               'organ': {'text': 'heart', 'ontology': 'UBERON:0000948'},
+                               'organ_part': [{'text': 'left ventricle', 'ontology': 'UBERON:0002084'}]}}
+        else:
+            yield {'content': {'describedBy': 'https://schema.humancellatlas.org/type/biomaterial/13.3.0/cell_suspension',
+                               'biomaterial_core': {'biomaterial_id': f'cell_suspension_{i}'},
+                               'selected_cell_types': [{'text': 'cardiac muscle cell', 'ontology': 'CL:0000746'}],
+                               'total_estimated_cells': 1000}}
+
+
+def time_paths(scraper, entities):
+    accessors = [accessor for directive in scraper.directives_for('biomaterial')
+                 for accessor in directive.accessors]
+    start = perf_counter()
+    for entity in entities:
+        for accessor in accessors:
+            accessor.find_values(entity['content'])
+    return perf_counter() - start
+
+
+def time_scrape(scraper, entities):
+    scrape = scraper.new_scrape('biomaterial')
+    start = perf_counter()
+    for entity in entities:
+        scrape.add(entity)
+    return perf_counter() - start, scrape.result()
+
+
+def main(count):
+    entities = list(synthetic_biomaterials(count))
+
+    with patch('broker.service.summary_service.compile_path', JsonPathAccessor):
+        jsonpath_scraper = SubmissionScraper.from_file(DEFAULT_SCRAPE_CONFIG_PATH)
+    compiled_scraper = SubmissionScraper.from_file(DEFAULT_SCRAPE_CONFIG_PATH)
+
+    jsonpath_path_seconds = time_paths(jsonpath_scraper, entities)
+    compiled_path_seconds = time_paths(compiled_scraper, entities)
+    jsonpath_seconds, jsonpath_result = time_scrape(jsonpath_scraper, entities)
+    compiled_seconds, compiled_result = time_scrape(compiled_scraper, entities)
+
+    assert sorted(jsonpath_result) == sorted(compiled_result)
+    assert jsonpath_result['num_total_estimated_cells'] == compiled_result['num_total_estimated_cells']
+
+    print(f'{count} biomaterials')
+    report('path evaluation', count, jsonpath_path_seconds, compiled_path_seconds)
+    report('whole scrape', count, jsonpath_seconds, compiled_seconds)
+
+
+def report(name, count, jsonpath_seconds, compiled_seconds):
+    print(name)
+    print(f'  jsonpath_rw: {jsonpath_seconds:.2f}s, {jsonpath_seconds / count * 1e6:.1f}us per entity')
+    print(f'  compiled:    {compiled_seconds:.2f}s, {compiled_seconds / count * 1e6:.1f}us per entity')
+    print(f'  speedup:     {jsonpath_seconds / compiled_seconds:.1f}x')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
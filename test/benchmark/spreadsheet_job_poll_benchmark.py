@@ -0,0 +1,50 @@
+"""
+Compares the cost of polling a spreadsheet job's status, as GET /spreadsheets/download/<job_id> does, reading the job
+spec from its file with reading it from the SpreadsheetJobManager's in-memory registry.
+
+usage: python -m test.benchmark.spreadsheet_job_poll_benchmark [polls]
+"""
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from unittest.mock import Mock
+
+from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetGenerator, SpreadsheetSpec, \
+    TypeSpec, LinkSpec, IncludeAllModules
+from broker.service.spreadsheet_generation.spreadsheet_job_manager import SpreadsheetJobManager
+
+
+def time_polls(name, poll, polls):
+    start = perf_counter()
+    for _ in range(polls):
+        poll()
+    seconds = (perf_counter() - start) / polls
+    print(f'{name:<24} {seconds * 1000000:10.3f}us')
+    return seconds
+
+
+def main(polls=10000):
+    spreadsheet_spec = SpreadsheetSpec([TypeSpec(schema_name, IncludeAllModules(), True, LinkSpec(['donor_organism']))
+                                        for schema_name in ['specimen_from_organism', 'cell_suspension',
+                                                            'sequence_file', 'library_preparation_protocol']])
+    finish_generation = threading.Event()
+    spreadsheet_generator = Mock(spec=SpreadsheetGenerator, schema_version='schema-version')
+    spreadsheet_generator.generate.side_effect = lambda *args: finish_generation.wait()
+    with tempfile.TemporaryDirectory() as output_dir:
+        job_manager = SpreadsheetJobManager(spreadsheet_generator, output_dir, ThreadPoolExecutor(1))
+        job_id = job_manager.create_job(spreadsheet_spec, 'spreadsheet.xlsx').job_id
+        job_spec_path = f'{output_dir}/{job_id}.json'
+        print(f'polling the status of a running spreadsheet job, mean of {polls} polls')
+
+        file_seconds = time_polls('job spec file', lambda: job_manager.load_job_spec_from_path(job_spec_path), polls)
+        memory_seconds = time_polls('in-memory registry', lambda: job_manager.status_for_job(job_id), polls)
+        finish_generation.set()
+        job_manager.worker_pool.shutdown()
+
+    print(f'polling the in-memory registry is {file_seconds / memory_seconds:.0f}x faster')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
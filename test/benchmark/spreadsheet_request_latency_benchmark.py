@@ -0,0 +1,89 @@
+"""
+Measures the latency of a small CPU-bound task standing in for a request, e.g encoding a summary, while several
+spreadsheets with wide tabs are generated: idle, with generation in threads of the same process, as spreadsheet
+jobs used to be, and in a SpreadsheetProcessPool.
+
+usage: python -m test.benchmark.spreadsheet_request_latency_benchmark [spreadsheets] [columns per tab] [processes]
+"""
+import os
+import statistics
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait
+from time import perf_counter, sleep
+from unittest.mock import Mock
+
+from hca_ingest.template.schema_template import SchemaTemplate
+
+from broker.common.util import encode_json
+from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetGenerator, SpreadsheetSpec, \
+    TypeSpec, LinkSpec, IncludeAllModules
+from broker.service.spreadsheet_generation.spreadsheet_process_pool import SpreadsheetProcessPool
+from test.benchmark.summary_encoding_benchmark import synthetic_project_summary
+from test.unit.service.spreadsheet_generation.schema_fixtures import json_schemas, PROPERTY_MIGRATIONS
+
+REQUEST_INTERVAL = 0.005
+
+
+def wide_schema_template(columns) -> SchemaTemplate:
+    schemas = json_schemas()
+    for schema in schemas:
+        for i in range(columns):
+            schema['properties'][f'field_{i}'] = {'description': f'Field {i}.', 'type': 'string',
+                                                  'user_friendly': f'Field {i}', 'example': 'example'}
+    return SchemaTemplate(json_schema_docs=schemas, property_migrations=PROPERTY_MIGRATIONS)
+
+
+def request_latencies(seconds) -> list:
+    project_summary = synthetic_project_summary(100).to_dict()
+    latencies = []
+    end = perf_counter() + seconds
+    while perf_counter() < end:
+        # a request arrives as the sleep ends, and has to wait for the GIL before it's served
+        due = perf_counter() + REQUEST_INTERVAL
+        sleep(REQUEST_INTERVAL)
+        encode_json(project_summary)
+        latencies.append(perf_counter() - due)
+    return latencies
+
+
+def report(name, latencies):
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    print(f'{name:<36} p50 {statistics.median(latencies) * 1000:7.3f}ms  p95 {p95 * 1000:7.3f}ms')
+
+
+def generating_latencies(generate, spreadsheets, output_dir) -> list:
+    spreadsheet_spec = SpreadsheetSpec([TypeSpec(name, IncludeAllModules(), False, LinkSpec())
+                                        for name in ['donor_organism', 'specimen_from_organism', 'sequence_file']])
+    with ThreadPoolExecutor(spreadsheets) as job_threads:
+        jobs = [job_threads.submit(generate, spreadsheet_spec, os.path.join(output_dir, f'{i}.xlsx'))
+                for i in range(spreadsheets)]
+        latencies = []
+        while not all(job.done() for job in jobs):
+            latencies.extend(request_latencies(0.2))
+        wait(jobs)
+        for job in jobs:
+            job.result()
+    return latencies
+
+
+def main(spreadsheets=4, columns=2000, processes=4):
+    spreadsheet_generator = SpreadsheetGenerator(Mock(url='http://ingest'), wide_schema_template(columns))
+    process_pool = SpreadsheetProcessPool(spreadsheet_generator, processes)
+    print(f'request latency while generating {spreadsheets} spreadsheets of 3 tabs with {columns} columns each')
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        report('idle', request_latencies(2))
+        start = perf_counter()
+        report('generating in threads', generating_latencies(spreadsheet_generator.generate, spreadsheets, output_dir))
+        print(f'{"":<36} {perf_counter() - start:.1f}s to generate')
+        process_pool.generate(SpreadsheetSpec([]), os.path.join(output_dir, 'warm-up.xlsx'))
+        start = perf_counter()
+        report(f'generating in {processes} processes',
+               generating_latencies(process_pool.generate, spreadsheets, output_dir))
+        print(f'{"":<36} {perf_counter() - start:.1f}s to generate')
+    process_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,74 @@
+"""
+Compares the per-spreadsheet overhead of preparing the template a spreadsheet is built from: dumping the tabs to a
+yaml temp file, loading it as a TabConfig and parsing every schema into a new SchemaTemplate, as spreadsheet jobs
+used to, against the generator's cached copy of its own SchemaTemplate with the tab config replaced.
+
+The schemas are synthetic copies of the unit test schemas, and the old path is given the property migrations rather
+than fetching them from the schema server, so its real cost is higher still.
+
+usage: python -m test.benchmark.spreadsheet_template_benchmark [schemas] [repeats]
+"""
+import sys
+import tempfile
+from time import perf_counter
+from unittest.mock import Mock
+
+import yaml
+from hca_ingest.template.schema_template import SchemaTemplate
+from hca_ingest.template.tab_config import TabConfig
+
+from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetGenerator, SpreadsheetSpec, \
+    TypeSpec, LinkSpec, IncludeAllModules, TemplateYaml
+from test.unit.service.spreadsheet_generation.schema_fixtures import json_schemas, PROPERTY_MIGRATIONS
+
+
+def synthetic_json_schemas(schema_count):
+    fixture_schemas = json_schemas()
+    schemas = list(fixture_schemas)
+    for i in range(len(schemas), schema_count):
+        schema = dict(fixture_schemas[i % len(fixture_schemas)])
+        schema['name'] = f'{schema["name"]}_{i}'
+        schema['$id'] = f'{schema["$id"]}_{i}'
+        schemas.append(schema)
+    return schemas
+
+
+def yaml_round_trip_template(generator: SpreadsheetGenerator, template_yaml: TemplateYaml) -> SchemaTemplate:
+    with tempfile.NamedTemporaryFile('w') as yaml_file:
+        yaml.dump(template_yaml.to_yml_dict(), yaml_file)
+        tab_config = TabConfig().load(yaml_file.name)
+        return SchemaTemplate(json_schema_docs=generator.schema_template.json_schemas, tab_config=tab_config,
+                              property_migrations=PROPERTY_MIGRATIONS)
+
+
+def time_template(name, prepare, repeats):
+    start = perf_counter()
+    for _ in range(repeats):
+        prepare()
+    seconds = (perf_counter() - start) / repeats
+    print(f'{name:<32} {seconds * 1000:10.3f}ms')
+    return seconds
+
+
+def main(schema_count=100, repeats=20):
+    schema_template = SchemaTemplate(json_schema_docs=synthetic_json_schemas(schema_count),
+                                     property_migrations=PROPERTY_MIGRATIONS)
+    generator = SpreadsheetGenerator(Mock(url='http://ingest'), schema_template)
+    spreadsheet_spec = SpreadsheetSpec([TypeSpec('donor_organism', IncludeAllModules(), False, LinkSpec()),
+                                        TypeSpec('specimen_from_organism', IncludeAllModules(), True,
+                                                 LinkSpec(['donor_organism']))])
+    parsed_tabs = [generator.tab_for_type(type_spec) for type_spec in spreadsheet_spec.types]
+    template_yaml = TemplateYaml(generator.template_tabs_from_parsed_tabs(parsed_tabs))
+    print(f'preparing a 2 tab spreadsheet template from {len(schema_template.json_schemas)} schemas, '
+          f'mean of {repeats} runs')
+
+    round_trip_seconds = time_template('yaml temp file + SchemaTemplate',
+                                       lambda: yaml_round_trip_template(generator, template_yaml), repeats)
+    in_memory_seconds = time_template('cached in-memory template',
+                                      lambda: generator.spreadsheet_template(template_yaml), repeats)
+
+    print(f'the cached in-memory template is {round_trip_seconds / in_memory_seconds:.0f}x faster')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,54 @@
+"""
+Compares encoding a project summary with 10k specific types in each entity breakdown using jsonpickle, as the summary
+endpoints used to, against to_dict with the C accelerated json encoder, whole and streamed in chunks.
+
+usage: python -m test.benchmark.summary_encoding_benchmark [breakdown keys] [repeats]
+"""
+import sys
+from time import perf_counter
+
+import jsonpickle
+
+from broker.common.project_summary import ProjectSummary
+from broker.common.util import encode_json, iter_encode_json
+
+
+def synthetic_project_summary(breakdown_keys) -> ProjectSummary:
+    project_summary = ProjectSummary()
+    for entity_summary in [project_summary.biomaterial_summary, project_summary.protocol_summary,
+                           project_summary.process_summary, project_summary.file_summary]:
+        for i in range(breakdown_keys):
+            entity_summary.breakdown[f'specific_type_{i}'] = {'count': i + 1}
+            entity_summary.count += i + 1
+    project_summary.submission_status = 'Valid'
+    project_summary.create_date = '2022-01-27T11:57:05.187Z'
+    project_summary.last_updated_date = '2022-01-27T12:00:58.417Z'
+    return project_summary
+
+
+def time_encoding(name, encode, repeats):
+    start = perf_counter()
+    for _ in range(repeats):
+        encoded = encode()
+    seconds = (perf_counter() - start) / repeats
+    print(f'{name:<32} {seconds * 1000:8.2f}ms {len(encoded):>10} chars')
+    return seconds
+
+
+def main(breakdown_keys=10000, repeats=10):
+    project_summary = synthetic_project_summary(breakdown_keys)
+    print(f'encoding a project summary with {breakdown_keys} breakdown keys per entity type, mean of {repeats} runs')
+
+    jsonpickle_seconds = time_encoding('jsonpickle', lambda: jsonpickle.encode(project_summary, unpicklable=False),
+                                       repeats)
+    to_dict_seconds = time_encoding('to_dict + json encoder', lambda: encode_json(project_summary.to_dict()),
+                                    repeats)
+    streamed_seconds = time_encoding('to_dict + streamed chunks',
+                                     lambda: ''.join(iter_encode_json(project_summary.to_dict())), repeats)
+
+    print(f'to_dict + json encoder is {jsonpickle_seconds / to_dict_seconds:.1f}x faster than jsonpickle, '
+          f'streamed is {jsonpickle_seconds / streamed_seconds:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -30,3 +30,27 @@ class EntitySummaryTest(TestCase):
         # assert original summary wasn't modified by the add
         assert entity_summary.count == 1008
         assert len(entity_summary.breakdown.items()) == 3
+
+    def test_merge_entity_summary_in_place(self):
+        entity_summary = EntitySummary()
+        entity_summary.breakdown['reanimated_donor'] = {'count': 5}
+        entity_summary.count = 5
+        breakdown = entity_summary.breakdown
+
+        another_entity_summary = EntitySummary()
+        another_entity_summary.breakdown['reanimated_donor'] = {'count': 11}
+        another_entity_summary.breakdown['micromachine'] = {'count': 40}
+        another_entity_summary.count = 51
+
+        entity_summary += another_entity_summary
+        entity_summary.merge(another_entity_summary)
+
+        assert entity_summary.breakdown is breakdown
+        assert entity_summary.count == 5 + 51 + 51
+        assert entity_summary.breakdown['reanimated_donor']['count'] == 27
+        assert entity_summary.breakdown['micromachine']['count'] == 80
+
+        # assert the merged summary wasn't modified, nor shares its breakdown entries
+        assert another_entity_summary.count == 51
+        assert another_entity_summary.breakdown['micromachine']['count'] == 40
+        assert entity_summary.breakdown['micromachine'] is not another_entity_summary.breakdown['micromachine']
@@ -35,3 +35,21 @@ class EntityServiceTest(TestCase):
 
         assert project_summary.file_summary.count == 150
         assert len(project_summary.file_summary.breakdown.items()) == 1
+
+    def test_add_submissions_does_not_modify_them(self):
+        project_summary = ProjectSummary()
+        submission_summaries = []
+        for count in [5, 7]:
+            submission_summary = SubmissionSummary()
+            submission_summary.file_summary.breakdown['cell_montage_file'] = {'count': count}
+            submission_summary.file_summary.count = count
+            submission_summaries.append(submission_summary)
+
+        for submission_summary in submission_summaries:
+            project_summary.add_submission_summary(submission_summary)
+
+        assert project_summary.file_summary.count == 12
+        assert project_summary.file_summary.breakdown['cell_montage_file']['count'] == 12
+        assert [summary.file_summary.count for summary in submission_summaries] == [5, 7]
+        assert [summary.file_summary.breakdown['cell_montage_file']['count'] for summary in submission_summaries] \
+               == [5, 7]
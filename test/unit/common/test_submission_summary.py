@@ -0,0 +1,55 @@
+import json
+from unittest import TestCase
+
+import jsonpickle
+
+from broker.common.project_summary import ProjectSummary
+from broker.common.submission_summary import SubmissionSummary
+from broker.common.util import encode_json, iter_encode_json
+
+
+class SubmissionSummaryTest(TestCase):
+    def setUp(self):
+        self.submission_summary = SubmissionSummary()
+        for specific_type in ['donor_organism', 'specimen_from_organism', 'donor_organism']:
+            self.submission_summary.biomaterial_summary.add_entity(specific_type)
+        for i in range(25):
+            self.submission_summary.file_summary.add_entity(f'file_type_{i}')
+        self.submission_summary.project_summary.add_entity('project')
+        self.submission_summary.scrape_result = {'project_title': ['A project'], 'organ': ['heart', 'lung'],
+                                                 'num_total_estimated_cells': 1000, 'num_fastqs': 25,
+                                                 'contact_names/emails': [['Jane Doe', 'jane@example.org']]}
+        self.submission_summary.submission_status = 'Valid'
+        self.submission_summary.create_date = '2022-01-27T11:57:05.187Z'
+        self.submission_summary.last_updated_date = '2022-01-27T12:00:58.417Z'
+
+    def test_to_dict_has_the_jsonpickle_encoded_fields(self):
+        self.assertEqual(json.loads(jsonpickle.encode(self.submission_summary, unpicklable=False)),
+                         json.loads(encode_json(self.submission_summary.to_dict())))
+
+    def test_from_dict_rebuilds_summary(self):
+        rebuilt_summary = SubmissionSummary.from_dict(json.loads(encode_json(self.submission_summary.to_dict())))
+
+        self.assertEqual(self.submission_summary.to_dict(), rebuilt_summary.to_dict())
+        self.assertEqual(['donor_organism', 'specimen_from_organism'],
+                         list(rebuilt_summary.biomaterial_summary.breakdown))
+        rebuilt_summary.file_summary.add_entity('file_type_0')
+        self.assertEqual(2, rebuilt_summary.file_summary.breakdown['file_type_0']['count'])
+
+    def test_project_summary_to_dict_has_the_jsonpickle_encoded_fields(self):
+        project_summary = ProjectSummary()
+        project_summary.add_submission_summary(self.submission_summary)
+        project_summary.complete = False
+
+        self.assertEqual(json.loads(jsonpickle.encode(project_summary, unpicklable=False)),
+                         json.loads(encode_json(project_summary.to_dict())))
+
+    def test_streamed_encoding_matches_whole_encoding(self):
+        summary = self.submission_summary.to_dict()
+        chunks = list(iter_encode_json(summary, chunk_size=10))
+
+        self.assertEqual(encode_json(summary), ''.join(chunks))
+        json.loads(''.join(chunks))
+        # the 25 file types are streamed in chunks of 10
+        self.assertTrue(any(chunk.count('file_type_') == 10 for chunk in chunks))
+        self.assertFalse(any(chunk.count('file_type_') > 10 for chunk in chunks))
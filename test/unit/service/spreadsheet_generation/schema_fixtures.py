@@ -0,0 +1,69 @@
+from hca_ingest.template.schema_template import SchemaTemplate
+
+SCHEMA_BASE_URL = 'https://schema.humancellatlas.org'
+
+# a non-empty migrations list, as SchemaTemplate fetches the migrations if given none
+PROPERTY_MIGRATIONS = [{
+    'source_schema': 'donor_organism',
+    'property': 'is_alive',
+    'target_schema': 'donor_organism',
+    'replaced_by': 'is_living',
+    'effective_from': '15.0.0',
+    'effective_from_source': '15.0.0',
+    'effective_from_target': '15.0.0'
+}]
+
+
+def _schema(path: str, name: str, properties: dict, **fields) -> dict:
+    return {
+        '$schema': 'http://json-schema.org/draft-07/schema#',
+        '$id': f'{SCHEMA_BASE_URL}/{path}/{name}',
+        'name': name,
+        'title': name,
+        'description': f'A {name}.',
+        'type': 'object',
+        'properties': properties,
+        **fields
+    }
+
+
+def _string(user_friendly: str, example: str = 'example') -> dict:
+    return {'description': f'{user_friendly} description.', 'type': 'string', 'user_friendly': user_friendly,
+            'example': example}
+
+
+def _core(path: str, name: str, id_field: str, id_name: str) -> dict:
+    return _schema(path, name, {id_field: _string(id_name, 'ABC123')}, user_friendly=name.replace('_', ' ').capitalize())
+
+
+def json_schemas(version: str = '15.5.0') -> list:
+    contributor = _schema('module/project/9.0.0', 'contributor', {'name': _string('Contributor name', 'Jo Bloggs')})
+    return [
+        _schema(f'type/biomaterial/{version}', 'donor_organism', {
+            'biomaterial_core': _core('core/biomaterial/2.1.0', 'biomaterial_core', 'biomaterial_id', 'Biomaterial ID'),
+            'is_living': _string('Is living?', 'yes')
+        }),
+        _schema('type/biomaterial/13.3.0', 'specimen_from_organism', {
+            'biomaterial_core': _core('core/biomaterial/2.1.0', 'biomaterial_core', 'biomaterial_id', 'Biomaterial ID'),
+            'organ_description': _string('Organ description', 'heart')
+        }),
+        _schema('type/file/9.5.0', 'sequence_file', {
+            'file_core': _core('core/file/6.2.0', 'file_core', 'file_id', 'File ID'),
+            'read_index': _string('Read index', 'read1')
+        }),
+        _schema('type/process/9.2.0', 'process', {
+            'process_core': _core('core/process/2.0.0', 'process_core', 'process_id', 'Process ID')
+        }),
+        _schema('type/project/17.0.0', 'project', {
+            'project_title': _string('Project title'),
+            'contributors': {'description': 'People contributing to the project.', 'type': 'array',
+                             'items': contributor, 'user_friendly': 'Contributors'}
+        })
+    ]
+
+
+def schema_template(version: str = '15.5.0') -> SchemaTemplate:
+    """
+    a SchemaTemplate of a handful of small schemas, built without fetching anything from the network
+    """
+    return SchemaTemplate(json_schema_docs=json_schemas(version), property_migrations=PROPERTY_MIGRATIONS)
@@ -0,0 +1,96 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from hca_ingest.template.schema_template import SchemaTemplate
+
+from broker.service.spreadsheet_generation.schema_index import SchemaIndex, UnknownSchemaException
+from broker.service.spreadsheet_generation.schema_spec import ParseUtils
+from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetGenerator, TypeSpec, LinkSpec, \
+    IncludeAllModules
+from test.unit.service.spreadsheet_generation.schema_fixtures import schema_template, json_schemas, \
+    PROPERTY_MIGRATIONS
+
+
+class SchemaIndexTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_template = schema_template()
+
+    def setUp(self):
+        self.schema_index = SchemaIndex(self.schema_template)
+
+    def test_entries_by_schema_name(self):
+        # when
+        entry = self.schema_index.entry('donor_organism')
+
+        # then
+        self.assertEqual(5, len(self.schema_index))
+        self.assertEqual('donor_organism', entry.schema_spec.field_name)
+        self.assertEqual('biomaterial', entry.schema_spec.domain_entity)
+        self.assertEqual(['biomaterial_core', 'is_living'], [field.field_name for field in entry.schema_spec.fields])
+        self.assertEqual('Donor organism', entry.display_name)
+        self.assertEqual('https://schema.humancellatlas.org/type/biomaterial/15.5.0/donor_organism',
+                         entry.json_schema['$id'])
+        self.assertEqual('Contributors', self.schema_index.sub_module_display_name('project', 'contributors'))
+        self.assertEqual('funders', self.schema_index.sub_module_display_name('project', 'funders'))
+
+    def test_unknown_schema(self):
+        with self.assertRaises(UnknownSchemaException):
+            self.schema_index.schema_spec('imaging_target')
+
+    def test_unparseable_schema_only_fails_when_used(self):
+        # given
+        schemas = json_schemas()
+        donor_schema = next(schema for schema in schemas if schema['name'] == 'donor_organism')
+        donor_schema['properties']['is_living']['type'] = 'null'
+        unparseable_template = SchemaTemplate(json_schema_docs=schemas, property_migrations=PROPERTY_MIGRATIONS)
+
+        # when
+        schema_index = SchemaIndex(unparseable_template)
+
+        # then
+        self.assertEqual('Specimen from organism', schema_index.display_name('specimen_from_organism'))
+        with self.assertRaisesRegex(Exception, 'Unknown value type "null"'):
+            schema_index.schema_spec('donor_organism')
+
+    def test_version_changes_with_schema_release(self):
+        # given
+        reordered_template = SchemaTemplate(json_schema_docs=list(reversed(json_schemas())),
+                                            property_migrations=PROPERTY_MIGRATIONS)
+
+        # then
+        self.assertEqual(self.schema_index.version, SchemaIndex(reordered_template).version)
+        self.assertNotEqual(self.schema_index.version, SchemaIndex(schema_template('16.0.0')).version)
+
+    def test_tab_layout_does_not_parse_schemas(self):
+        # given
+        spreadsheet_generator = SpreadsheetGenerator(Mock(url='http://ingest'), self.schema_template)
+        specimen_spec = TypeSpec('specimen_from_organism', IncludeAllModules(), True, LinkSpec(['donor_organism']))
+        project_spec = TypeSpec('project', IncludeAllModules(), False, None)
+
+        # when
+        with patch.object(ParseUtils, 'parse_schema_spec', side_effect=AssertionError('schema parsed')):
+            specimen_tab = spreadsheet_generator.tab_for_type(specimen_spec)
+            project_tab = spreadsheet_generator.tab_for_type(project_spec)
+
+        # then
+        self.assertEqual('Specimen from organism', specimen_tab.display_name)
+        self.assertEqual(['specimen_from_organism.biomaterial_core.biomaterial_id',
+                          'specimen_from_organism.organ_description',
+                          'donor_organism.biomaterial_core.biomaterial_id',
+                          'process.process_core.process_id'], [column.path for column in specimen_tab.columns])
+        self.assertEqual('Donor organism - ID', specimen_tab.columns[2].name)
+        self.assertEqual(['Project - Contributors'], [sub_tab.display_name for sub_tab in project_tab.sub_tabs])
+        self.assertEqual(['project.contributors.name'], [column.path for column in project_tab.sub_tabs[0].columns])
+
+    def test_tab_layout_leaves_indexed_schema_specs_unchanged(self):
+        # given
+        spreadsheet_generator = SpreadsheetGenerator(Mock(url='http://ingest'), self.schema_template)
+        donor_spec = spreadsheet_generator.schema_index.schema_spec('donor_organism')
+        fields = list(donor_spec.fields)
+
+        # when
+        spreadsheet_generator.tab_for_type(TypeSpec('donor_organism', IncludeAllModules(), True, LinkSpec()))
+
+        # then
+        self.assertEqual(fields, donor_spec.fields)
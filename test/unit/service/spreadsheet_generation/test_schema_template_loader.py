@@ -0,0 +1,156 @@
+import json
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from hca_ingest.api.ingestapi import IngestApi
+from hca_ingest.template.schema_parser import SchemaParser
+
+from broker.service.spreadsheet_generation.schema_template_loader import SchemaTemplateLoader
+from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetGenerator, TypeSpec, LinkSpec, \
+    IncludeAllModules
+from test.unit.service.spreadsheet_generation.schema_fixtures import schema_template
+
+
+def _latest_schemas(schema_template) -> list:
+    return [{'_links': {'json-schema': {'href': url}}} for url in schema_template.metadata_schema_urls]
+
+
+class SchemaTemplateLoaderTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_template = schema_template()
+        cls.new_schema_template = schema_template('16.0.0')
+
+    def setUp(self):
+        self.storage_dir = TemporaryDirectory()
+        self.ingest_api = Mock(spec=IngestApi)
+        self.ingest_api.url = 'http://ingest'
+        self.ingest_api.get_schemas.return_value = _latest_schemas(self.schema_template)
+        self.fetched = []
+
+    def tearDown(self):
+        self.storage_dir.cleanup()
+
+    def loader(self, fetch_schema_template=None) -> SchemaTemplateLoader:
+        def fetch(metadata_schema_urls):
+            self.fetched.append(metadata_schema_urls)
+            if fetch_schema_template:
+                return fetch_schema_template(metadata_schema_urls)
+            return self.new_schema_template if 'biomaterial/16.0.0' in ' '.join(metadata_schema_urls) \
+                else self.schema_template
+
+        spreadsheet_generator = SpreadsheetGenerator(self.ingest_api)
+        loader = SchemaTemplateLoader.in_storage_dir(spreadsheet_generator, self.ingest_api, self.storage_dir.name)
+        loader.fetch_schema_template = fetch
+        return loader
+
+    def test_generator_does_not_fetch_schemas_when_created(self):
+        with patch('broker.service.spreadsheet_generation.spreadsheet_generator.SchemaTemplate') as schema_template:
+            spreadsheet_generator = SpreadsheetGenerator(self.ingest_api)
+
+        schema_template.assert_not_called()
+        self.assertFalse(spreadsheet_generator.is_ready)
+
+    def test_first_load_fetches_schemas_and_writes_snapshot(self):
+        # given
+        loader = self.loader()
+
+        # when
+        loader.load()
+
+        # then
+        self.assertTrue(loader.is_ready())
+        self.assertTrue(loader.spreadsheet_generator.is_ready)
+        self.assertEqual(1, len(self.fetched))
+        self.assertEqual('ingest', loader.status()['source'])
+        with open(loader.snapshot_path) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        self.assertEqual(self.schema_template.metadata_schema_urls, snapshot['metadata_schema_urls'])
+        self.assertEqual(5, len(snapshot['json_schemas']))
+
+    def test_restart_loads_snapshot_without_fetching(self):
+        # given
+        self.loader().load()
+        self.fetched.clear()
+        restarted_loader = self.loader(fetch_schema_template=Mock(side_effect=ConnectionError('ingest unavailable')))
+
+        # when
+        restarted_loader.load()
+
+        # then
+        self.assertEqual([], self.fetched)
+        self.assertEqual('snapshot', restarted_loader.status()['source'])
+        donor_tab = restarted_loader.spreadsheet_generator.tab_for_type(
+            TypeSpec('donor_organism', IncludeAllModules(), False, LinkSpec()))
+        self.assertEqual('Donor organism', donor_tab.display_name)
+        self.assertFalse(restarted_loader.refresh())
+
+    def test_snapshot_includes_referenced_schemas(self):
+        # given
+        module_url = 'https://schema.humancellatlas.org/module/ontology/5.3.5/organ_ontology'
+        module_schema = {'$id': module_url, 'properties': {'text': {'type': 'string'}}}
+        with patch.object(SchemaParser.json_loader, 'store', {module_url: module_schema}):
+            self.loader().load()
+
+        # when
+        with patch.object(SchemaParser.json_loader, 'store', {}) as restarted_store:
+            self.loader().load()
+
+            # then
+            self.assertEqual({module_url: module_schema}, restarted_store)
+
+    def test_refresh_swaps_in_new_schema_release(self):
+        # given
+        loader = self.loader()
+        loader.load()
+        spreadsheet_generator = loader.spreadsheet_generator
+        old_template = spreadsheet_generator.schema_template
+        spreadsheet_generator.tab_for_type(TypeSpec('donor_organism', IncludeAllModules(), False, LinkSpec()))
+
+        # when
+        unchanged = loader.refresh()
+        self.ingest_api.get_schemas.return_value = _latest_schemas(self.new_schema_template)
+        refreshed = loader.refresh()
+
+        # then
+        self.assertFalse(unchanged)
+        self.assertTrue(refreshed)
+        self.assertEqual(2, len(self.fetched))
+        self.assertIsNot(old_template, spreadsheet_generator.schema_template)
+        self.assertEqual(spreadsheet_generator.schema_index.version, loader.status()['schema_version'])
+        self.assertEqual(0, spreadsheet_generator.stats()['tab_layout_cache']['size'])
+        with open(loader.snapshot_path) as snapshot_file:
+            self.assertEqual(self.new_schema_template.metadata_schema_urls,
+                             json.load(snapshot_file)['metadata_schema_urls'])
+
+    def test_failed_snapshot_write_keeps_previous_snapshot(self):
+        # given
+        loader = self.loader()
+        loader.load()
+        with open(loader.snapshot_path) as snapshot_file:
+            snapshot = snapshot_file.read()
+        unserialisable_template = Mock(metadata_schema_urls=[], json_schemas=[object()], property_migrations=[])
+
+        # when
+        with self.assertRaises(TypeError):
+            loader.write_snapshot(unserialisable_template)
+
+        # then
+        with open(loader.snapshot_path) as snapshot_file:
+            self.assertEqual(snapshot, snapshot_file.read())
+        self.assertEqual([os.path.basename(loader.snapshot_path)], os.listdir(self.storage_dir.name))
+
+    def test_loads_in_background(self):
+        # given
+        loader = self.loader()
+
+        # when
+        loader.start()
+        ready = loader.wait_until_ready(timeout=5)
+        loader.stop()
+
+        # then
+        self.assertTrue(ready)
+        self.assertTrue(loader.spreadsheet_generator.is_ready)
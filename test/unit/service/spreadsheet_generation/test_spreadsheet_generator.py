@@ -0,0 +1,80 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import openpyxl
+
+from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetGenerator, SpreadsheetSpec, \
+    TypeSpec, LinkSpec, IncludeAllModules
+from broker.service.spreadsheet_generation.tab_layout_cache import MAX_SPREADSHEET_TEMPLATES
+from test.unit.service.spreadsheet_generation.schema_fixtures import schema_template
+
+
+def _spreadsheet_spec() -> SpreadsheetSpec:
+    return SpreadsheetSpec([TypeSpec('donor_organism', IncludeAllModules(), False, LinkSpec()),
+                            TypeSpec('specimen_from_organism', IncludeAllModules(), True,
+                                     LinkSpec(['donor_organism']))])
+
+
+class SpreadsheetGeneratorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_template = schema_template()
+
+    def setUp(self):
+        self.output_dir = TemporaryDirectory()
+        self.spreadsheet_generator = SpreadsheetGenerator(Mock(url='http://ingest'), self.schema_template)
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def test_spreadsheet_built_from_existing_schema_template(self):
+        # given
+        output_path = os.path.join(self.output_dir.name, 'spreadsheet.xlsx')
+        tab_config = self.schema_template.spreadsheet_configuration
+
+        # when
+        with patch('broker.service.spreadsheet_generation.spreadsheet_generator.SchemaTemplate',
+                   side_effect=AssertionError('schema template built')):
+            self.spreadsheet_generator.generate(_spreadsheet_spec(), output_path)
+
+        # then
+        workbook = openpyxl.load_workbook(output_path)
+        self.assertEqual(['Donor organism', 'Specimen from organism', 'Schemas'], workbook.sheetnames)
+        specimen_sheet = workbook['Specimen from organism']
+        self.assertEqual(['specimen_from_organism.biomaterial_core.biomaterial_id',
+                          'specimen_from_organism.organ_description',
+                          'donor_organism.biomaterial_core.biomaterial_id',
+                          'process.process_core.process_id'], [cell.value for cell in specimen_sheet[4]])
+        self.assertEqual('ORGAN DESCRIPTION', specimen_sheet['B1'].value)
+        self.assertIs(tab_config, self.schema_template.spreadsheet_configuration)
+
+    def test_spreadsheet_template_reused_for_same_tabs(self):
+        # when
+        for i in range(3):
+            self.spreadsheet_generator.generate(_spreadsheet_spec(), os.path.join(self.output_dir.name, f'{i}.xlsx'))
+
+        # then
+        template_cache_stats = self.spreadsheet_generator.stats()['spreadsheet_template_cache']
+        self.assertEqual({'size': 1, 'max_size': MAX_SPREADSHEET_TEMPLATES, 'hits': 2, 'misses': 1},
+                         {key: template_cache_stats[key] for key in ['size', 'max_size', 'hits', 'misses']})
+
+    def test_spreadsheet_built_from_one_schema_release_when_refreshed_mid_build(self):
+        # given
+        output_path = os.path.join(self.output_dir.name, 'spreadsheet.xlsx')
+        layout_tab = self.spreadsheet_generator._layout_tab
+
+        def layout_tab_then_refresh(*args):
+            parsed_tab = layout_tab(*args)
+            self.spreadsheet_generator.set_schema_template(schema_template('16.0.0'))
+            return parsed_tab
+
+        # when
+        with patch.object(self.spreadsheet_generator, '_layout_tab', side_effect=layout_tab_then_refresh):
+            self.spreadsheet_generator.generate(_spreadsheet_spec(), output_path)
+
+        # then
+        schema_urls = [row[0].value for row in openpyxl.load_workbook(output_path)['Schemas'].iter_rows(min_row=2)]
+        self.assertIn('https://schema.humancellatlas.org/type/biomaterial/15.5.0/donor_organism', schema_urls)
+        self.assertNotIn('https://schema.humancellatlas.org/type/biomaterial/16.0.0/donor_organism', schema_urls)
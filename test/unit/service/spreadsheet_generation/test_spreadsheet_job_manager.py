@@ -0,0 +1,522 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetGenerator, SpreadsheetSpec, \
+    TypeSpec, LinkSpec, IncludeAllModules
+from broker.service.spreadsheet_generation.spreadsheet_job_manager import SpreadsheetJobManager, JobSpec, \
+    JobStatus, JobQueueFullException, MAX_JOB_ATTEMPTS
+from broker.service.spreadsheet_generation.spreadsheet_process_pool import SpreadsheetProcessPool
+from test.unit.service.spreadsheet_generation.schema_fixtures import schema_template
+
+
+def _spreadsheet_spec(*schema_names) -> SpreadsheetSpec:
+    return SpreadsheetSpec([TypeSpec(schema_name=name, link_spec=LinkSpec(link_entities=[])) for name in schema_names])
+
+
+def _run_broker_until_killed(output_dir: str, generation_started_path: str):
+    """
+    a broker process that never finishes its spreadsheet job
+    """
+    def generate(spreadsheet_spec, output_path):
+        open(generation_started_path, 'w').close()
+        time.sleep(60)
+
+    spreadsheet_generator = Mock(spec=SpreadsheetGenerator)
+    spreadsheet_generator.generate.side_effect = generate
+    spreadsheet_generator.schema_version = 'schema-version-1'
+    job_manager = SpreadsheetJobManager(spreadsheet_generator, output_dir, lease_duration=0.3)
+    job_manager.start()
+    job_manager.create_job(_spreadsheet_spec('donor_organism'), 'spreadsheet.xlsx')
+    time.sleep(60)
+
+
+def _wait_until(condition, timeout=30) -> bool:
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class SpreadsheetJobManagerTest(TestCase):
+    def setUp(self):
+        self.output_dir = TemporaryDirectory()
+        self.spreadsheet_generator = Mock(spec=SpreadsheetGenerator)
+        self.spreadsheet_generator.generate.side_effect = self.write_spreadsheet
+        self.spreadsheet_generator.schema_version = 'schema-version-1'
+        self.worker_pool = ThreadPoolExecutor(1)
+        self.job_manager = SpreadsheetJobManager(self.spreadsheet_generator, self.output_dir.name, self.worker_pool)
+
+    def tearDown(self):
+        self.worker_pool.shutdown()
+        self.output_dir.cleanup()
+
+    @staticmethod
+    def write_spreadsheet(spreadsheet_spec, output_path):
+        with open(output_path, 'wb') as spreadsheet_file:
+            spreadsheet_file.write(b'spreadsheet')
+
+    def test_completed_job_records_spreadsheet_hash(self):
+        # when
+        job_spec = self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'spreadsheet.xlsx')
+        self.worker_pool.shutdown(wait=True)
+
+        # then
+        completed_job_spec = self.job_manager.load_job_spec(job_spec.job_id)
+        self.assertEqual(JobStatus.COMPLETE, completed_job_spec.status)
+        self.assertEqual(hashlib.sha256(b'spreadsheet').hexdigest(), completed_job_spec.spreadsheet_hash)
+
+    def test_failed_job_has_no_spreadsheet_hash(self):
+        # given
+        self.spreadsheet_generator.generate.side_effect = Exception('schema unavailable')
+
+        # when
+        job_spec = self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'spreadsheet.xlsx')
+        self.worker_pool.shutdown(wait=True)
+
+        # then
+        failed_job_spec = self.job_manager.load_job_spec(job_spec.job_id)
+        self.assertEqual(JobStatus.ERROR, failed_job_spec.status)
+        self.assertIsNone(failed_job_spec.spreadsheet_hash)
+
+    def test_job_failed_when_spreadsheet_not_hashed(self):
+        # when
+        with patch.object(self.job_manager, 'hash_spreadsheet', side_effect=OSError('I/O error')):
+            job_spec = self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'spreadsheet.xlsx')
+            self.worker_pool.shutdown(wait=True)
+
+        # then
+        self.assertEqual(JobStatus.ERROR, self.job_manager.load_job_spec(job_spec.job_id).status)
+        self.assertFalse(os.path.exists(f'{self.output_dir.name}/{job_spec.job_id}.lease'))
+
+    def test_job_requeued_when_result_not_recorded(self):
+        # given
+        # the started job's spec is written, but neither its result nor its failure can be
+        writes = [self.job_manager.write_job_spec, Mock(side_effect=OSError('disk full')),
+                  Mock(side_effect=OSError('disk full'))]
+        with patch.object(self.job_manager, 'write_job_spec', side_effect=lambda *args: writes.pop(0)(*args)):
+            job_spec = self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'spreadsheet.xlsx')
+            self._wait_for_jobs()
+
+        # then
+        lease_path = f'{self.output_dir.name}/{job_spec.job_id}.lease'
+        self.assertTrue(os.path.exists(lease_path))
+        self.assertEqual(JobStatus.STARTED, self.job_manager.load_job_spec(job_spec.job_id).status)
+
+        # when
+        os.utime(lease_path, (0, 0))
+        requeued_job_ids = self.job_manager.requeue_abandoned_jobs()
+        self._wait_for_jobs()
+
+        # then
+        self.assertEqual([job_spec.job_id], requeued_job_ids)
+        completed_job_spec = self.job_manager.load_job_spec(job_spec.job_id)
+        self.assertEqual(JobStatus.COMPLETE, completed_job_spec.status)
+        self.assertEqual(2, completed_job_spec.attempts)
+        self.assertFalse(os.path.exists(lease_path))
+
+    def test_concurrent_requests_share_running_job(self):
+        # given
+        generation_started = threading.Event()
+        finish_generation = threading.Event()
+
+        def slow_generate(spreadsheet_spec, output_path):
+            generation_started.set()
+            finish_generation.wait(5)
+            self.write_spreadsheet(spreadsheet_spec, output_path)
+
+        self.spreadsheet_generator.generate.side_effect = slow_generate
+        first_job_spec = self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'first.xlsx')
+        generation_started.wait(5)
+
+        # when
+        request_pool = ThreadPoolExecutor(10)
+        job_specs = list(request_pool.map(
+            lambda i: self.job_manager.create_job(_spreadsheet_spec('donor_organism'), f'{i}.xlsx'), range(10)))
+        finish_generation.set()
+        request_pool.shutdown()
+        self.worker_pool.shutdown(wait=True)
+
+        # then
+        self.assertEqual(1, self.spreadsheet_generator.generate.call_count)
+        self.assertEqual([first_job_spec] * 10, job_specs)
+        self.assertEqual(JobStatus.COMPLETE, self.job_manager.load_job_spec(first_job_spec.job_id).status)
+
+    def test_completed_job_returned_without_generating(self):
+        # given
+        job_spec = self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'first.xlsx')
+        self.worker_pool.shutdown(wait=True)
+
+        # when
+        repeated_job_spec = self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'second.xlsx')
+
+        # then
+        self.assertEqual(1, self.spreadsheet_generator.generate.call_count)
+        self.assertEqual(JobStatus.COMPLETE, repeated_job_spec.status)
+        self.assertEqual(job_spec.job_id, repeated_job_spec.job_id)
+        self.assertEqual('first.xlsx', repeated_job_spec.filename)
+        self.assertEqual('schema-version-1', repeated_job_spec.schema_version)
+
+    def test_regenerated_for_new_schema_version(self):
+        # given
+        self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'spreadsheet.xlsx')
+        self._wait_for_jobs()
+        self.spreadsheet_generator.schema_version = 'schema-version-2'
+
+        # when
+        job_spec = self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'spreadsheet.xlsx')
+        self.worker_pool.shutdown(wait=True)
+
+        # then
+        self.assertEqual(JobStatus.STARTED, job_spec.status)
+        self.assertEqual(2, self.spreadsheet_generator.generate.call_count)
+        self.assertEqual('schema-version-2', self.job_manager.load_job_spec(job_spec.job_id).schema_version)
+
+    def test_failed_job_retried(self):
+        # given
+        self.spreadsheet_generator.generate.side_effect = Exception('schema unavailable')
+        self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'spreadsheet.xlsx')
+        self._wait_for_jobs()
+        self.spreadsheet_generator.generate.side_effect = self.write_spreadsheet
+
+        # when
+        job_spec = self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'spreadsheet.xlsx')
+        self.worker_pool.shutdown(wait=True)
+
+        # then
+        self.assertEqual(JobStatus.STARTED, job_spec.status)
+        self.assertEqual(2, self.spreadsheet_generator.generate.call_count)
+        self.assertEqual(JobStatus.COMPLETE, self.job_manager.load_job_spec(job_spec.job_id).status)
+
+    def test_job_refused_when_queue_full(self):
+        # given
+        finish_generation = threading.Event()
+        self.spreadsheet_generator.generate.side_effect = lambda *args: finish_generation.wait(5)
+        job_manager = SpreadsheetJobManager(self.spreadsheet_generator, self.output_dir.name, self.worker_pool,
+                                            max_queued_jobs=2)
+        job_manager.create_job(_spreadsheet_spec('donor_organism'), 'first.xlsx')
+        job_manager.create_job(_spreadsheet_spec('specimen_from_organism'), 'second.xlsx')
+
+        # when
+        with self.assertRaises(JobQueueFullException):
+            job_manager.create_job(_spreadsheet_spec('cell_suspension'), 'third.xlsx')
+        shared_job_spec = job_manager.create_job(_spreadsheet_spec('donor_organism'), 'again.xlsx')
+        finish_generation.set()
+        self.worker_pool.shutdown(wait=True)
+
+        # then
+        self.assertEqual('first.xlsx', shared_job_spec.filename)
+        self.assertEqual({'jobs': 0, 'rejected': 1},
+                         {key: job_manager.stats()[key] for key in ['jobs', 'rejected']})
+
+    def test_job_of_killed_broker_requeued_on_restart(self):
+        # given
+        generation_started_path = os.path.join(self.output_dir.name, 'generation-started')
+        broker = multiprocessing.get_context('spawn').Process(target=_run_broker_until_killed,
+                                                              args=(self.output_dir.name, generation_started_path))
+        broker.start()
+        started = _wait_until(lambda: os.path.exists(generation_started_path))
+        broker.kill()
+        broker.join()
+        self.assertTrue(started)
+        job_id = _spreadsheet_spec('donor_organism').hashcode('schema-version-1')
+        lease_path = os.path.join(self.output_dir.name, f'{job_id}.lease')
+        self.assertEqual(JobStatus.STARTED, self.job_manager.load_job_spec(job_id).status)
+
+        # when
+        restarted_job_manager = SpreadsheetJobManager(self.spreadsheet_generator, self.output_dir.name,
+                                                      self.worker_pool, lease_duration=0.3)
+        restarted_job_manager.start()
+        # the lease is removed once the job's finished
+        completed = _wait_until(lambda: not os.path.exists(lease_path))
+        restarted_job_manager.stop()
+
+        # then
+        self.assertTrue(completed)
+        completed_job_spec = self.job_manager.load_job_spec(job_id)
+        self.assertEqual(JobStatus.COMPLETE, completed_job_spec.status)
+        self.assertEqual('spreadsheet.xlsx', completed_job_spec.filename)
+        self.assertEqual(2, completed_job_spec.attempts)
+        self.assertEqual(1, restarted_job_manager.stats()['requeued'])
+
+    def test_job_abandoned_too_often_fails(self):
+        # given
+        job_spec = JobSpec(JobStatus.STARTED, 'abandoned-job-id', f'{self.output_dir.name}/abandoned-job-id.xlsx',
+                           'spreadsheet.xlsx', spreadsheet_spec=_spreadsheet_spec('donor_organism').to_dict(),
+                           attempts=MAX_JOB_ATTEMPTS)
+        self.job_manager.write_job_spec(job_spec, f'{self.output_dir.name}/abandoned-job-id.json')
+        lease_path = f'{self.output_dir.name}/abandoned-job-id.lease'
+        open(lease_path, 'w').close()
+        os.utime(lease_path, (0, 0))
+
+        # when
+        requeued_job_ids = self.job_manager.requeue_abandoned_jobs()
+
+        # then
+        self.assertEqual([], requeued_job_ids)
+        self.spreadsheet_generator.generate.assert_not_called()
+        self.assertEqual(JobStatus.ERROR, self.job_manager.load_job_spec('abandoned-job-id').status)
+        self.assertFalse(os.path.exists(lease_path))
+
+    def test_abandoned_job_requeued_by_one_of_several_brokers(self):
+        # given
+        job_spec = JobSpec(JobStatus.STARTED, 'abandoned-job-id', f'{self.output_dir.name}/abandoned-job-id.xlsx',
+                           'spreadsheet.xlsx', spreadsheet_spec=_spreadsheet_spec('donor_organism').to_dict(),
+                           attempts=1)
+        self.job_manager.write_job_spec(job_spec, f'{self.output_dir.name}/abandoned-job-id.json')
+        lease_path = f'{self.output_dir.name}/abandoned-job-id.lease'
+        open(lease_path, 'w').close()
+        os.utime(lease_path, (0, 0))
+        job_managers = [SpreadsheetJobManager(self.spreadsheet_generator, self.output_dir.name, self.worker_pool)
+                        for _ in range(8)]
+        all_found = threading.Barrier(len(job_managers))
+        read_lease = SpreadsheetJobManager._read_lease
+
+        def read_lease_once_all_found(path):
+            # every broker has found the abandoned job before any takes it over
+            all_found.wait()
+            return read_lease(path)
+
+        # when
+        with patch.object(SpreadsheetJobManager, '_read_lease', side_effect=read_lease_once_all_found), \
+                ThreadPoolExecutor(len(job_managers)) as brokers:
+            requeued = brokers.map(lambda job_manager: job_manager.requeue_abandoned_jobs(), job_managers)
+            requeued_job_ids = [job_id for job_ids in requeued for job_id in job_ids]
+        self.worker_pool.shutdown(wait=True)
+
+        # then
+        self.assertEqual(['abandoned-job-id'], requeued_job_ids)
+        self.spreadsheet_generator.generate.assert_called_once()
+        self.assertEqual(JobStatus.COMPLETE, self.job_manager.load_job_spec('abandoned-job-id').status)
+        self.assertEqual(['abandoned-job-id.json', 'abandoned-job-id.xlsx'], sorted(os.listdir(self.output_dir.name)))
+
+    def test_expired_lease_claimed_once(self):
+        # given
+        lease_path = f'{self.output_dir.name}/job-id.lease'
+        open(lease_path, 'w').close()
+        os.utime(lease_path, (0, 0))
+        other_job_manager = SpreadsheetJobManager(self.spreadsheet_generator, self.output_dir.name, self.worker_pool)
+
+        # when
+        claimed = self.job_manager._claim_expired_lease('job-id')
+        claimed_by_other = other_job_manager._claim_expired_lease('job-id')
+
+        # then
+        self.assertTrue(claimed)
+        self.assertFalse(claimed_by_other)
+
+    def test_job_leased_by_other_broker_shared(self):
+        # given
+        job_spec = self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'spreadsheet.xlsx')
+        self.worker_pool.shutdown(wait=True)
+        self.job_manager.write_job_spec(replace(job_spec, status=JobStatus.STARTED),
+                                        f'{self.output_dir.name}/{job_spec.job_id}.json')
+        open(f'{self.output_dir.name}/{job_spec.job_id}.lease', 'w').close()
+        other_job_manager = SpreadsheetJobManager(self.spreadsheet_generator, self.output_dir.name, Mock())
+
+        # when
+        shared_job_spec = other_job_manager.create_job(_spreadsheet_spec('donor_organism'), 'other.xlsx')
+
+        # then
+        self.assertEqual(JobStatus.STARTED, shared_job_spec.status)
+        self.assertEqual('spreadsheet.xlsx', shared_job_spec.filename)
+        other_job_manager.worker_pool.submit.assert_not_called()
+
+    def test_spreadsheet_renamed_into_place_once_generated(self):
+        # given
+        generated_paths = []
+
+        def write_spreadsheet(spreadsheet_spec, output_path):
+            generated_paths.append(output_path)
+            self.write_spreadsheet(spreadsheet_spec, output_path)
+            self.assertFalse(os.path.exists(f'{self.output_dir.name}/{job_id}.xlsx'))
+        self.spreadsheet_generator.generate.side_effect = write_spreadsheet
+        job_id = _spreadsheet_spec('donor_organism').hashcode('schema-version-1')
+
+        # when
+        job_spec = self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'spreadsheet.xlsx')
+        self.worker_pool.shutdown(wait=True)
+
+        # then
+        self.assertEqual(JobStatus.COMPLETE, self.job_manager.load_job_spec(job_id).status)
+        self.assertNotEqual([job_spec.spreadsheet_path], generated_paths)
+        self.assertEqual(sorted([f'{job_id}.json', f'{job_id}.xlsx']), sorted(os.listdir(self.output_dir.name)))
+
+    def test_partial_spreadsheet_removed_when_generation_fails(self):
+        # given
+        def fail_to_write_spreadsheet(spreadsheet_spec, output_path):
+            self.write_spreadsheet(spreadsheet_spec, output_path)
+            raise Exception('schema unavailable')
+        self.spreadsheet_generator.generate.side_effect = fail_to_write_spreadsheet
+
+        # when
+        job_spec = self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'spreadsheet.xlsx')
+        self.worker_pool.shutdown(wait=True)
+
+        # then
+        self.assertEqual(JobStatus.ERROR, self.job_manager.load_job_spec(job_spec.job_id).status)
+        self.assertEqual([f'{job_spec.job_id}.json'], os.listdir(self.output_dir.name))
+
+    def test_abandoned_job_refused_when_queue_full_requeued_later(self):
+        # given
+        abandoned_spec = _spreadsheet_spec('donor_organism')
+        job_id = abandoned_spec.hashcode('schema-version-1')
+        self._write_abandoned_job(job_id, abandoned_spec)
+        finish_generation = threading.Event()
+        self.spreadsheet_generator.generate.side_effect = lambda *args: finish_generation.wait(5)
+        job_manager = SpreadsheetJobManager(self.spreadsheet_generator, self.output_dir.name, self.worker_pool,
+                                            max_queued_jobs=1)
+        job_manager.create_job(_spreadsheet_spec('specimen_from_organism'), 'spreadsheet.xlsx')
+
+        # when
+        with self.assertRaises(JobQueueFullException):
+            job_manager.create_job(abandoned_spec, 'spreadsheet.xlsx')
+        finish_generation.set()
+        self._wait_for_jobs()
+        self.spreadsheet_generator.generate.side_effect = self.write_spreadsheet
+        requeued_job_ids = job_manager.requeue_abandoned_jobs()
+        self.worker_pool.shutdown(wait=True)
+
+        # then
+        self.assertEqual([job_id], requeued_job_ids)
+        self.assertEqual(JobStatus.COMPLETE, job_manager.load_job_spec(job_id).status)
+        self.assertFalse(os.path.exists(f'{self.output_dir.name}/{job_id}.lease'))
+
+    def test_requeued_jobs_bounded_by_queue_depth(self):
+        # given
+        for schema_name in ['donor_organism', 'specimen_from_organism']:
+            self._write_abandoned_job(f'{schema_name}-job-id', _spreadsheet_spec(schema_name))
+        finish_generation = threading.Event()
+        self.spreadsheet_generator.generate.side_effect = lambda *args: finish_generation.wait(5)
+        job_manager = SpreadsheetJobManager(self.spreadsheet_generator, self.output_dir.name, self.worker_pool,
+                                            max_queued_jobs=1)
+
+        # when
+        requeued_job_ids = job_manager.requeue_abandoned_jobs()
+        requeued_while_full = job_manager.requeue_abandoned_jobs()
+        finish_generation.set()
+        self._wait_for_jobs()
+        requeued_once_drained = job_manager.requeue_abandoned_jobs()
+        self.worker_pool.shutdown(wait=True)
+
+        # then
+        self.assertEqual(1, len(requeued_job_ids))
+        self.assertEqual([], requeued_while_full)
+        self.assertEqual(1, len(requeued_once_drained))
+        self.assertNotEqual(requeued_job_ids, requeued_once_drained)
+
+    def _write_abandoned_job(self, job_id: str, spreadsheet_spec: SpreadsheetSpec):
+        job_spec = JobSpec(JobStatus.STARTED, job_id, f'{self.output_dir.name}/{job_id}.xlsx', 'spreadsheet.xlsx',
+                           spreadsheet_spec=spreadsheet_spec.canonical().to_dict(), attempts=1)
+        self.job_manager.write_job_spec(job_spec, f'{self.output_dir.name}/{job_id}.json')
+        lease_path = f'{self.output_dir.name}/{job_id}.lease'
+        open(lease_path, 'w').close()
+        os.utime(lease_path, (0, 0))
+
+    def test_job_retried_when_worker_process_killed(self):
+        # given
+        spreadsheet_generator = SpreadsheetGenerator(Mock(url='http://ingest'), schema_template())
+        process_pool = SpreadsheetProcessPool(spreadsheet_generator, processes=1)
+        job_manager = SpreadsheetJobManager(spreadsheet_generator, self.output_dir.name, self.worker_pool,
+                                            process_pool=process_pool)
+        spreadsheet_spec = SpreadsheetSpec([TypeSpec('donor_organism', IncludeAllModules(), False, LinkSpec())])
+
+        # when
+        job_spec = job_manager.create_job(spreadsheet_spec, 'spreadsheet.xlsx')
+        self.assertTrue(_wait_until(lambda: process_pool._executor and process_pool._executor._processes))
+        for worker_process in list(process_pool._executor._processes.values()):
+            worker_process.kill()
+        self.worker_pool.shutdown(wait=True)
+        process_pool.shutdown()
+
+        # then
+        completed_job_spec = job_manager.load_job_spec(job_spec.job_id)
+        self.assertEqual(JobStatus.COMPLETE, completed_job_spec.status)
+        self.assertEqual(2, completed_job_spec.attempts)
+        self.assertEqual(1, job_manager.stats()['retried'])
+        self.assertTrue(os.path.exists(completed_job_spec.spreadsheet_path))
+
+    def test_concurrent_polls_read_jobs_from_memory(self):
+        # given
+        finish_generation = threading.Event()
+
+        def slow_generate(spreadsheet_spec, output_path):
+            finish_generation.wait(5)
+            self.write_spreadsheet(spreadsheet_spec, output_path)
+
+        self.spreadsheet_generator.generate.side_effect = slow_generate
+        job_id = self.job_manager.create_job(_spreadsheet_spec('donor_organism'), 'spreadsheet.xlsx').job_id
+        deadline = time.time() + 10
+
+        def poll(i):
+            statuses = [self.job_manager.status_for_job(job_id)]
+            while statuses[-1] == JobStatus.STARTED and time.time() < deadline:
+                time.sleep(0.001)
+                statuses.append(self.job_manager.status_for_job(job_id))
+            return statuses
+
+        # when
+        with patch.object(SpreadsheetJobManager, 'load_job_spec_from_path',
+                          side_effect=AssertionError('job spec read from disk')):
+            pollers = ThreadPoolExecutor(300)
+            polls = [pollers.submit(poll, i) for i in range(300)]
+            time.sleep(0.2)
+            finish_generation.set()
+            pollers.shutdown(wait=True)
+
+        # then
+        for statuses in [polled.result() for polled in polls]:
+            self.assertEqual([JobStatus.STARTED] * (len(statuses) - 1) + [JobStatus.COMPLETE], statuses)
+        self.assertEqual(JobStatus.COMPLETE,
+                         self.job_manager.load_job_spec_from_path(f'{self.output_dir.name}/{job_id}.json').status)
+
+    def test_job_spec_file_never_read_half_written(self):
+        # given
+        job_spec_path = f'{self.output_dir.name}/job-id.json'
+        started_job_spec = JobSpec(JobStatus.STARTED, 'job-id', 'job-id.xlsx', 'spreadsheet.xlsx',
+                                   spreadsheet_spec=_spreadsheet_spec(*[f'schema_{i}' for i in range(50)]).to_dict())
+        completed_job_spec = JobSpec(JobStatus.COMPLETE, 'job-id', 'job-id.xlsx', 'spreadsheet.xlsx', 'hash')
+        self.job_manager.write_job_spec(started_job_spec, job_spec_path)
+        start_reading = threading.Event()
+        writing = threading.Event()
+        writing.set()
+
+        def read_while_writing(i):
+            job_specs = []
+            start_reading.wait()
+            while writing.is_set():
+                job_specs.append(SpreadsheetJobManager.load_job_spec_from_path(job_spec_path))
+                time.sleep(0.005)
+            return job_specs
+
+        # when
+        readers = ThreadPoolExecutor(200)
+        reads = [readers.submit(read_while_writing, i) for i in range(200)]
+        start_reading.set()
+        writes = 0
+        end = time.time() + 1
+        while time.time() < end:
+            self.job_manager.write_job_spec(completed_job_spec if writes % 2 else started_job_spec, job_spec_path)
+            writes += 1
+        writing.clear()
+        readers.shutdown(wait=True)
+
+        # then
+        job_specs = [job_spec for read in reads for job_spec in read.result()]
+        self.assertLess(1, writes)
+        self.assertLess(0, len(job_specs))
+        self.assertEqual([], [job_spec for job_spec in job_specs if job_spec not in [started_job_spec,
+                                                                                  completed_job_spec]])
+        self.assertEqual(['job-id.json'], os.listdir(self.output_dir.name))
+
+    def _wait_for_jobs(self):
+        self.worker_pool.submit(lambda: None).result()
@@ -0,0 +1,84 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import Mock
+
+import openpyxl
+
+from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetGenerator, SpreadsheetSpec, \
+    TypeSpec, LinkSpec, IncludeAllModules
+from broker.service.spreadsheet_generation.spreadsheet_job_manager import SpreadsheetJobManager, JobStatus
+from broker.service.spreadsheet_generation.spreadsheet_process_pool import SpreadsheetProcessPool
+from test.unit.service.spreadsheet_generation.schema_fixtures import schema_template
+
+
+def _spreadsheet_spec() -> SpreadsheetSpec:
+    return SpreadsheetSpec([TypeSpec('donor_organism', IncludeAllModules(), False, LinkSpec()),
+                            TypeSpec('specimen_from_organism', IncludeAllModules(), True,
+                                     LinkSpec(['donor_organism']))])
+
+
+class SpreadsheetProcessPoolTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_template = schema_template()
+
+    def setUp(self):
+        self.output_dir = TemporaryDirectory()
+        self.spreadsheet_generator = SpreadsheetGenerator(Mock(url='http://ingest'), self.schema_template)
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def output_path(self, name) -> str:
+        return os.path.join(self.output_dir.name, name)
+
+    def test_job_generated_in_worker_process(self):
+        # given
+        process_pool = SpreadsheetProcessPool(self.spreadsheet_generator, processes=1)
+        job_manager = SpreadsheetJobManager(self.spreadsheet_generator, self.output_dir.name,
+                                            process_pool=process_pool)
+
+        # when
+        job_spec = job_manager.create_job(_spreadsheet_spec(), 'spreadsheet.xlsx')
+        job_manager.worker_pool.shutdown(wait=True)
+        worker_pid = process_pool._submit(_spreadsheet_spec(), self.output_path('again.xlsx')).result()
+        process_pool.shutdown()
+
+        # then
+        self.assertNotEqual(os.getpid(), worker_pid)
+        completed_job_spec = job_manager.load_job_spec(job_spec.job_id)
+        self.assertEqual(JobStatus.COMPLETE, completed_job_spec.status)
+        workbook = openpyxl.load_workbook(completed_job_spec.spreadsheet_path)
+        self.assertEqual(['Donor organism', 'Specimen from organism', 'Schemas'], workbook.sheetnames)
+
+    def test_workers_replaced_after_max_jobs(self):
+        # given
+        process_pool = SpreadsheetProcessPool(self.spreadsheet_generator, processes=1, max_jobs_per_process=2)
+
+        # when
+        worker_pids = [process_pool._submit(_spreadsheet_spec(), self.output_path(f'{i}.xlsx')).result()
+                       for i in range(3)]
+        process_pool.shutdown()
+
+        # then
+        self.assertEqual(worker_pids[0], worker_pids[1])
+        self.assertNotEqual(worker_pids[1], worker_pids[2])
+        self.assertEqual({'jobs': 3, 'recycles': 1}, {key: process_pool.stats()[key] for key in ['jobs', 'recycles']})
+
+    def test_workers_replaced_for_new_schemas(self):
+        # given
+        process_pool = SpreadsheetProcessPool(self.spreadsheet_generator, processes=1)
+        process_pool.generate(_spreadsheet_spec(), self.output_path('old.xlsx'))
+
+        # when
+        self.spreadsheet_generator.set_schema_template(schema_template('16.0.0'))
+        process_pool.generate(_spreadsheet_spec(), self.output_path('new.xlsx'))
+        process_pool.shutdown()
+
+        # then
+        self.assertEqual(1, process_pool.stats()['recycles'])
+        self.assertEqual(self.spreadsheet_generator.schema_version, process_pool.stats()['schema_version'])
+        schemas_sheet = openpyxl.load_workbook(self.output_path('new.xlsx'))['Schemas']
+        self.assertIn('https://schema.humancellatlas.org/type/biomaterial/16.0.0/donor_organism',
+                      [row[0].value for row in schemas_sheet.iter_rows()])
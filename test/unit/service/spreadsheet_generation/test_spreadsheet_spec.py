@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetSpec, TypeSpec, LinkSpec, \
+    IncludeSomeModules, IncludeAllModules
+
+
+def _spreadsheet_spec(reordered=False) -> SpreadsheetSpec:
+    modules = ['organ', 'biomaterial_core', 'organ_parts']
+    links = ['donor_organism', 'cell_line']
+    protocols = ['dissociation_protocol', 'collection_protocol']
+    type_specs = [
+        TypeSpec('donor_organism', IncludeAllModules(), False, LinkSpec()),
+        TypeSpec('cell_line', IncludeAllModules(), False, None),
+        TypeSpec('specimen_from_organism', IncludeSomeModules(list(reversed(modules)) if reordered else modules), True,
+                 LinkSpec(list(reversed(links)) if reordered else links,
+                          list(reversed(protocols)) if reordered else protocols))
+    ]
+    return SpreadsheetSpec(list(reversed(type_specs)) if reordered else type_specs)
+
+
+class SpreadsheetSpecTest(TestCase):
+    def test_equivalent_specs_have_same_hashcode(self):
+        self.assertEqual(_spreadsheet_spec().hashcode('schema-version-1'),
+                         _spreadsheet_spec(reordered=True).hashcode('schema-version-1'))
+        self.assertEqual(_spreadsheet_spec().hashcode(),
+                         SpreadsheetSpec.from_dict(_spreadsheet_spec(reordered=True).to_dict()).hashcode())
+
+    def test_hashcode_changes_with_schema_version(self):
+        self.assertNotEqual(_spreadsheet_spec().hashcode('schema-version-1'),
+                            _spreadsheet_spec().hashcode('schema-version-2'))
+
+    def test_hashcode_changes_with_spec(self):
+        spreadsheet_spec = _spreadsheet_spec()
+        spreadsheet_spec.types[2].embed_process = False
+        self.assertNotEqual(_spreadsheet_spec().hashcode(), spreadsheet_spec.hashcode())
+
+    def test_canonical_spec(self):
+        # when
+        canonical_spec = _spreadsheet_spec(reordered=True).canonical()
+
+        # then
+        self.assertEqual(['cell_line', 'specimen_from_organism', 'donor_organism'],
+                         [type_spec.schema_name for type_spec in canonical_spec.types])
+        specimen_spec = canonical_spec.types[1]
+        self.assertEqual(['biomaterial_core', 'organ', 'organ_parts'], specimen_spec.include_modules.modules)
+        self.assertEqual(LinkSpec(['cell_line', 'donor_organism'], ['collection_protocol', 'dissociation_protocol']),
+                         specimen_spec.link_spec)
+        self.assertEqual(canonical_spec.to_dict(), _spreadsheet_spec().canonical().to_dict())
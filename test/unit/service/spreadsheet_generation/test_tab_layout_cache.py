@@ -0,0 +1,81 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetGenerator, TypeSpec, LinkSpec, \
+    IncludeAllModules, IncludeSomeModules
+from broker.service.spreadsheet_generation.tab_layout_cache import TabLayoutCache
+from test.unit.service.spreadsheet_generation.schema_fixtures import schema_template
+
+
+def _specimen_spec(*link_entities) -> TypeSpec:
+    return TypeSpec('specimen_from_organism', IncludeAllModules(), True, LinkSpec(list(link_entities)))
+
+
+class TabLayoutCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_template = schema_template()
+
+    def setUp(self):
+        self.spreadsheet_generator = SpreadsheetGenerator(Mock(url='http://ingest'), self.schema_template)
+
+    def test_repeated_type_spec_laid_out_once(self):
+        # when
+        with patch.object(self.spreadsheet_generator, '_generate_tab',
+                          wraps=self.spreadsheet_generator._generate_tab) as generate_tab:
+            first_tab = self.spreadsheet_generator.tab_for_type(_specimen_spec('donor_organism'))
+            second_tab = self.spreadsheet_generator.tab_for_type(_specimen_spec('donor_organism'))
+
+        # then
+        self.assertEqual(1, generate_tab.call_count)
+        self.assertIs(first_tab, second_tab)
+        self.assertEqual({'size': 1, 'hits': 1, 'misses': 1},
+                         {key: self.spreadsheet_generator.stats()['tab_layout_cache'][key]
+                          for key in ['size', 'hits', 'misses']})
+
+    def test_different_type_specs_laid_out_separately(self):
+        # when
+        linked_tab = self.spreadsheet_generator.tab_for_type(_specimen_spec('donor_organism'))
+        unlinked_tab = self.spreadsheet_generator.tab_for_type(_specimen_spec())
+        some_modules_tab = self.spreadsheet_generator.tab_for_type(
+            TypeSpec('specimen_from_organism', IncludeSomeModules(['organ_description']), False, LinkSpec()))
+
+        # then
+        self.assertIn('donor_organism.biomaterial_core.biomaterial_id', [column.path for column in linked_tab.columns])
+        self.assertNotIn('donor_organism.biomaterial_core.biomaterial_id',
+                         [column.path for column in unlinked_tab.columns])
+        self.assertEqual(['specimen_from_organism.organ_description'],
+                         [column.path for column in some_modules_tab.columns])
+        self.assertEqual(3, self.spreadsheet_generator.stats()['tab_layout_cache']['misses'])
+
+    def test_new_schema_release_clears_layouts(self):
+        # given
+        old_tab = self.spreadsheet_generator.tab_for_type(_specimen_spec('donor_organism'))
+        old_version = self.spreadsheet_generator.stats()['schema_version']
+
+        # when
+        self.spreadsheet_generator.set_schema_template(schema_template('16.0.0'))
+        new_tab = self.spreadsheet_generator.tab_for_type(_specimen_spec('donor_organism'))
+
+        # then
+        stats = self.spreadsheet_generator.stats()
+        self.assertNotEqual(old_version, stats['schema_version'])
+        self.assertIsNot(old_tab, new_tab)
+        self.assertEqual(old_tab, new_tab)
+        self.assertEqual({'size': 1, 'hits': 0, 'misses': 2, 'clears': 1},
+                         {key: stats['tab_layout_cache'][key] for key in ['size', 'hits', 'misses', 'clears']})
+
+    def test_least_recently_used_evicted(self):
+        # given
+        tab_layout_cache = TabLayoutCache(cache_size=2)
+        tab_layout_cache.get_or_generate('a', lambda: 'tab a')
+        tab_layout_cache.get_or_generate('b', lambda: 'tab b')
+        tab_layout_cache.get_or_generate('a', lambda: 'new tab a')
+
+        # when
+        tab_layout_cache.get_or_generate('c', lambda: 'tab c')
+
+        # then
+        self.assertEqual('tab a', tab_layout_cache.get_or_generate('a', lambda: 'new tab a'))
+        self.assertEqual('new tab b', tab_layout_cache.get_or_generate('b', lambda: 'new tab b'))
+        self.assertEqual(2, tab_layout_cache.stats()['evictions'])
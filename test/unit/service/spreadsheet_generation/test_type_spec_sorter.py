@@ -43,3 +43,15 @@ class TypeSpecSorterTest(TestCase):
         self.assertEqual(7, len(spec))
         self.assertListEqual(spec, [donor, specimen, organoid, cell_line, imaged_specimen, cell_suspension,
                                     sequence_file])
+
+    def test_links_to_types_not_in_spec_ignored(self):
+        # given:
+        specimen = _type_spec('specimen', ['donor'])
+        cell_suspension = _type_spec('cell_suspension', ['specimen'])
+
+        # when:
+        spec = [cell_suspension, specimen]
+        type_spec_utils.sort(spec)
+
+        # then:
+        self.assertListEqual(spec, [cell_suspension, specimen])
@@ -0,0 +1,137 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+SCHEMA_URL = 'https://schema.humancellatlas.org/type/{0}/{1}/1.0.0/{2}'
+COLLECTION_DOMAINS = {'biomaterials': 'biomaterial', 'files': 'file', 'processes': 'process',
+                      'protocols': 'protocol', 'projects': 'project'}
+
+
+class StandInIngestApi:
+    """
+    A local HTTP server answering like the ingest API for one submission, with HAL pages of realistically sized
+    entities. Supports a projection, named ENTITY_TYPE_PROJECTION, of entities to their content.describedBy.
+    Keeps count of the requests made and the bytes served.
+    """
+    ENTITY_TYPE_PROJECTION = 'entityType'
+
+    def __init__(self, entity_counts: dict, specific_types=('donor_organism', 'specimen_from_organism')):
+        """
+        :param entity_counts: the number of entities in each collection of the submission, e.g {'biomaterials': 100}
+        :param specific_types: the specific types of the entities, assigned round robin
+        """
+        self.entity_counts = entity_counts
+        self.specific_types = specific_types
+        self.requests = 0
+        self.bytes_served = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.url = f'http://127.0.0.1:{self._server.server_address[1]}'
+        self.submission_url = f'{self.url}/submissionEnvelopes/stand-in'
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes_served = 0
+
+    def submission(self) -> dict:
+        links = {collection: {'href': f'{self.submission_url}/{collection}'} for collection in COLLECTION_DOMAINS}
+        links['self'] = {'href': self.submission_url}
+        return {
+            'uuid': {'uuid': 'stand-in-submission-uuid'},
+            'submissionDate': '2022-01-27T11:57:05.187Z',
+            'updateDate': '2022-01-27T12:00:58.417Z',
+            'submissionState': 'Valid',
+            '_links': links
+        }
+
+    def entity(self, collection, index, projection=None) -> dict:
+        domain = COLLECTION_DOMAINS[collection]
+        specific_type = self.specific_types[index % len(self.specific_types)]
+        entity_url = f'{self.url}/{collection}/entity-{index}'
+        described_by = SCHEMA_URL.format(domain, '14.2.0', specific_type)
+        if projection == self.ENTITY_TYPE_PROJECTION:
+            return {'content': {'describedBy': described_by}, '_links': {'self': {'href': entity_url}}}
+
+        return {
+            'content': {
+                'describedBy': described_by,
+                'schema_type': domain,
+                'provenance': {'document_id': f'{index:08d}-0000-4000-8000-000000000000',
+                               'submission_date': '2022-01-27T11:57:05.187Z'},
+                f'{domain}_core': {f'{domain}_id': f'{specific_type}_{index}',
+                                   f'{domain}_description': 'A stand-in entity for summary tests. ' * 8},
+                'genus_species': [{'text': 'Homo sapiens', 'ontology': 'NCBITaxon:9606',
+                                   'ontology_label': 'Homo sapiens'}],
+                'organ': {'text': 'heart', 'ontology': 'UBERON:0000948', 'ontology_label': 'heart'},
+                'total_estimated_cells': 1000,
+                'selected_cell_type': [{'text': 'cardiac muscle cell', 'ontology': 'CL:0000746',
+                                        'ontology_label': 'cardiac muscle cell'}]
+            },
+            'submissionDate': '2022-01-27T11:57:05.187Z',
+            'updateDate': '2022-01-27T12:00:58.417Z',
+            'uuid': {'uuid': f'{index:08d}-0000-4000-8000-000000000000'},
+            'validationState': 'Valid',
+            'validationErrors': [],
+            'isUpdate': False,
+            'type': domain.capitalize(),
+            '_links': {relation: {'href': f'{entity_url}/{relation}'}
+                       for relation in ['self', domain, 'validating', 'valid', 'invalid', 'processing', 'complete',
+                                        'submissionEnvelope', 'submissionEnvelopes', 'project', 'projects',
+                                        'inputToProcesses', 'derivedByProcesses', 'json-patch', 'auditLogs']}
+        }
+
+    def page(self, collection, page_number, size, projection=None) -> dict:
+        count = self.entity_counts.get(collection, 0)
+        start = page_number * size
+        entities = [self.entity(collection, index, projection) for index in range(start, min(start + size, count))]
+        collection_url = f'{self.submission_url}/{collection}'
+        links = {'self': {'href': collection_url}}
+        if start + size < count:
+            query = f'page={page_number + 1}&size={size}' + (f'&projection={projection}' if projection else '')
+            links['next'] = {'href': f'{collection_url}?{query}'}
+        return {
+            '_embedded': {collection: entities},
+            '_links': links,
+            'page': {'size': size, 'totalElements': count, 'totalPages': -(-count // size), 'number': page_number}
+        }
+
+    def response_for(self, path, query) -> dict:
+        if path in ('', '/'):
+            return {'_links': {'submissionEnvelopes': {'href': f'{self.url}/submissionEnvelopes{{?page,size,sort}}'}}}
+        if path == urlparse(self.submission_url).path:
+            return self.submission()
+        collection = path.rsplit('/', 1)[-1]
+        return self.page(collection, int(query.get('page', ['0'])[0]), int(query.get('size', ['20'])[0]),
+                         query.get('projection', [None])[0])
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                body = json.dumps(stand_in.response_for(url.path, parse_qs(url.query))).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/hal+json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with stand_in._lock:
+                    stand_in.requests += 1
+                    stand_in.bytes_served += len(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,166 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from broker.service.bulk_summaries import BulkSummaries
+from broker.service.submission_summary_cache import SubmissionSummaryCache
+from broker.service.summary_service import SummaryService, ENTITY_TYPES
+
+
+def mock_submission(submission_id):
+    links = {collection: {'href': f'http://mock-ingest-api/envelopes/{submission_id}/{collection}'}
+             for collection in ['biomaterials', 'files', 'processes', 'protocols', 'projects']}
+    links['self'] = {'href': f'http://mock-ingest-api/envelopes/{submission_id}'}
+    return {
+        '_links': links,
+        'uuid': {'uuid': submission_id},
+        'submissionDate': '2022-01-27T11:57:05.187Z',
+        'updateDate': '2022-01-27T12:00:58.417Z',
+        'submissionState': 'Valid'
+    }
+
+
+class BulkSummariesTest(TestCase):
+    def setUp(self):
+        self.ingest_api = MagicMock()
+        self.ingest_api.get_submission_by_uuid.side_effect = mock_submission
+        self.project_submissions = {'project-a': ['submission-1', 'submission-2'],
+                                    'project-b': ['submission-2', 'submission-3']}
+        self.ingest_api.get_project_by_uuid.side_effect = lambda project_uuid: {'uuid': project_uuid}
+        self.ingest_api.get_related_entities.side_effect = lambda relation, project, entity_type: iter(
+            [mock_submission(submission_id) for submission_id in self.project_submissions[project['uuid']]])
+
+        self.summary_service = SummaryService(self.ingest_api, SubmissionSummaryCache(),
+                                              submission_worker_pool=ThreadPoolExecutor(2))
+        self.summarised = []
+        self.entities_patch = patch('broker.service.summary_service.SummaryService.get_entities_in_submission')
+        self.mock_get_entities = self.entities_patch.start()
+        self.mock_get_entities.side_effect = self.get_entities_in_submission
+
+    def tearDown(self):
+        self.entities_patch.stop()
+
+    def get_entities_in_submission(self, submission_uri, entity_type):
+        if entity_type == 'files':
+            self.summarised.append(submission_uri.rsplit('/', 1)[-1])
+        yield {'content': {'describedBy': 'http://mock-schema/something/sequence_file'}}
+
+    def test_shared_submissions_summarised_once(self):
+        records = list(BulkSummaries(self.summary_service).summarise(['submission-2', 'submission-4', 'submission-2'],
+                                                                     ['project-a', 'project-b']))
+
+        self.assertEqual(sorted(['submission-1', 'submission-2', 'submission-3', 'submission-4']),
+                         sorted(self.summarised))
+        records_by_uuid = {record['uuid']: record for record in records}
+        self.assertEqual(4, len(records))
+        self.assertEqual({'submission-2', 'submission-4', 'project-a', 'project-b'}, set(records_by_uuid))
+        self.assertEqual(1, records_by_uuid['submission-2']['summary']['file_summary']['count'])
+        self.assertEqual(2, records_by_uuid['project-a']['summary']['file_summary']['count'])
+        self.assertTrue(records_by_uuid['project-b']['summary']['complete'])
+
+    def test_records_yielded_as_they_complete(self):
+        release_slow_submission = threading.Event()
+
+        def get_entities_in_submission(submission_uri, entity_type):
+            if submission_uri.endswith('slow-submission'):
+                release_slow_submission.wait(5)
+            yield from self.get_entities_in_submission(submission_uri, entity_type)
+
+        self.mock_get_entities.side_effect = get_entities_in_submission
+        records = BulkSummaries(self.summary_service).summarise(['slow-submission', 'fast-submission'], [])
+
+        self.assertEqual('fast-submission', next(records)['uuid'])
+        release_slow_submission.set()
+        self.assertEqual('slow-submission', next(records)['uuid'])
+
+    def test_concurrency_bounded_by_tasks_in_flight(self):
+        lock = threading.Lock()
+        running = [0]
+        max_running = [0]
+
+        def get_submission_by_uuid(submission_uuid):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            threading.Event().wait(0.01)
+            with lock:
+                running[0] -= 1
+            return mock_submission(submission_uuid)
+
+        self.ingest_api.get_submission_by_uuid.side_effect = get_submission_by_uuid
+        records = list(BulkSummaries(self.summary_service, ThreadPoolExecutor(8), max_tasks_in_flight=2).summarise(
+            [f'submission-{i}' for i in range(20)], []))
+
+        self.assertEqual(20, len(records))
+        self.assertLessEqual(max_running[0], 2)
+
+    def test_project_summaries_not_held_up(self):
+        release_bulk_submissions = threading.Event()
+        blocked_bulk_fetches = threading.Semaphore(0)
+
+        def get_entities_in_submission(submission_uri, entity_type):
+            if 'bulk-submission' in submission_uri:
+                blocked_bulk_fetches.release()
+                release_bulk_submissions.wait(5)
+            yield from self.get_entities_in_submission(submission_uri, entity_type)
+
+        self.mock_get_entities.side_effect = get_entities_in_submission
+        records = BulkSummaries(self.summary_service).summarise([f'bulk-submission-{i}' for i in range(20)], [])
+        bulk_run = threading.Thread(target=lambda: list(records))
+        bulk_run.start()
+        # as many as the summary service's worker pool has threads
+        for _ in range(2 * len(ENTITY_TYPES)):
+            self.assertTrue(blocked_bulk_fetches.acquire(timeout=5))
+
+        project_summary = self.summary_service.summary_for_project({'uuid': 'project-a'}, time_budget=2)
+        release_bulk_submissions.set()
+        bulk_run.join()
+
+        self.assertTrue(project_summary.complete)
+        self.assertEqual(2, project_summary.file_summary.count)
+
+    def test_closing_summaries_cancels_queued_tasks(self):
+        release_slow_submissions = threading.Event()
+
+        def get_entities_in_submission(submission_uri, entity_type):
+            if 'slow-submission' in submission_uri:
+                release_slow_submissions.wait(5)
+            yield from self.get_entities_in_submission(submission_uri, entity_type)
+
+        self.mock_get_entities.side_effect = get_entities_in_submission
+        pool = ThreadPoolExecutor(2)
+        records = BulkSummaries(self.summary_service, pool, max_tasks_in_flight=2).summarise(
+            ['fast-submission'] + [f'slow-submission-{i}' for i in range(10)], [])
+
+        self.assertEqual('fast-submission', next(records)['uuid'])
+        records.close()
+        release_slow_submissions.set()
+        pool.shutdown(wait=True)
+
+        # only the slow submissions already being summarised when the records were closed
+        self.assertLessEqual(len(self.summarised), 3)
+
+    def test_failures_reported_per_summary(self):
+        self.ingest_api.get_submission_by_uuid.side_effect = lambda submission_uuid: \
+            mock_submission(submission_uuid) if submission_uuid != 'missing-submission' else self.fail_lookup()
+
+        def get_entities_in_submission(submission_uri, entity_type):
+            if submission_uri.endswith('submission-3'):
+                raise ConnectionError('ingest unavailable')
+            yield from self.get_entities_in_submission(submission_uri, entity_type)
+
+        self.mock_get_entities.side_effect = get_entities_in_submission
+        records = list(BulkSummaries(self.summary_service).summarise(['missing-submission', 'submission-3'],
+                                                                     ['project-a', 'project-b']))
+        records_by_uuid = {record['uuid']: record for record in records}
+
+        self.assertEqual('submission not found', records_by_uuid['missing-submission']['error'])
+        self.assertEqual('ingest unavailable', records_by_uuid['submission-3']['error'])
+        self.assertTrue(records_by_uuid['project-a']['summary']['complete'])
+        self.assertFalse(records_by_uuid['project-b']['summary']['complete'])
+        self.assertEqual(1, records_by_uuid['project-b']['summary']['file_summary']['count'])
+
+    @staticmethod
+    def fail_lookup():
+        raise LookupError('submission not found')
@@ -0,0 +1,70 @@
+import json
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import requests
+from hca_ingest.api.ingestapi import IngestApi
+
+from broker.service.submission_summary_cache import SubmissionSummaryCache
+from broker.service.summary_service import SummaryService, SubmissionScraperLoader
+from test.unit.service.stand_in_ingest_api import StandInIngestApi
+
+ENTITY_COUNTS = {'biomaterials': 1000, 'files': 2000, 'processes': 1000, 'protocols': 10, 'projects': 1}
+
+
+class EntityTypeProjectionTest(TestCase):
+    def setUp(self):
+        self.config_dir = TemporaryDirectory()
+
+    def tearDown(self):
+        self.config_dir.cleanup()
+
+    def scraper_loader(self, *configs) -> SubmissionScraperLoader:
+        config_path = os.path.join(self.config_dir.name, 'scrape_config.json')
+        with open(config_path, 'w') as config_file:
+            json.dump({'configs': list(configs)}, config_file)
+        return SubmissionScraperLoader(config_path)
+
+    def summarise(self, stand_in, scraper_loader, entity_type_projection=None):
+        # a plain session, as IngestApi's default one caches responses on disk
+        summary_service = SummaryService(IngestApi(stand_in.url, session=requests.Session()), SubmissionSummaryCache(),
+                                         submission_scraper_loader=scraper_loader,
+                                         entity_type_projection=entity_type_projection)
+        stand_in.reset_counts()
+        return summary_service.generate_summary_for_submission(stand_in.submission())
+
+    def test_counting_projected_entities_transfers_far_fewer_bytes(self):
+        scraper_loader = self.scraper_loader({'placeholder': 'num_fastqs', 'entity_type': 'file',
+                                              'identifier': 'sequence_file', 'paths': [], 'post_process': 'count'})
+        with StandInIngestApi(ENTITY_COUNTS, ('sequence_file', 'donor_organism')) as stand_in:
+            crawled_summary = self.summarise(stand_in, scraper_loader)
+            crawled_bytes = stand_in.bytes_served
+
+            projected_summary = self.summarise(stand_in, scraper_loader, StandInIngestApi.ENTITY_TYPE_PROJECTION)
+            projected_bytes = stand_in.bytes_served
+
+        for summary_field in ['biomaterial_summary', 'file_summary', 'process_summary', 'protocol_summary',
+                              'project_summary']:
+            crawled = getattr(crawled_summary, summary_field)
+            projected = getattr(projected_summary, summary_field)
+            self.assertEqual(crawled.count, projected.count)
+            self.assertEqual(crawled.breakdown, projected.breakdown)
+        self.assertEqual(2000, projected_summary.file_summary.count)
+        self.assertEqual({'num_fastqs': 1000}, projected_summary.scrape_result)
+        self.assertEqual(crawled_summary.scrape_result, projected_summary.scrape_result)
+
+        self.assertLess(projected_bytes * 10, crawled_bytes,
+                        f'{projected_bytes} bytes transferred counting projected entities, {crawled_bytes} crawling')
+
+    def test_entity_types_with_content_directives_are_crawled(self):
+        scraper_loader = self.scraper_loader({'placeholder': 'num_total_estimated_cells', 'entity_type': 'biomaterial',
+                                              'identifier': None, 'paths': ['total_estimated_cells'],
+                                              'post_process': 'sum'})
+        with StandInIngestApi({'biomaterials': 10, 'files': 10}) as stand_in:
+            summary = self.summarise(stand_in, scraper_loader, StandInIngestApi.ENTITY_TYPE_PROJECTION)
+
+        self.assertEqual({'num_total_estimated_cells': 10 * 1000}, summary.scrape_result)
+        self.assertEqual(10, summary.biomaterial_summary.count)
+        self.assertEqual({'donor_organism': {'count': 5}, 'specimen_from_organism': {'count': 5}},
+                         dict(summary.file_summary.breakdown))
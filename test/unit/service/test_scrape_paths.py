@@ -0,0 +1,64 @@
+import json
+from unittest import TestCase
+
+from broker.service.scrape_paths import compile_path, JsonPathAccessor, SimplePathAccessor
+from broker.service.summary_service import DEFAULT_SCRAPE_CONFIG_PATH
+
+
+class ScrapePathsTest(TestCase):
+    contents = [
+        {},
+        {'project_core': {'project_title': 'A title'}},
+        {'project_core': 'not an object'},
+        {'project_core': [{'project_title': 'in a list'}]},
+        {'project_core': {'project_title': None}},
+        {'genus_species': [{'text': 'Homo sapiens'}, {'ontology': 'NCBITaxon:9606'}, {'text': 'Mus musculus'}]},
+        {'genus_species': {'text': 'an object, not a list'}},
+        {'genus_species': 'a string'},
+        {'genus_species': 42},
+        {'genus_species': []},
+        {'contributors': [{'contact_name': 'Jane', 'email': 'jane@example.org'}, {'contact_name': 'John'}]},
+        {'organ': {'text': 'heart'}, 'organ_part': {'text': 'left ventricle'}},
+        {'total_estimated_cells': 0},
+        {'nested': [[{'text': 'a'}], [{'text': 'b'}, {'text': 'c'}]]},
+    ]
+    paths = [
+        'project_core.project_title',
+        'genus_species[*].text',
+        'genus_species[*]',
+        'contributors[*].contact_name',
+        'contributors[*].email',
+        'organ.text',
+        'total_estimated_cells'
+    ]
+
+    def test_simple_paths_match_jsonpath(self):
+        for path in self.paths:
+            simple_accessor = SimplePathAccessor(path)
+            jsonpath_accessor = JsonPathAccessor(path)
+            for content in self.contents:
+                with self.subTest(path=path, content=content):
+                    self.assertEqual(simple_accessor.find_values(content), jsonpath_accessor.find_values(content))
+
+    def test_all_items_of_non_collection_fails_like_jsonpath(self):
+        for value in [None, 1.5]:
+            content = {'genus_species': value}
+            with self.assertRaises(TypeError):
+                JsonPathAccessor('genus_species[*].text').find_values(content)
+            with self.assertRaises(TypeError):
+                SimplePathAccessor('genus_species[*].text').find_values(content)
+
+    def test_compile_path(self):
+        self.assertIsInstance(compile_path('project_core.project_title'), SimplePathAccessor)
+        self.assertIsInstance(compile_path('genus_species[*].text'), SimplePathAccessor)
+        self.assertIsInstance(compile_path('contributors[0].email'), JsonPathAccessor)
+        self.assertIsInstance(compile_path('$..text'), JsonPathAccessor)
+        with self.assertRaises(Exception):
+            compile_path('where.text')  # a jsonpath_rw keyword is still handed to, and rejected by, jsonpath_rw
+
+    def test_scrape_config_paths_are_simple(self):
+        with open(DEFAULT_SCRAPE_CONFIG_PATH) as config_file:
+            config = json.load(config_file)
+
+        for path in [path for scrape_config in config['configs'] for path in scrape_config['paths']]:
+            self.assertIsInstance(compile_path(path), SimplePathAccessor, path)
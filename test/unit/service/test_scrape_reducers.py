@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+from broker.service.scrape_reducers import SumReducer, CountReducer, UniqueReducer, CollectReducer
+from broker.service.summary_service import SubmissionScraper
+
+
+class ScrapeReducersTest(TestCase):
+
+    def test_reduce_collection(self):
+        values = [3, 1, 3, 5]
+
+        self.assertEqual(SumReducer()(values), 12)
+        self.assertEqual(CountReducer()(values), 4)
+        self.assertEqual(sorted(UniqueReducer()(values)), [1, 3, 5])
+        self.assertEqual(CollectReducer()(values), values)
+
+    def test_merge_partial_accumulators(self):
+        for reducer in [SumReducer(), CountReducer(), UniqueReducer(), CollectReducer()]:
+            first_half = reducer.init()
+            for value in [3, 1]:
+                first_half = reducer.add(first_half, value)
+            second_half = reducer.init()
+            for value in [3, 5]:
+                second_half = reducer.add(second_half, value)
+
+            merged = reducer.finish(reducer.merge(first_half, second_half))
+
+            if isinstance(reducer, UniqueReducer):
+                self.assertEqual(sorted(merged), [1, 3, 5])
+            else:
+                self.assertEqual(merged, reducer([3, 1, 3, 5]))
+
+    def test_reducer_for_post_process(self):
+        self.assertIsInstance(SubmissionScraper.reducer_for('sum'), SumReducer)
+        self.assertIsInstance(SubmissionScraper.reducer_for('count'), CountReducer)
+        self.assertIsInstance(SubmissionScraper.reducer_for('unique'), UniqueReducer)
+        self.assertIsInstance(SubmissionScraper.reducer_for(''), CollectReducer)
+
+    def test_merge_scrapes(self):
+        directives = [
+            SubmissionScraper.Directive('num_donors', 'biomaterial', 'donor_organism', [], CountReducer()),
+            SubmissionScraper.Directive('genus_species', 'biomaterial', 'donor_organism', ['genus_species[*].text'],
+                                        UniqueReducer()),
+            SubmissionScraper.Directive('num_cells', 'biomaterial', None, ['total_estimated_cells'], SumReducer())
+        ]
+        scraper = SubmissionScraper(directives)
+        donor = {'content': {'describedBy': 'http://mock-schema/type/donor_organism',
+                             'genus_species': [{'text': 'Homo sapiens'}]}}
+        cell_suspension = {'content': {'describedBy': 'http://mock-schema/type/cell_suspension',
+                                       'total_estimated_cells': 100}}
+
+        first_page = scraper.new_scrape('biomaterial')
+        first_page.add(donor)
+        first_page.add(cell_suspension)
+        second_page = scraper.new_scrape('biomaterial')
+        second_page.add(donor)
+        second_page.add(cell_suspension)
+
+        result = first_page.merge(second_page).result()
+
+        self.assertEqual(result, {'num_donors': 2, 'genus_species': ['Homo sapiens'], 'num_cells': 200})
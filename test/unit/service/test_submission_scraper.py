@@ -0,0 +1,65 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from broker.service.submission_summary_cache import SubmissionSummaryCache
+from broker.service.summary_service import SubmissionScraper, SummaryService, DEFAULT_SCRAPE_CONFIG_PATH
+from test.unit.service import test_summary_service
+
+
+class SubmissionScraperTest(TestCase):
+    def setUp(self):
+        self.scraper = SubmissionScraper.from_file(DEFAULT_SCRAPE_CONFIG_PATH)
+        self.biomaterials = [
+            {'content': {'describedBy': 'http://mock-schema/type/donor_organism',
+                         'genus_species': [{'text': 'Homo sapiens'}]}},
+            {'content': {'describedBy': 'http://mock-schema/type/cell_suspension',
+                         'selected_cell_type': [{'text': 'T cell'}],
+                         'total_estimated_cells': 100}},
+            {'content': {'describedBy': 'http://mock-schema/type/cell_suspension',
+                         'total_estimated_cells': 50}}
+        ]
+
+    def scrape_biomaterials(self):
+        scrape = self.scraper.new_scrape('biomaterial')
+        for biomaterial in self.biomaterials:
+            scrape.add(biomaterial)
+        return scrape.result()
+
+    def test_scraper_can_be_reused(self):
+        first_result = self.scrape_biomaterials()
+        second_result = self.scrape_biomaterials()
+
+        self.assertEqual(first_result, second_result)
+        self.assertEqual(second_result['num_donors'], 1)
+        self.assertEqual(second_result['num_cell suspension'], 2)
+        self.assertEqual(second_result['num_total_estimated_cells'], 150)
+        self.assertEqual(second_result['genus_species'], ['Homo sapiens'])
+        self.assertEqual(second_result['cell_type'], ['T cell'])
+        self.assertEqual(second_result['num_specimens'], 0)
+
+    def test_result_keeps_directive_order(self):
+        result = self.scrape_biomaterials()
+
+        self.assertEqual(list(result.keys()),
+                         [directive.placeholder for directive in self.scraper.directives_for('biomaterial')])
+
+    def test_only_indexed_directives_applied(self):
+        index = self.scraper.directive_indexes['biomaterial']
+        applicable = [index.directives[i].placeholder for i in index.positions_for('donor_organism')]
+
+        self.assertEqual(applicable, ['num_total_estimated_cells', 'genus_species', 'num_donors'])
+        self.assertEqual(index.positions_for('imaging_preparation_protocol'), index.untargeted)
+
+    def test_entities_classified_once(self):
+        summary_service = SummaryService(patch('__main__.IngestApi'), SubmissionSummaryCache(10))
+        submission = next(test_summary_service.SummaryServiceTest.generate_mock_submissions_in_project(1))
+
+        with patch('broker.service.summary_service.SummaryService.get_entities_in_submission') as mock_get_entities, \
+                patch.object(SummaryService, 'parse_specific_entity_type',
+                             wraps=SummaryService.parse_specific_entity_type) as parse_specific_entity_type:
+            mock_get_entities.side_effect = \
+                lambda *args: test_summary_service.SummaryServiceTest.generate_mock_entities(10, 'donor_organism')
+            submission_summary = summary_service.summary_for_submission(submission)
+
+        self.assertEqual(parse_specific_entity_type.call_count, 10 * 5)
+        self.assertEqual(submission_summary.scrape_result['num_donors'], 10)
@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from broker.service.submission_summary_cache import SubmissionSummaryCache
+from broker.service.summary_service import SubmissionScraperLoader, SubmissionScraper, SummaryService
+from test.unit.service import test_summary_service
+
+
+class SubmissionScraperLoaderTest(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.temp_dir.name, 'scrape_config.json')
+        self.write_config('num_donors')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_config(self, placeholder, mtime_ns=None):
+        with open(self.config_path, 'w') as config_file:
+            json.dump({'configs': [{'placeholder': placeholder,
+                                    'entity_type': 'biomaterial',
+                                    'identifier': 'donor_organism',
+                                    'paths': [],
+                                    'post_process': 'count'}]}, config_file)
+        if mtime_ns:
+            os.utime(self.config_path, ns=(mtime_ns, mtime_ns))
+
+    def test_compiles_once(self):
+        loader = SubmissionScraperLoader(self.config_path)
+
+        with patch.object(SubmissionScraper, 'from_file', wraps=SubmissionScraper.from_file) as from_file:
+            scraper = loader.get()
+            self.assertIs(loader.get(), scraper)
+            self.assertIs(loader.get(), scraper)
+
+        from_file.assert_called_once_with(self.config_path)
+        self.assertEqual(loader.stats()['compilations'], 1)
+
+    def test_reloads_when_config_changes(self):
+        loader = SubmissionScraperLoader(self.config_path)
+        scraper = loader.get()
+
+        self.write_config('num_donor_organisms', mtime_ns=os.stat(self.config_path).st_mtime_ns + 10 ** 9)
+        reloaded_scraper = loader.get()
+
+        self.assertIsNot(reloaded_scraper, scraper)
+        self.assertEqual(reloaded_scraper.directives[0].placeholder, 'num_donor_organisms')
+        self.assertEqual(loader.stats()['compilations'], 2)
+
+    def test_keeps_previous_scraper_when_reload_fails(self):
+        loader = SubmissionScraperLoader(self.config_path)
+        scraper = loader.get()
+
+        with open(self.config_path, 'w') as config_file:
+            config_file.write('{not json')
+        os.utime(self.config_path, ns=(0, 0))
+
+        self.assertIs(loader.get(), scraper)
+
+    def test_summary_service_reuses_compiled_scraper(self):
+        loader = SubmissionScraperLoader()
+        summary_service = SummaryService(patch('__main__.IngestApi'), SubmissionSummaryCache(20),
+                                         submission_scraper_loader=loader)
+
+        with patch('broker.service.summary_service.SummaryService.get_entities_in_submission') as mock_get_entities:
+            mock_get_entities.side_effect = lambda *args: test_summary_service.SummaryServiceTest.generate_mock_entities(10, 'donor_organism')
+            for submission in test_summary_service.SummaryServiceTest.generate_mock_submissions_in_project(10):
+                submission_summary = summary_service.summary_for_submission(submission)
+                self.assertEqual(submission_summary.scrape_result['num_donors'], 10)
+
+        stats = loader.stats()
+        self.assertEqual(stats['compilations'], 1)
+        self.assertEqual(stats['scraped_entities'], 10 * 5 * 10)
+
+    def test_fingerprint_changes_with_config(self):
+        loader = SubmissionScraperLoader(self.config_path)
+        fingerprint = loader.get().fingerprint
+
+        os.utime(self.config_path, ns=(0, 0))
+        unchanged_fingerprint = loader.get().fingerprint
+        self.write_config('num_donor_organisms', mtime_ns=10 ** 9)
+        changed_fingerprint = loader.get().fingerprint
+
+        self.assertEqual(unchanged_fingerprint, fingerprint)
+        self.assertNotEqual(changed_fingerprint, fingerprint)
+
+    def test_reload_changes_served_scrape_result(self):
+        loader = SubmissionScraperLoader(self.config_path)
+        summary_service = SummaryService(patch('__main__.IngestApi'), SubmissionSummaryCache(20),
+                                         submission_scraper_loader=loader)
+        submission = next(test_summary_service.SummaryServiceTest.generate_mock_submissions_in_project(1))
+
+        with patch('broker.service.summary_service.SummaryService.get_entities_in_submission') as mock_get_entities:
+            mock_get_entities.side_effect = lambda *args: test_summary_service.SummaryServiceTest.generate_mock_entities(5, 'donor_organism')
+            submission_summary = summary_service.summary_for_submission(submission)
+            self.write_config('num_donor_organisms', mtime_ns=os.stat(self.config_path).st_mtime_ns + 10 ** 9)
+            reloaded_submission_summary = summary_service.summary_for_submission(submission)
+
+        self.assertEqual({'num_donors': 5}, submission_summary.scrape_result)
+        self.assertEqual({'num_donor_organisms': 5}, reloaded_submission_summary.scrape_result)
@@ -1,3 +1,4 @@
+import threading
 from unittest import TestCase
 from time import sleep
 
@@ -33,3 +34,84 @@ class SubmissionSummaryCacheTest(TestCase):
             assert False
         except CacheMissException:
             pass
+
+    def test_lru_eviction(self):
+        summary_cache = SubmissionSummaryCache(2, 60)
+
+        summary_cache.insert('uuid-1', SubmissionSummary())
+        summary_cache.insert('uuid-2', SubmissionSummary())
+        summary_cache.get('uuid-1')  # uuid-1 is now the most recently used
+        summary_cache.insert('uuid-3', SubmissionSummary())
+
+        self.assertIsNotNone(summary_cache.get('uuid-1'))
+        self.assertIsNotNone(summary_cache.get('uuid-3'))
+        with self.assertRaises(CacheMissException):
+            summary_cache.get('uuid-2')
+
+        stats = summary_cache.stats()
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['hits'], 3)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_get_or_generate_single_flight(self):
+        summary_cache = SubmissionSummaryCache(10, 60)
+        generate_started = threading.Event()
+        release_generate = threading.Event()
+        generate_calls = []
+
+        def generate():
+            generate_calls.append(1)
+            generate_started.set()
+            release_generate.wait(5)
+            return SubmissionSummary()
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(summary_cache.get_or_generate('uuid', generate)))
+        leader.start()
+        generate_started.wait(5)
+
+        followers = [threading.Thread(target=lambda: results.append(summary_cache.get_or_generate('uuid', generate)))
+                     for _ in range(5)]
+        for follower in followers:
+            follower.start()
+        while summary_cache.stats()['coalesced'] < 5:
+            sleep(0.01)
+        release_generate.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(len(generate_calls), 1)
+        self.assertEqual(len(results), 6)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertIs(summary_cache.get('uuid'), results[0])
+
+    def test_get_or_generate_error_is_not_cached(self):
+        summary_cache = SubmissionSummaryCache(10, 60)
+
+        def failing_generate():
+            raise ValueError('ingest unavailable')
+
+        with self.assertRaises(ValueError):
+            summary_cache.get_or_generate('uuid', failing_generate)
+
+        summary = summary_cache.get_or_generate('uuid', SubmissionSummary)
+        self.assertIs(summary_cache.get('uuid'), summary)
+        self.assertEqual(summary_cache.stats()['in_flight'], 0)
+
+    def test_version_change_invalidates_entry(self):
+        summary_cache = SubmissionSummaryCache(10)
+        first_summary = SubmissionSummary()
+
+        summary_cache.insert('uuid', first_summary, '2022-01-27T11:57:05.187Z')
+
+        self.assertIs(summary_cache.get('uuid', '2022-01-27T11:57:05.187Z'), first_summary)
+        with self.assertRaises(CacheMissException):
+            summary_cache.get('uuid', '2022-01-27T12:00:58.417Z')
+        with self.assertRaises(CacheMissException):
+            summary_cache.get('uuid', '2022-01-27T11:57:05.187Z')  # the stale version was dropped
+
+        stats = summary_cache.stats()
+        self.assertEqual(stats['invalidations'], 1)
+        self.assertEqual(stats['size'], 0)
+        self.assertIsNone(stats['expiry'])
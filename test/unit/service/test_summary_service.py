@@ -1,5 +1,6 @@
 from unittest import TestCase
 from unittest.mock import patch
+from threading import Barrier, Event
 from time import sleep
 
 from broker.service.summary_service import SummaryService
@@ -143,6 +144,136 @@ class SummaryServiceTest(TestCase):
                 summary_service.summary_for_project(mock_project_resource)
                 assert mock_get_entities.call_count == 100  # assert 50 more calls after cache expiry
 
+    def test_regenerates_summary_when_submission_updated(self):
+        mock_ingest_api = patch('__main__.IngestApi')
+        submission = next(self.generate_mock_submissions_in_project(1))
+        summary_service = SummaryService(mock_ingest_api, SubmissionSummaryCache(10))
+
+        with patch('broker.service.summary_service.SummaryService.get_entities_in_submission') as mock_get_entities:
+            first_summary = summary_service.summary_for_submission(submission)
+            assert mock_get_entities.call_count == 5
+            assert summary_service.summary_for_submission(submission) is first_summary
+            assert mock_get_entities.call_count == 5  # unchanged submission served from cache
+
+            updated_submission = dict(submission, updateDate='mock-later-update-date')
+            updated_summary = summary_service.summary_for_submission(updated_submission)
+            assert mock_get_entities.call_count == 10  # updateDate changed, so the submission is summarised again
+            assert updated_summary is not first_summary
+            assert updated_summary.last_updated_date == 'mock-later-update-date'
+
+    def test_entity_types_fetched_concurrently(self):
+        mock_ingest_api = patch('__main__.IngestApi')
+        submission = next(self.generate_mock_submissions_in_project(1))
+        summary_service = SummaryService(mock_ingest_api, SubmissionSummaryCache(10))
+        all_fetches_started = Barrier(5, timeout=5)
+
+        with patch('broker.service.summary_service.SummaryService.get_entities_in_submission') as mock_get_entities:
+            def get_entities_in_submission_mock(*args, **kwargs):
+                all_fetches_started.wait()  # only passes if every entity type is being fetched at the same time
+                yield from self.generate_mock_entities(3, 'specific-entity')
+
+            mock_get_entities.side_effect = get_entities_in_submission_mock
+            submission_summary = summary_service.summary_for_submission(submission)
+
+        assert submission_summary.biomaterial_summary.count == 3
+        assert submission_summary.file_summary.count == 3
+        assert submission_summary.project_summary.count == 3
+
+    def test_submission_summary_streams_entities(self):
+        mock_ingest_api = patch('__main__.IngestApi')
+        submission = next(self.generate_mock_submissions_in_project(1))
+        summary_service = SummaryService(mock_ingest_api, SubmissionSummaryCache(10))
+        max_live_biomaterials = []
+
+        with patch('broker.service.summary_service.SummaryService.get_entities_in_submission') as mock_get_entities:
+            def get_entities_in_submission_mock(*args, **kwargs):
+                if args[1] == 'biomaterials':
+                    for _ in range(1000):
+                        biomaterial = TrackedEntity({'content': {'describedBy': 'http://mock-schema/type/donor_organism',
+                                                                 'genus_species': [{'text': 'Homo sapiens'}],
+                                                                 'total_estimated_cells': 10}})
+                        max_live_biomaterials.append(TrackedEntity.live)
+                        yield biomaterial
+
+            mock_get_entities.side_effect = get_entities_in_submission_mock
+            submission_summary = summary_service.summary_for_submission(submission)
+
+        assert submission_summary.biomaterial_summary.count == 1000
+        assert submission_summary.biomaterial_summary.breakdown['donor_organism'] == {'count': 1000}
+        assert submission_summary.scrape_result['num_total_estimated_cells'] == 10000
+        assert submission_summary.scrape_result['num_donors'] == 1000
+        assert submission_summary.scrape_result['genus_species'] == ['Homo sapiens']
+        assert max(max_live_biomaterials) <= 2  # the entity being created, and at most the one being summarised
+
+    def test_project_submissions_summarised_concurrently(self):
+        summary_service = SummaryService(patch('__main__.IngestApi'), SubmissionSummaryCache(10))
+        all_submissions_started = Barrier(4, timeout=5)
+
+        with patch('broker.service.summary_service.SummaryService.get_submissions_in_project') as mock_get_project_submissions, \
+                patch('broker.service.summary_service.SummaryService.get_entities_in_submission') as mock_get_entities:
+            mock_get_project_submissions.side_effect = lambda *args: self.generate_mock_submissions_in_project(4)
+
+            def get_entities_in_submission_mock(*args, **kwargs):
+                if args[1] == 'files':
+                    all_submissions_started.wait()  # only passes if the 4 submissions are summarised at the same time
+                yield from self.generate_mock_entities(10, 'specific-entity')
+
+            mock_get_entities.side_effect = get_entities_in_submission_mock
+            project_summary = summary_service.summary_for_project(dict())
+
+        assert project_summary.complete
+        assert project_summary.file_summary.count == 40
+
+    def test_project_summary_partial_when_time_budget_runs_out(self):
+        summary_service = SummaryService(patch('__main__.IngestApi'), SubmissionSummaryCache(10))
+        slow_submission = 'mock-envelope-id-0'
+        release_slow_submission = Event()
+
+        with patch('broker.service.summary_service.SummaryService.get_submissions_in_project') as mock_get_project_submissions, \
+                patch('broker.service.summary_service.SummaryService.get_entities_in_submission') as mock_get_entities:
+            mock_get_project_submissions.side_effect = lambda *args: self.generate_mock_submissions_in_project(3)
+
+            def get_entities_in_submission_mock(*args, **kwargs):
+                if args[0] == slow_submission:
+                    release_slow_submission.wait(5)
+                yield from self.generate_mock_entities(10, 'specific-entity')
+
+            mock_get_entities.side_effect = get_entities_in_submission_mock
+            partial_summary = summary_service.summary_for_project(dict(), time_budget=0.5)
+            release_slow_submission.set()
+
+            assert not partial_summary.complete
+            assert partial_summary.file_summary.count == 20
+
+            complete_summary = summary_service.summary_for_project(dict(), time_budget=5)
+
+        assert complete_summary.complete
+        assert complete_summary.file_summary.count == 30
+        assert mock_get_entities.call_count == 15  # the slow submission finished in the background, nothing re-crawled
+
+    def test_project_summary_does_not_modify_cached_submission_summaries(self):
+        submission_summary_cache = SubmissionSummaryCache(10)
+        summary_service = SummaryService(patch('__main__.IngestApi'), submission_summary_cache)
+
+        with patch('broker.service.summary_service.SummaryService.get_submissions_in_project') as mock_get_project_submissions, \
+                patch('broker.service.summary_service.SummaryService.get_entities_in_submission') as mock_get_entities:
+            mock_get_project_submissions.side_effect = lambda *args: self.generate_mock_submissions_in_project(3)
+            mock_get_entities.side_effect = lambda *args: self.generate_mock_entities(10, 'specific-entity')
+
+            for _ in range(3):
+                project_summary = summary_service.summary_for_project(dict())
+                assert project_summary.file_summary.count == 30
+                assert project_summary.file_summary.breakdown['specific-entity']['count'] == 30
+
+            submissions = list(self.generate_mock_submissions_in_project(3))
+            for submission in submissions:
+                cached_summary = submission_summary_cache.get(submission['uuid']['uuid'],
+                                                             summary_service.summary_version(submission))
+                assert cached_summary.file_summary.count == 10
+                assert cached_summary.file_summary.breakdown['specific-entity']['count'] == 10
+
+        assert mock_get_entities.call_count == 15  # summarised once, then served from the cache
+
     @staticmethod
     def generate_mock_submissions_in_project(count):
         if not (1 <= count <= 10):
@@ -174,3 +305,17 @@ class SummaryServiceTest(TestCase):
     def generate_mock_entities(count, specific_type):
         for i in range(0, count):
             yield {'content': {'describedBy': 'http://mock-schema/something/{0}'.format(specific_type)}}
+
+
+class TrackedEntity(dict):
+    """
+    A mock entity keeping count of how many instances are alive
+    """
+    live = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        TrackedEntity.live += 1
+
+    def __del__(self):
+        TrackedEntity.live -= 1
@@ -0,0 +1,194 @@
+import json
+import os
+import sqlite3
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import jsonpickle
+
+from broker.common.submission_summary import SubmissionSummary
+from broker.service.submission_summary_cache import SubmissionSummaryCache
+from broker.service.summary_service import SummaryService, SubmissionScraperLoader
+from broker.service.summary_store import SqliteSummaryStore, SummaryIndexer, SUMMARY_FORMAT
+
+
+def mock_submission(index, update_date='2022-01-27T12:00:58.417Z'):
+    links = {collection: {'href': f'http://mock-ingest-api/envelopes/{index}/{collection}'}
+             for collection in ['biomaterials', 'files', 'processes', 'protocols', 'projects']}
+    links['self'] = {'href': f'http://mock-ingest-api/envelopes/{index}'}
+    return {
+        '_links': links,
+        'uuid': {'uuid': f'mock-submission-uuid-{index}'},
+        'submissionDate': '2022-01-27T11:57:05.187Z',
+        'updateDate': update_date,
+        'submissionState': 'Valid'
+    }
+
+
+def mock_entities(*args, **kwargs):
+    for _ in range(3):
+        yield {'content': {'describedBy': 'http://mock-schema/something/specific-entity'}}
+
+
+class SqliteSummaryStoreTest(TestCase):
+    def setUp(self):
+        self.storage_dir = TemporaryDirectory()
+        self.store = SqliteSummaryStore.in_storage_dir(self.storage_dir.name)
+
+    def tearDown(self):
+        self.storage_dir.cleanup()
+
+    def test_stored_summary_survives_restart(self):
+        summary = SubmissionSummary()
+        summary.file_summary.add_entity('sequence_file')
+        summary.scrape_result['project_title'] = ['A title']
+        self.store.put('mock-uuid', summary, 'version-1')
+
+        restarted_store = SqliteSummaryStore(os.path.join(self.storage_dir.name, 'submission_summaries.sqlite'))
+        stored_summary = restarted_store.get('mock-uuid', 'version-1')
+
+        self.assertIsInstance(stored_summary, SubmissionSummary)
+        self.assertEqual(1, stored_summary.file_summary.count)
+        self.assertEqual({'count': 1}, stored_summary.file_summary.breakdown['sequence_file'])
+        self.assertEqual(['A title'], stored_summary.scrape_result['project_title'])
+        self.assertEqual('version-1', restarted_store.version_of('mock-uuid'))
+
+    def test_summary_stored_as_versioned_json(self):
+        summary = SubmissionSummary()
+        summary.biomaterial_summary.add_entity('donor_organism')
+        self.store.put('mock-uuid', summary, 'version-1')
+
+        stored_summary = self.stored_summaries()['mock-uuid']
+
+        self.assertEqual({'format': SUMMARY_FORMAT, 'summary': summary.to_dict()}, json.loads(stored_summary))
+        self.assertNotIn('py/object', stored_summary)
+
+    def test_summary_stored_in_another_format_not_returned(self):
+        self.store.put('jsonpickled-uuid', SubmissionSummary(), 'version-1')
+        self.store.put('future-uuid', SubmissionSummary(), 'version-1')
+        self.store.put('unreadable-uuid', SubmissionSummary(), 'version-1')
+        with sqlite3.connect(self.store.path) as connection:
+            for uuid, stored_summary in [('jsonpickled-uuid', jsonpickle.encode(SubmissionSummary())),
+                                         ('future-uuid', json.dumps({'format': SUMMARY_FORMAT + 1, 'summary': {}})),
+                                         ('unreadable-uuid', '{"format": 1, "summary": {"file_summary": []}}')]:
+                connection.execute('UPDATE submission_summary SET summary = ? WHERE uuid = ?', (stored_summary, uuid))
+
+        self.assertIsNone(self.store.get('jsonpickled-uuid', 'version-1'))
+        self.assertIsNone(self.store.get('future-uuid', 'version-1'))
+        self.assertIsNone(self.store.get('unreadable-uuid', 'version-1'))
+        self.assertEqual(3, self.store.stats()['misses'])
+
+    def stored_summaries(self) -> dict:
+        with sqlite3.connect(self.store.path) as connection:
+            return dict(connection.execute('SELECT uuid, summary FROM submission_summary').fetchall())
+
+    def test_summary_of_another_version_not_returned(self):
+        self.store.put('mock-uuid', SubmissionSummary(), 'version-1')
+
+        self.assertIsNone(self.store.get('mock-uuid', 'version-2'))
+        self.assertIsNone(self.store.get('unknown-uuid', 'version-1'))
+        self.assertIsNone(self.store.version_of('unknown-uuid'))
+        self.assertEqual({'size': 1, 'hits': 0, 'misses': 2, 'writes': 1},
+                         {key: value for key, value in self.store.stats().items() if key != 'path'})
+
+    def test_summary_service_serves_stored_summary_after_restart(self):
+        submission = mock_submission(0)
+        with patch('broker.service.summary_service.SummaryService.get_entities_in_submission') as mock_get_entities:
+            mock_get_entities.side_effect = mock_entities
+            summary = SummaryService(MagicMock(), SubmissionSummaryCache(),
+                                     summary_store=self.store).summary_for_submission(submission)
+            # a new cache and service, as after a restart or in another worker
+            restarted_summary = SummaryService(MagicMock(), SubmissionSummaryCache(),
+                                               summary_store=self.store).summary_for_submission(submission)
+
+        self.assertEqual(5, mock_get_entities.call_count)
+        self.assertEqual(summary.file_summary.count, restarted_summary.file_summary.count)
+        self.assertEqual(3, restarted_summary.file_summary.breakdown['specific-entity']['count'])
+
+
+class SummaryIndexerTest(TestCase):
+    def setUp(self):
+        self.storage_dir = TemporaryDirectory()
+        self.store = SqliteSummaryStore.in_storage_dir(self.storage_dir.name)
+        self.ingest_api = MagicMock()
+        self.summary_service = SummaryService(self.ingest_api, SubmissionSummaryCache(), summary_store=self.store)
+
+    def tearDown(self):
+        self.storage_dir.cleanup()
+
+    def test_indexes_new_and_updated_submissions(self):
+        indexer = SummaryIndexer(self.summary_service, 60)
+        with patch('broker.service.summary_service.SummaryService.get_entities_in_submission') as mock_get_entities:
+            mock_get_entities.side_effect = mock_entities
+
+            self.ingest_api.get_all.side_effect = lambda *args: iter([mock_submission(0), mock_submission(1)])
+            self.assertEqual(2, indexer.index())
+            self.assertEqual(0, indexer.index())
+
+            self.ingest_api.get_all.side_effect = lambda *args: iter([mock_submission(0, 'updated'),
+                                                                      mock_submission(1)])
+            self.assertEqual(1, indexer.index())
+
+        self.assertTrue(self.store.version_of('mock-submission-uuid-0').startswith('updated@'))
+        self.assertEqual(3 * 5, mock_get_entities.call_count)
+        self.assertEqual({'interval': 60, 'runs': 3, 'indexed': 3, 'failed': 0}, indexer.stats())
+
+    def test_reindexes_when_scrape_config_changes(self):
+        with TemporaryDirectory() as config_dir:
+            config_path = os.path.join(config_dir, 'scrape_config.json')
+            self.write_scrape_config(config_path, 'num_entities')
+            self.summary_service.submission_scraper_loader = SubmissionScraperLoader(config_path)
+            indexer = SummaryIndexer(self.summary_service, 60)
+            self.ingest_api.get_all.side_effect = lambda *args: iter([mock_submission(0)])
+            with patch('broker.service.summary_service.SummaryService.get_entities_in_submission') as mock_get_entities:
+                mock_get_entities.side_effect = mock_entities
+                self.assertEqual(1, indexer.index())
+                self.write_scrape_config(config_path, 'num_specific_entities')
+                os.utime(config_path, ns=(0, 0))
+                self.assertEqual(1, indexer.index())
+                self.assertEqual(0, indexer.index())
+
+                # served the summary scraped with the new config, even after a restart
+                restarted_loader = SubmissionScraperLoader(config_path)
+                restarted_summary_service = SummaryService(self.ingest_api, SubmissionSummaryCache(),
+                                                           submission_scraper_loader=restarted_loader,
+                                                           summary_store=self.store)
+                summary = restarted_summary_service.summary_for_submission(mock_submission(0))
+
+        self.assertEqual(2 * 5, mock_get_entities.call_count)
+        self.assertEqual({'num_specific_entities': 3}, summary.scrape_result)
+
+    @staticmethod
+    def write_scrape_config(config_path, placeholder):
+        with open(config_path, 'w') as config_file:
+            json.dump({'configs': [{'placeholder': placeholder, 'entity_type': 'biomaterial',
+                                    'identifier': 'specific-entity', 'paths': [], 'post_process': 'count'}]},
+                      config_file)
+
+    def test_failed_submission_does_not_stop_indexing(self):
+        indexer = SummaryIndexer(self.summary_service, 60)
+        self.ingest_api.get_all.side_effect = lambda *args: iter([mock_submission(0), mock_submission(1)])
+        with patch('broker.service.summary_service.SummaryService.get_entities_in_submission') as mock_get_entities:
+            def get_entities_in_submission_mock(submission_uri, *args):
+                if submission_uri.endswith('/0'):
+                    raise ConnectionError('ingest unavailable')
+                yield from mock_entities()
+
+            mock_get_entities.side_effect = get_entities_in_submission_mock
+            self.assertEqual(1, indexer.index())
+
+        self.assertIsNone(self.store.version_of('mock-submission-uuid-0'))
+        self.assertIsNotNone(self.store.version_of('mock-submission-uuid-1'))
+        self.assertEqual(1, indexer.stats()['failed'])
+
+    def test_background_thread_indexes_until_stopped(self):
+        indexer = SummaryIndexer(self.summary_service, 60)
+        self.ingest_api.get_all.side_effect = lambda *args: iter([mock_submission(0)])
+        with patch('broker.service.summary_service.SummaryService.get_entities_in_submission') as mock_get_entities:
+            mock_get_entities.side_effect = mock_entities
+            indexer.start()
+            indexer.stop()
+
+        self.assertEqual(1, indexer.stats()['runs'])
+        self.assertIsNotNone(self.store.version_of('mock-submission-uuid-0'))
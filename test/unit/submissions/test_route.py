@@ -43,6 +43,26 @@ class RouteTestCase(BrokerAppTest):
         self.assertEqual(response.status_code, HTTPStatus.OK)
         mock_send_file.assert_called_once()
 
+    @patch('broker.submissions.routes.send_file')
+    def test_download_spreadsheet__not_modified(self, mock_send_file):
+        # given
+        mock_send_file.return_value = self._app.response_class(response=b'spreadsheet', status=HTTPStatus.OK)
+        submission_uuid = 'xyz-001'
+
+        with self._app.test_client() as app:
+            # when
+            response = app.get(f'/submissions/{submission_uuid}/spreadsheet')
+            etag = response.headers['ETag']
+            conditional_response = app.get(f'/submissions/{submission_uuid}/spreadsheet',
+                                           headers={'If-None-Match': etag})
+
+        # then
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+        self.assertEqual(conditional_response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(etag, conditional_response.headers['ETag'])
+        mock_send_file.assert_called_once()
+
     def test_download_spreadsheet__not_found(self):
         # given
         self.mock_submission.return_value = {}
@@ -1,12 +1,19 @@
+import io
+import json
 import os
+import tempfile
 from unittest import TestCase
 from unittest.mock import patch, Mock
 
 from hca_ingest.api.ingestapi import IngestApi
 
+from broker.service.spreadsheet_generation.schema_template_loader import SchemaTemplateLoader
 from broker.service.spreadsheet_generation.spreadsheet_generator import SpreadsheetGenerator
-from broker.service.spreadsheet_generation.spreadsheet_job_manager import SpreadsheetJobManager
+from broker.service.spreadsheet_generation.spreadsheet_job_manager import SpreadsheetJobManager, JobSpec, JobStatus, \
+    JobQueueFullException
+from broker.service.summary_service import SubmissionScraperLoader, SubmissionScraper
 from broker_app import create_app
+from test.unit.service.spreadsheet_generation.schema_fixtures import schema_template
 
 
 class BrokerAppTest(TestCase):
@@ -20,7 +27,10 @@ class BrokerAppTest(TestCase):
 
         self.mock_ingest = Mock(spec=IngestApi)
         self.mock_spreadsheet = Mock(spec=SpreadsheetGenerator)
+        self.mock_spreadsheet.stats.return_value = {}
+        self.mock_spreadsheet.load_schema_template.return_value = schema_template()
         self.mock_job_manager = Mock(spec=SpreadsheetJobManager)
+        self.mock_job_manager.stats.return_value = {}
 
         self.ingest_constructor.return_value = self.mock_ingest
         self.xls_constructor.return_value = self.mock_spreadsheet
@@ -30,6 +40,190 @@ class BrokerAppTest(TestCase):
         self._app.config["TESTING"] = True
         self._app.testing = True
 
+    def test_project_summary_streamed(self):
+        # given
+        self.mock_ingest.get_project_by_uuid.return_value = {'_links': {}}
+        self.mock_ingest.get_related_entities.return_value = iter([{
+            '_links': {'self': {'href': 'http://mock-ingest-api/submissionEnvelopes/mock-id'}},
+            'uuid': {'uuid': 'mock-submission-uuid'},
+            'submissionDate': '2022-01-27T11:57:05.187Z',
+            'updateDate': '2022-01-27T12:00:58.417Z',
+            'submissionState': 'Valid'
+        }])
+        self.mock_ingest.get_entities.side_effect = lambda *args: iter(
+            [{'content': {'describedBy': f'http://mock-schema/type/{args[1]}/1.0.0/specific_{args[1]}'}}])
+
+        # when
+        with self._app.test_client() as app:
+            response = app.get('/projects/mock-project-uuid/summary')
+
+        # then
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.is_streamed)
+        summary = response.get_json()
+        self.assertTrue(summary['complete'])
+        self.assertEqual({'count': 1, 'breakdown': {'specific_files': {'count': 1}}}, summary['file_summary'])
+        self.assertEqual(['biomaterial_summary', 'protocol_summary', 'process_summary', 'file_summary',
+                          'submission_status', 'create_date', 'last_updated_date', 'complete'], list(summary))
+
+    def test_bulk_summaries_streamed_as_ndjson(self):
+        # given
+        self.mock_ingest.get_submission_by_uuid.side_effect = lambda submission_uuid: {
+            '_links': {'self': {'href': f'http://mock-ingest-api/submissionEnvelopes/{submission_uuid}'}},
+            'uuid': {'uuid': submission_uuid},
+            'submissionDate': '2022-01-27T11:57:05.187Z',
+            'updateDate': '2022-01-27T12:00:58.417Z',
+            'submissionState': 'Valid'
+        }
+        self.mock_ingest.get_entities.side_effect = lambda *args: iter([])
+
+        # when
+        with self._app.test_client() as app:
+            response = app.post('/summaries', json={'submissions': ['submission-1', 'submission-2']})
+            too_many_response = app.post('/summaries', json={'submissions': ['submission'] * 1001})
+            not_uuid_responses = [app.post('/summaries', json=request_json) for request_json in
+                                  [{'submissions': [{}]}, {'projects': ['project', 1]}, ['submission']]]
+
+        # then
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/x-ndjson', response.mimetype)
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual({'submission-1', 'submission-2'}, {record['uuid'] for record in records})
+        self.assertTrue(all(record['type'] == 'submission' and 'summary' in record for record in records))
+        self.assertEqual(400, too_many_response.status_code)
+        self.assertEqual([400, 400, 400], [response.status_code for response in not_uuid_responses])
+
+    def test_submission_summary_not_modified(self):
+        # given
+        submission = {
+            '_links': {'self': {'href': 'http://mock-ingest-api/submissionEnvelopes/mock-id'}},
+            'uuid': {'uuid': 'mock-submission-uuid'},
+            'submissionDate': '2022-01-27T11:57:05.187Z',
+            'updateDate': '2022-01-27T12:00:58.417Z',
+            'submissionState': 'Valid'
+        }
+        self.mock_ingest.get_submission_by_uuid.side_effect = lambda *args: dict(submission)
+        self.mock_ingest.get_entities.side_effect = lambda *args: iter([])
+
+        # when
+        with self._app.test_client() as app:
+            response = app.get('/submissions/mock-submission-uuid/summary')
+            etag = response.headers['ETag']
+            not_modified_response = app.get('/submissions/mock-submission-uuid/summary',
+                                             headers={'If-None-Match': etag})
+            submission['updateDate'] = '2022-01-28T09:00:00.000Z'
+            updated_response = app.get('/submissions/mock-submission-uuid/summary', headers={'If-None-Match': etag})
+
+        # then
+        self.assertEqual(200, response.status_code)
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+        self.assertEqual(304, not_modified_response.status_code)
+        self.assertEqual(b'', not_modified_response.data)
+        self.assertEqual(200, updated_response.status_code)
+        self.assertNotEqual(etag, updated_response.headers['ETag'])
+        self.assertEqual(2 * 5, self.mock_ingest.get_entities.call_count)  # not summarised for the 304
+
+    def test_project_summary_not_modified(self):
+        # given
+        self.mock_ingest.get_project_by_uuid.return_value = {'_links': {}}
+        self.mock_ingest.get_related_entities.side_effect = lambda *args: iter([{
+            '_links': {'self': {'href': 'http://mock-ingest-api/submissionEnvelopes/mock-id'}},
+            'uuid': {'uuid': 'mock-submission-uuid'},
+            'submissionDate': '2022-01-27T11:57:05.187Z',
+            'updateDate': '2022-01-27T12:00:58.417Z',
+            'submissionState': 'Valid'
+        }])
+        self.mock_ingest.get_entities.side_effect = lambda *args: iter([])
+
+        # when
+        with self._app.test_client() as app:
+            response = app.get('/projects/mock-project-uuid/summary')
+            not_modified_response = app.get('/projects/mock-project-uuid/summary',
+                                            headers={'If-None-Match': response.headers['ETag']})
+
+        # then
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(304, not_modified_response.status_code)
+        self.assertEqual(5, self.mock_ingest.get_entities.call_count)
+
+    def test_summaries_modified_when_scrape_config_reloaded(self):
+        # given
+        submission = {
+            '_links': {'self': {'href': 'http://mock-ingest-api/submissionEnvelopes/mock-id'}},
+            'uuid': {'uuid': 'mock-submission-uuid'},
+            'submissionDate': '2022-01-27T11:57:05.187Z',
+            'updateDate': '2022-01-27T12:00:58.417Z',
+            'submissionState': 'Valid'
+        }
+        self.mock_ingest.get_submission_by_uuid.side_effect = lambda *args: dict(submission)
+        self.mock_ingest.get_project_by_uuid.return_value = {'_links': {}}
+        self.mock_ingest.get_related_entities.side_effect = lambda *args: iter([dict(submission)])
+        self.mock_ingest.get_entities.side_effect = lambda *args: iter([])
+        reloaded_loader = Mock(spec=SubmissionScraperLoader)
+        reloaded_loader.get.return_value = SubmissionScraper(fingerprint='reloaded-scrape-config')
+
+        # when
+        with self._app.test_client() as app:
+            submission_etag = app.get('/submissions/mock-submission-uuid/summary').headers['ETag']
+            project_etag = app.get('/projects/mock-project-uuid/summary').headers['ETag']
+            self._app.summary_service.submission_scraper_loader = reloaded_loader
+            submission_response = app.get('/submissions/mock-submission-uuid/summary',
+                                          headers={'If-None-Match': submission_etag})
+            project_response = app.get('/projects/mock-project-uuid/summary', headers={'If-None-Match': project_etag})
+
+        # then
+        self.assertEqual(200, submission_response.status_code)
+        self.assertNotEqual(submission_etag, submission_response.headers['ETag'])
+        self.assertEqual(200, project_response.status_code)
+        self.assertNotEqual(project_etag, project_response.headers['ETag'])
+
+    def test_spreadsheet_download_not_modified(self):
+        # given
+        self.mock_job_manager.load_job_spec.return_value = JobSpec(JobStatus.COMPLETE, 'mock-job-id',
+                                                                   'mock-job-id.xlsx', 'spreadsheet.xlsx',
+                                                                   'mock-spreadsheet-hash')
+        self.mock_job_manager.spreadsheet_for_job.side_effect = lambda *args: io.BytesIO(b'spreadsheet')
+
+        # when
+        with self._app.test_client() as app:
+            response = app.get('/spreadsheets/download/mock-job-id')
+            not_modified_response = app.get('/spreadsheets/download/mock-job-id',
+                                            headers={'If-None-Match': response.headers['ETag']})
+
+        # then
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(b'spreadsheet', response.data)
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+        self.assertEqual(304, not_modified_response.status_code)
+        self.mock_job_manager.spreadsheet_for_job.assert_called_once_with('mock-job-id')
+
+    def test_started_spreadsheet_job_not_cached(self):
+        # given
+        self.mock_job_manager.load_job_spec.return_value = JobSpec(JobStatus.STARTED, 'mock-job-id',
+                                                                   'mock-job-id.xlsx', 'spreadsheet.xlsx')
+
+        # when
+        with self._app.test_client() as app:
+            response = app.get('/spreadsheets/download/mock-job-id')
+
+        # then
+        self.assertEqual(202, response.status_code)
+        self.assertEqual('no-store', response.headers['Cache-Control'])
+        self.assertNotIn('ETag', response.headers)
+
+    def test_spreadsheet_job_refused_when_queue_full(self):
+        # given
+        self.mock_job_manager.create_job.side_effect = JobQueueFullException(100)
+        request_json = {'filename': 'spreadsheet.xlsx', 'spec': {'types': []}}
+
+        # when
+        with self._app.test_client() as app:
+            response = app.post('/spreadsheets', data=json.dumps(request_json))
+
+        # then
+        self.assertEqual(429, response.status_code)
+        self.assertEqual('30', response.headers['Retry-After'])
+
     def test_index(self):
         # Given
         os.environ.clear()
@@ -41,7 +235,61 @@ class BrokerAppTest(TestCase):
     def test_create_app(self):
         self.ingest_constructor.assert_called_once()
         self.xls_constructor.assert_called_once_with(self.mock_ingest)
-        self.job_constructor.assert_called_once_with(self.mock_spreadsheet, None)
+        self.job_constructor.assert_called_once_with(self.mock_spreadsheet, None, process_pool=None,
+                                                     max_queued_jobs=None, lease_duration=None)
+        self.mock_job_manager.start.assert_called_once()
+        self.assertIs(self._app.summary_service.submission_summary_cache, self._app.submission_summary_cache)
+
+    def test_summary_cache_shared_between_requests(self):
+        # given
+        self.mock_ingest.get_submission_by_uuid.return_value = {
+            '_links': {'self': {'href': 'http://mock-ingest-api/submissionEnvelopes/mock-id'}},
+            'uuid': {'uuid': 'mock-submission-uuid'},
+            'submissionDate': '2022-01-27T11:57:05.187Z',
+            'updateDate': '2022-01-27T12:00:58.417Z',
+            'submissionState': 'Valid'
+        }
+        self.mock_ingest.get_entities.return_value = iter([])
+
+        # when
+        with self._app.test_client() as app:
+            first_response = app.get('/submissions/mock-submission-uuid/summary')
+            second_response = app.get('/submissions/mock-submission-uuid/summary')
+            metrics_response = app.get('/metrics')
+
+        # then
+        self.assertEqual(200, first_response.status_code)
+        self.assertEqual(first_response.data, second_response.data)
+        self.assertEqual(5, self.mock_ingest.get_entities.call_count)
+        cache_stats = metrics_response.get_json()['submission_summary_cache']
+        self.assertEqual(1, cache_stats['hits'])
+        self.assertEqual(1, cache_stats['misses'])
+        self.assertIn('spreadsheet_generator', metrics_response.get_json())
+
+    def test_ready_once_schemas_loaded(self):
+        # given
+        self.assertTrue(self._app.schema_template_loader.wait_until_ready(timeout=5))
+
+        # when
+        with self._app.test_client() as app:
+            response = app.get('/ready')
+
+        # then
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.get_json()['ready'])
+        self.mock_spreadsheet.load_schema_template.assert_called_once()
+
+    def test_not_ready_while_schemas_loading(self):
+        # given
+        self._app.schema_template_loader = SchemaTemplateLoader(self.mock_spreadsheet, self.mock_ingest)
+
+        # when
+        with self._app.test_client() as app:
+            response = app.get('/ready')
+
+        # then
+        self.assertEqual(503, response.status_code)
+        self.assertFalse(response.get_json()['ready'])
 
     def test_index_redirect(self):
         mock_url = 'url'
@@ -52,3 +300,40 @@ class BrokerAppTest(TestCase):
         # then
         self.assertEqual(302, response.status_code)
         self.assertIn(mock_url, response.location)
+
+
+class BrokerAppJobManagerTest(TestCase):
+    @patch('broker_app.IngestApi')
+    @patch('broker_app.SpreadsheetGenerator')
+    def create_app(self, xls_constructor, ingest_constructor):
+        mock_spreadsheet = Mock(spec=SpreadsheetGenerator)
+        mock_spreadsheet.load_schema_template.return_value = schema_template()
+        xls_constructor.return_value = mock_spreadsheet
+        ingest_constructor.return_value = Mock(spec=IngestApi)
+        app = create_app()
+        self.addCleanup(app.spreadsheet_job_manager.stop)
+        self.addCleanup(app.schema_template_loader.stop)
+        return app
+
+    def test_create_app_without_storage_dir(self):
+        # given
+        with patch.dict(os.environ):
+            os.environ.pop('SPREADSHEET_STORAGE_DIR', None)
+
+            # when
+            app = self.create_app()
+
+        # then
+        self.assertIsInstance(app.spreadsheet_job_manager, SpreadsheetJobManager)
+        self.assertIsNone(app.spreadsheet_job_manager._thread)
+
+    def test_create_app_with_storage_dir(self):
+        # given
+        with tempfile.TemporaryDirectory() as storage_dir, \
+                patch.dict(os.environ, {'SPREADSHEET_STORAGE_DIR': storage_dir}):
+            # when
+            app = self.create_app()
+
+            # then
+            self.assertEqual(storage_dir, app.spreadsheet_job_manager.output_dir_path)
+            self.assertTrue(app.spreadsheet_job_manager._thread.is_alive())
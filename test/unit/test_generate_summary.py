@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from broker.common.submission_summary import SubmissionSummary
+from generate_summary import summarise_all, SummaryWriter, read_uuids
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+UUIDS = [f'00000000-0000-4000-8000-00000000000{i}' for i in range(5)]
+
+
+def _submission_summary(file_count) -> SubmissionSummary:
+    submission_summary = SubmissionSummary()
+    for _ in range(file_count):
+        submission_summary.file_summary.add_entity('sequence_file')
+    submission_summary.scrape_result = {'organ': ['heart']}
+    return submission_summary
+
+
+class GenerateSummaryTest(TestCase):
+    def setUp(self):
+        self.summary_service = MagicMock()
+        self.summary_service.ingestapi.get_submission_by_uuid.side_effect = lambda uuid: {'uuid': {'uuid': uuid}}
+        self.summary_service.summary_for_submission.side_effect = \
+            lambda submission: _submission_summary(UUIDS.index(submission['uuid']['uuid']) + 1)
+
+    def test_combined_tsv_with_uuid_column(self):
+        # given
+        output = io.StringIO()
+
+        # when
+        stats = summarise_all(self.summary_service, 'submission', UUIDS, SummaryWriter(output, 'tsv'), workers=3)
+
+        # then
+        rows = list(csv.reader(io.StringIO(output.getvalue()), delimiter='\t'))
+        self.assertEqual(['uuid', 'summary', 'key', 'value'], rows[0])
+        self.assertCountEqual([[uuid, 'file', 'sequence_file', str(i + 1)] for i, uuid in enumerate(UUIDS)] +
+                              [[uuid, 'scrape', 'organ', '["heart"]'] for uuid in UUIDS], rows[1:])
+        self.assertEqual(5, stats['summarised'])
+        self.assertEqual(1 + 2 + 3 + 4 + 5, stats['entities'])
+        self.assertGreater(stats['entities_per_second'], 0)
+
+    def test_resume_from_checkpoint(self):
+        # given
+        checkpoint = io.StringIO()
+        failing_uuid = UUIDS[3]
+        summary_for_submission = self.summary_service.summary_for_submission.side_effect
+
+        def fail_one(submission):
+            if submission['uuid']['uuid'] == failing_uuid:
+                raise ConnectionError('ingest unavailable')
+            return summary_for_submission(submission)
+
+        self.summary_service.summary_for_submission.side_effect = fail_one
+        first_output = io.StringIO()
+        first_stats = summarise_all(self.summary_service, 'submission', UUIDS,
+                                    SummaryWriter(first_output, 'json', checkpoint), workers=2)
+
+        # when
+        self.summary_service.summary_for_submission.side_effect = summary_for_submission
+        done = set(checkpoint.getvalue().split())
+        resumed_output = io.StringIO()
+        resumed_stats = summarise_all(self.summary_service, 'submission', UUIDS,
+                                      SummaryWriter(resumed_output, 'json', checkpoint), workers=2, done=done)
+
+        # then
+        self.assertEqual({'summarised': 4, 'failed': 1, 'skipped': 0},
+                         {key: first_stats[key] for key in ['summarised', 'failed', 'skipped']})
+        self.assertEqual({'summarised': 1, 'failed': 0, 'skipped': 4},
+                         {key: resumed_stats[key] for key in ['summarised', 'failed', 'skipped']})
+        resumed_summaries = [json.loads(line) for line in resumed_output.getvalue().splitlines()]
+        self.assertEqual([failing_uuid], [summary['uuid'] for summary in resumed_summaries])
+        self.assertEqual(4, resumed_summaries[0]['summary']['file_summary']['count'])
+        self.assertCountEqual(UUIDS, checkpoint.getvalue().split())
+
+    def test_summaries_generated_concurrently(self):
+        # given
+        all_workers_busy = threading.Barrier(3, timeout=5)
+        summary_for_submission = self.summary_service.summary_for_submission.side_effect
+
+        def wait_for_other_workers(submission):
+            all_workers_busy.wait()
+            return summary_for_submission(submission)
+
+        self.summary_service.summary_for_submission.side_effect = wait_for_other_workers
+
+        # when
+        stats = summarise_all(self.summary_service, 'submission', UUIDS[:3], SummaryWriter(io.StringIO(), 'tsv'),
+                              workers=3)
+
+        # then
+        self.assertEqual(3, stats['summarised'])
+
+    def test_read_uuids(self):
+        uuids_file = io.StringIO(f'{UUIDS[0]}\n\n# a comment\n  {UUIDS[1]}  \n')
+        self.assertEqual(UUIDS[:2], list(read_uuids(uuids_file)))
+
+    def test_invalid_uuid_in_file_reported_as_usage_error(self):
+        # given
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as uuids_file:
+            uuids_file.write(f'{UUIDS[0]}\nnot-a-uuid\n')
+            uuids_file.flush()
+
+            # when
+            result = subprocess.run([sys.executable, 'generate_summary.py', 'http://mock-ingest-api', 'submission',
+                                     'json', '--uuids', uuids_file.name],
+                                    cwd=REPO_DIR, capture_output=True, text=True, timeout=60)
+
+        # then
+        self.assertEqual(2, result.returncode)
+        self.assertIn('argument --uuids: line 2: not-a-uuid is an invalid uuid value', result.stderr)
+        self.assertNotIn('Traceback', result.stderr)